@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import sys
+import time
+from typing import List, Tuple
+from datalayer import (
+    DISTANCES_FILE,
+    PACKAGES_FILE,
+    address_changes_path,
+    index_locations,
+    load_address_changes,
+    load_locations,
+)
+from export import ResultExporter
+from hash_table import Dictionary
+from logger import print_batch_summary
+from models import BatchSummary, Location, ScenarioResult
+from scenario import Scenario
+
+
+# The locations and matrix every scenario in this process shares, set by _init_worker.
+_shared_locations: Dictionary[int, Location] = None
+_shared_matrix = None
+
+
+
+def _init_worker(locations: Dictionary[int, Location], matrix):
+    '''Keeps the shared locations and matrix for the scenarios this process runs O(n)
+
+    Forked workers already have them, spawned ones receive them once here instead of once per scenario.
+
+    '''
+    global _shared_locations, _shared_matrix
+    _shared_locations = locations
+    _shared_matrix = matrix
+    index_locations(locations)
+
+
+
+def _run_scenario(task: Tuple[str, str, list, List[int], str]):
+    '''Runs one packages file against the shared data, the worker entry point of run_batch O(e*log(n))
+
+    Args:
+        task: (name, packages_path, address_changes, truck_ids, export_path)
+    Returns:
+        (ScenarioResult): The day's totals
+
+    '''
+    name, packages_path, address_changes, truck_ids, export_path = task
+    scenario = Scenario.from_shared(_shared_locations, _shared_matrix, packages_path, name, address_changes)
+    if export_path is None:
+        return scenario.run(truck_ids)
+    with ResultExporter(export_path) as exporter:
+        return scenario.run(truck_ids, exporter=exporter)
+
+
+
+def summarize(results: List[ScenarioResult], seconds: float):
+    '''Aggregates the totals of many scenarios O(n)
+
+    Args:
+        results: one result per scenario
+        seconds: wall clock time the whole batch took
+    Returns:
+        (BatchSummary): The aggregate stats
+
+    '''
+    miles = sum(result.miles for result in results)
+    return BatchSummary(
+        scenarios=len(results),
+        miles=miles,
+        mean_miles=miles / len(results) if results else float(0),
+        max_miles=max((result.miles for result in results), default=float(0)),
+        latest_end_time=max((result.end_time for result in results), default=0),
+        packages=sum(result.packages for result in results),
+        delivered=sum(result.delivered for result in results),
+        late=sum(result.late for result in results),
+        seconds=seconds,
+        scenarios_per_second=len(results) / seconds if seconds else float(0),
+    )
+
+
+
+def run_batch(
+    packages_paths: List[str],
+    distances_path: str = DISTANCES_FILE,
+    matrix_format: str = "list",
+    processes: int = None,
+    truck_ids: List[int] = (1, 2),
+    address_changes: List[Tuple[int, str, int]] = None,
+    export_dir: str = None,
+):
+    '''Runs a scenario per packages file against one distance matrix, in a pool of worker processes O(d*e*log(n)/p)
+
+    The distances file is read once. Each worker gets the locations and matrix once when it starts
+    and reuses them, along with the neighbor lists built from the matrix, for every scenario it runs.
+    Only each scenario's totals come back from the workers.
+
+    Args:
+        packages_paths: one packages csv file per day
+        distances_path: the distances csv file every day shares
+        matrix_format: see load_locations
+        processes: the most worker processes, the cpu count by default. 1 runs every scenario here.
+        truck_ids: the trucks with drivers each day
+        address_changes: (package_id, new_address, effective_time) per correction, applied to every day.
+            By default each day gets the corrections in the file next to its packages file, see
+            load_address_changes, and a day without one gets none.
+        export_dir: write each day's results to its own folder in here, see ResultExporter
+    Returns:
+        results: one ScenarioResult per packages file, in the same order
+        summary: the aggregate stats
+
+    '''
+    start = time.perf_counter()
+    locations, matrix = load_locations(matrix_format, distances_path)
+
+    tasks = []
+    for i, path in enumerate(packages_paths):
+        name = os.path.splitext(os.path.basename(path))[0]
+        export_path = os.path.join(export_dir, f"{i:04d}-{name}") if export_dir else None
+        changes = address_changes if address_changes is not None else load_address_changes(path)
+        tasks.append((name, path, list(changes), list(truck_ids), export_path))
+
+    processes = min(processes or multiprocessing.cpu_count(), len(tasks))
+
+    # One process doesn't need a pool.
+    if processes <= 1:
+        _init_worker(locations, matrix)
+        results = [_run_scenario(task) for task in tasks]
+    else:
+        # Hand out a few scenarios at a time so workers don't wait on the parent between days.
+        chunk_size = max(1, len(tasks) // (processes * 4))
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(locations, matrix)) as pool:
+            results = pool.map(_run_scenario, tasks, chunk_size)
+
+    return results, summarize(results, time.perf_counter() - start)
+
+
+
+def main(packages_paths: List[str], processes: int = None):
+    '''Runs the batch and prints each scenario and the totals
+
+    Run from the repository root:
+        python -m batch [packages.csv ...]
+
+    '''
+    paths = packages_paths or [PACKAGES_FILE]
+    results, summary = run_batch(paths, processes=processes)
+    print_batch_summary(results, summary)
+
+    # An undelivered package usually means a day needed an address correction it wasn't given.
+    for path, result in zip(paths, results):
+        if result.delivered < result.packages:
+            print(
+                f"warning: {result.name} left {result.packages - result.delivered} packages undelivered,"
+                f" its address corrections are read from {address_changes_path(path)}",
+                file=sys.stderr,
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
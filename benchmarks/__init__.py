@@ -0,0 +1,3 @@
+'''Micro-benchmarks for the routing program. Run them from the repository root, e.g.
+python -m benchmarks.bench_hash_table
+'''
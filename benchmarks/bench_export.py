@@ -0,0 +1,52 @@
+'''Measures streaming a large package history through ResultExporter and reading it back,
+memory-mapped when NumPy is installed.
+
+Run from the repository root:
+    python -m benchmarks.bench_export [rows...]
+'''
+import os
+import sys
+import tempfile
+import time
+from export import ResultExporter, load_results
+from history import PackageHistory
+from models import DeliveryStatus, Package
+
+
+def _history(rows: int):
+    '''Builds a history of packages that each go hub, enroute, delivered O(r)'''
+    packages = PackageHistory()
+    count = max(1, rows // 3)
+    for p_id in range(1, count + 1):
+        packages.add(Package(p_id, p_id, "1", "", 0, 32400, DeliveryStatus.hub), 0)
+    for p_id in range(1, count + 1):
+        packages.record(p_id, p_id % 3600, status=DeliveryStatus.enroute, truck_id=p_id % 8)
+        packages.record(p_id, p_id % 3600 + 600, status=DeliveryStatus.delivered, truck_id=p_id % 8)
+    return packages
+
+
+
+def main(sizes):
+    for rows in sizes:
+        packages = _history(rows)
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            with ResultExporter(directory) as exporter:
+                exporter.add_history(packages)
+            written = time.perf_counter() - start
+            size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+            start = time.perf_counter()
+            tables = load_results(directory)
+            total = int(tables["history"]["timestamp"][-1])
+            read = time.perf_counter() - start
+            del tables
+
+        print(f"{packages.row_count} history rows ({'arrow' if exporter.arrow else 'npy'}, {size / 2**20:.1f} MiB)")
+        print(f"    export            {written:>10.3f} sec   ({packages.row_count / written:,.0f} rows/sec)")
+        print(f"    load              {read:>10.3f} sec   (last timestamp {total})")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args or [10_000, 100_000, 1_000_000])
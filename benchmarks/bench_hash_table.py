@@ -0,0 +1,95 @@
+'''Compares the chained Dictionary engine against the open addressing engine.
+
+Run from the repository root:
+    python -m benchmarks.bench_hash_table [sizes...]
+'''
+import sys
+import time
+import tracemalloc
+from hash_table import Dictionary
+
+
+def _time(fn, repeat=3):
+    '''Returns the best wall time of fn over a few runs O(repeat)
+
+    Args:
+        fn: The function to time
+        repeat: How many times to run it
+    Returns:
+        (float): The fastest run in seconds
+
+    '''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+
+def _build(n: int, open_addressing: bool):
+    '''Builds a dictionary of n int keys O(n)'''
+    d = Dictionary[int, int](open_addressing=open_addressing)
+    for i in range(n):
+        d[i] = i
+    return d
+
+
+
+def _memory(n: int, open_addressing: bool):
+    '''Returns the peak bytes allocated while building a dictionary of n keys O(n)'''
+    tracemalloc.start()
+    d = _build(n, open_addressing)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del d
+    return peak
+
+
+
+def bench(n: int, open_addressing: bool):
+    '''Times insert, lookup, len, value listing and delete on one engine O(n)
+
+    Args:
+        n: Number of keys
+        open_addressing: Which engine to benchmark
+    Returns:
+        (dict): Seconds per operation group and the peak build memory in bytes
+
+    '''
+    d = _build(n, open_addressing)
+
+    def lookup():
+        for i in range(n):
+            d[i]
+
+    def delete():
+        c = _build(n, open_addressing)
+        for i in range(0, n, 2):
+            del c[i]
+
+    return {
+        "insert": _time(lambda: _build(n, open_addressing)),
+        "lookup": _time(lookup),
+        "len": _time(lambda: len(d)),
+        "values": _time(lambda: d.values),
+        "build+delete_half": _time(delete),
+        "peak_bytes": _memory(n, open_addressing),
+    }
+
+
+
+def main(sizes):
+    for n in sizes:
+        chained = bench(n, False)
+        open_ = bench(n, True)
+        print(f"n = {n}")
+        print(f"    {'operation':<18}{'chained':>14}{'open':>14}{'speedup':>10}")
+        for op in chained:
+            speedup = chained[op] / open_[op] if open_[op] else float("inf")
+            print(f"    {op:<18}{chained[op]:>14.6g}{open_[op]:>14.6g}{speedup:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000])
@@ -0,0 +1,68 @@
+'''Compares the memory of a list of copied PackageUpdate objects per package against
+the PackageHistory store for the same status changes.
+
+Run from the repository root:
+    python -m benchmarks.bench_history [packages] [updates per package]
+'''
+import sys
+import tracemalloc
+from hash_table import Dictionary
+from history import PackageHistory
+from models import DeliveryStatus, Package, PackageUpdate
+
+
+STATUS_CYCLE = [DeliveryStatus.hub, DeliveryStatus.enroute, DeliveryStatus.delivered]
+
+
+def _package(package_id: int):
+    '''Builds a package with distinct strings like the csv would O(1)'''
+    return Package(package_id, package_id % 500, str(package_id % 90), "" if package_id % 10 else "Can only be on truck 2", 0, 32400, DeliveryStatus.hub)
+
+
+
+def build_lists(n: int, updates: int):
+    '''Stores every update as a copied Package inside a PackageUpdate O(n)'''
+    packages = Dictionary[int, list]()
+    for p_id in range(n):
+        packages[p_id] = [PackageUpdate(-28800, _package(p_id))]
+        for u in range(1, updates):
+            package = packages[p_id][-1].package.copy()
+            package.status = STATUS_CYCLE[u % 3]
+            packages[p_id].append(PackageUpdate(u * 60, package))
+    return packages
+
+
+
+def build_history(n: int, updates: int):
+    '''Stores every update as a row in PackageHistory O(n)'''
+    packages = PackageHistory()
+    for p_id in range(n):
+        packages.add(_package(p_id), -28800)
+        for u in range(1, updates):
+            packages.record(p_id, u * 60, status=STATUS_CYCLE[u % 3], truck_id=1)
+    return packages
+
+
+
+def _retained(build, n: int, updates: int):
+    '''Returns the bytes still allocated after building a store O(n)'''
+    tracemalloc.start()
+    store = build(n, updates)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return current
+
+
+
+def main(n: int, updates: int):
+    lists = _retained(build_lists, n, updates)
+    history = _retained(build_history, n, updates)
+    print(f"{n} packages x {updates} updates")
+    print(f"    list of PackageUpdate copies   {lists:>14} bytes")
+    print(f"    PackageHistory                 {history:>14} bytes   ({lists / history:.2f}x smaller)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args or [100_000, 4]))
@@ -0,0 +1,103 @@
+'''Measures how long each module takes to import in a fresh interpreter, checks that importing it
+has no side effects, and lists which of NumPy, pyarrow, and multiprocessing it pulled in.
+
+Each import runs from an empty folder with no stdin, so a module that loads the csv files or waits
+for input fails instead of being timed.
+
+Run from the repository root:
+    python -m benchmarks.bench_import [module...] [--repeat n]
+'''
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+MODULES = [
+    "globals",
+    "hash_table",
+    "models",
+    "history",
+    "datalayer",
+    "logger",
+    "neighbors",
+    "local_search",
+    "partition",
+    "rerouting",
+    "simulation",
+    "export",
+    "scenario",
+    "cache",
+    "batch",
+    "main",
+    "query",
+    "service",
+]
+REPEAT = 10
+
+# Slow to import, so only batch.py imports one of these at the top. The rest import them where they're used.
+HEAVY_MODULES = ["numpy", "pyarrow", "multiprocessing"]
+
+# Runs in the fresh interpreter and prints the import time and the heavy modules it loaded.
+SNIPPET = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [name for name in {heavy!r} if name in sys.modules]]))
+"""
+
+
+
+def time_import(module: str, root: str, directory: str):
+    '''Imports a module in a new interpreter and returns the seconds it took and the heavy modules it loaded'''
+    environment = dict(os.environ, PYTHONPATH=root, PYTHONDONTWRITEBYTECODE="1")
+    environment.pop("CVRPTW_INSTRUMENT", None)
+    completed = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=directory,
+        env=environment,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    if completed.returncode != 0 or completed.stdout.count("\n") != 1:
+        raise RuntimeError(f"importing {module} had side effects:\n{completed.stdout}{completed.stderr}")
+    elapsed, loaded = json.loads(completed.stdout)
+    return elapsed, loaded
+
+
+
+def main(modules, repeat: int):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+
+    # The empty folder has no csv files or cache for a module to find.
+    with tempfile.TemporaryDirectory() as directory:
+        for module in modules:
+            times = []
+            for _ in range(repeat):
+                elapsed, loaded = time_import(module, root, directory)
+                times.append(elapsed)
+            results.append({
+                "module": module,
+                "median_ms": statistics.median(times) * 1000,
+                "min_ms": min(times) * 1000,
+                "heavy_modules": loaded,
+            })
+            print(f"{module:<14} {results[-1]['median_ms']:>8.2f} ms   {' '.join(loaded)}", file=sys.stderr)
+
+    print(json.dumps({"python": sys.version.split()[0], "repeat": repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    repeat = REPEAT
+    if "--repeat" in args:
+        i = args.index("--repeat")
+        repeat = int(args[i + 1])
+        del args[i:i + 2]
+    main(args or MODULES, repeat)
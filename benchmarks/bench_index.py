@@ -0,0 +1,96 @@
+'''Measures what keeping PackageIndex current costs per recorded update, and compares finding
+packages by field through it against checking every package's latest update.
+
+Run from the repository root:
+    python -m benchmarks.bench_index [packages...]
+'''
+import random
+import sys
+import time
+from hash_table import Dictionary
+from history import PackageHistory
+from models import DeliveryStatus, Location, Package
+
+
+TRUCKS = 50
+LOCATIONS = 500
+DEADLINES = [3600, 5400, 9000, 32400]
+UNDELIVERED = [DeliveryStatus.Airport, DeliveryStatus.hub, DeliveryStatus.enroute]
+
+
+def _locations():
+    '''Builds locations spread over 20 zip codes O(n)'''
+    locations = Dictionary[int, Location]()
+    for l_id in range(LOCATIONS):
+        locations[l_id] = Location(l_id, "", f"{l_id} Main St", "Salt Lake City", "UT", f"841{l_id % 20:02d}", [], 0, 32400)
+    return locations
+
+
+
+def _build(n: int, locations: Dictionary[int, Location], indexed: bool):
+    '''Adds n packages, loads them on trucks, and delivers most of them O(n)'''
+    rng = random.Random(0)
+    packages = PackageHistory()
+    if indexed:
+        packages.build_index(locations)
+    for p_id in range(1, n + 1):
+        package = Package(p_id, rng.randrange(LOCATIONS), "5", "", 0, rng.choice(DEADLINES), DeliveryStatus.hub)
+        packages.add(package, -28800)
+    for p_id in range(1, n + 1):
+        truck_id = rng.randrange(1, TRUCKS + 1)
+        packages.record(p_id, rng.randrange(0, 7200), status=DeliveryStatus.enroute, truck_id=truck_id)
+        if rng.random() < 0.95:
+            packages.record(p_id, rng.randrange(7200, 30000), status=DeliveryStatus.delivered)
+    return packages
+
+
+
+def _scan(packages: PackageHistory, statuses, truck_id: int = None, due_before: int = None):
+    '''Finds packages by checking every package's latest update O(n)'''
+    found = []
+    for p_id in packages.iter_package_ids():
+        update = packages.latest(p_id)
+        if update.package.status not in statuses:
+            continue
+        if truck_id is not None and update.truck_id != truck_id:
+            continue
+        if due_before is not None and update.package.latest >= due_before:
+            continue
+        found.append(p_id)
+    return found
+
+
+
+def _timed(function, *args, **kwargs):
+    '''Returns the function's result and how long it took in seconds'''
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+
+def main(sizes):
+    locations = _locations()
+    for n in sizes:
+        plain, plain_sec = _timed(_build, n, locations, False)
+        packages, indexed_sec = _timed(_build, n, locations, True)
+        updates = packages.row_count
+
+        print(f"{n} packages, {updates} updates")
+        print(f"    record without index   {plain_sec:>10.3f} sec")
+        print(f"    record with index      {indexed_sec:>10.3f} sec   ({(indexed_sec - plain_sec) / updates * 1e6:.2f} us per update)")
+
+        queries = [
+            ("enroute on truck 2", dict(statuses=[DeliveryStatus.enroute], truck_id=2)),
+            ("undelivered due by 10:30", dict(statuses=UNDELIVERED, due_before=9000)),
+        ]
+        for label, arguments in queries:
+            found, find_sec = _timed(packages.find, **arguments)
+            scanned, scan_sec = _timed(_scan, packages, **arguments)
+            assert found == scanned
+            print(f"    {label:<24} {len(found):>7} found   find {find_sec * 1e3:>9.3f} ms   scan {scan_sec * 1e3:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args or [10_000, 100_000])
@@ -0,0 +1,57 @@
+'''Shows the allocation difference between the list properties of Dictionary
+(entries, values, keys) and the lazy iter_* views, plus the cost of len().
+
+Run from the repository root:
+    python -m benchmarks.bench_iteration [sizes...]
+'''
+import sys
+import time
+import tracemalloc
+from hash_table import Dictionary
+
+
+def _measure(fn):
+    '''Runs fn once and returns its peak traced allocation in bytes and its wall time O(fn)'''
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+
+def _consume(iterable):
+    '''Walks an iterable without keeping any of its items O(n)'''
+    for _ in iterable:
+        pass
+
+
+
+def main(sizes):
+    for open_addressing in (False, True):
+        engine = "open addressing" if open_addressing else "chained"
+        for n in sizes:
+            d = Dictionary[int, int](open_addressing=open_addressing)
+            for i in range(n):
+                d[i] = i
+
+            print(f"{engine}, n = {n}")
+            print(f"    {'access':<14}{'peak bytes':>14}{'seconds':>14}")
+            cases = [
+                ("len()", lambda: len(d)),
+                ("values", lambda: _consume(d.values)),
+                ("iter_values()", lambda: _consume(d.iter_values())),
+                ("keys", lambda: _consume(d.keys)),
+                ("iter_keys()", lambda: _consume(d.iter_keys())),
+                ("entries", lambda: _consume(d.entries)),
+                ("iter_items()", lambda: _consume(d.iter_items())),
+            ]
+            for name, fn in cases:
+                peak, elapsed = _measure(fn)
+                print(f"    {name:<14}{peak:>14}{elapsed:>14.6f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000])
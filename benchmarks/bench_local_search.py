@@ -0,0 +1,44 @@
+'''Compares the greedy nearest-arrival route against the same route after improve_route
+on random loads, with the miles saved and the time the improvement took.
+
+Run from the repository root:
+    python -m benchmarks.bench_local_search [stops...]
+'''
+import random
+import sys
+import time
+from hash_table import Dictionary
+from local_search import greedy_sequence, improve_route, route_distance
+from models import Location
+
+
+def _instance(n: int, seed: int):
+    '''Builds a symmetric matrix of random points in a 10 by 10 mile square and open locations O(n^2)'''
+    rng = random.Random(seed)
+    points = [(rng.random() * 10, rng.random() * 10) for _ in range(n + 1)]
+    matrix = [[round(((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5, 1) for bx, by in points] for ax, ay in points]
+    locations = Dictionary[int, Location]()
+    for l_id in range(n + 1):
+        locations[l_id] = Location(l_id, "", "", "", "", "", [], 0, 10**9, None)
+    return matrix, locations
+
+
+
+def main(sizes):
+    for n in sizes:
+        matrix, locations = _instance(n, n)
+        greedy = greedy_sequence(matrix, locations, 0, 0, list(range(1, n + 1)))
+        before = route_distance(matrix, 0, greedy)
+
+        start = time.perf_counter()
+        _, saved = improve_route(matrix, locations, 0, 0, greedy, time_budget=10)
+        elapsed = time.perf_counter() - start
+
+        print(f"{n} stops")
+        print(f"    greedy route      {before:>10.1f} miles")
+        print(f"    improved route    {before - saved:>10.1f} miles   ({saved / before:.1%} saved in {elapsed:.3f} sec)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args or [16, 100, 500])
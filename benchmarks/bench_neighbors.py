@@ -0,0 +1,39 @@
+'''Compares greedy routing that scans the whole load at every stop against routing
+that tries each location's k nearest neighbors first, on random loads.
+
+Run from the repository root:
+    python -m benchmarks.bench_neighbors [stops...]
+'''
+import sys
+import time
+from benchmarks.bench_local_search import _instance
+from local_search import greedy_sequence, route_distance
+from neighbors import neighbor_lists
+
+
+def _timed(fn):
+    '''Runs fn once and returns its result and wall time O(fn)'''
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+
+def main(sizes, k: int = 10):
+    for n in sizes:
+        matrix, locations = _instance(n, n)
+        load = list(range(1, n + 1))
+
+        _, build = _timed(lambda: neighbor_lists(matrix, k))
+        full, full_time = _timed(lambda: greedy_sequence(matrix, locations, 0, 0, load))
+        near, near_time = _timed(lambda: greedy_sequence(matrix, locations, 0, 0, load, k))
+
+        print(f"{n} stops, k = {k}")
+        print(f"    neighbor lists built   {build:>8.3f} sec")
+        print(f"    full scan              {full_time:>8.3f} sec   {route_distance(matrix, 0, full):>8.1f} miles")
+        print(f"    neighbors first        {near_time:>8.3f} sec   {route_distance(matrix, 0, near):>8.1f} miles")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args or [100, 1000, 3000])
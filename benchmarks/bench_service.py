@@ -0,0 +1,158 @@
+'''Load tests the HTTP status service: many clients on keep-alive connections ask for packages,
+truck routes, and snapshots at once, and the throughput and latency of each endpoint are printed
+as JSON.
+
+The service is started on a free port and stopped afterwards, unless --url points at one that's
+already running. Progress goes to stderr.
+
+Run from the repository root:
+    python -m benchmarks.bench_service [--clients 50] [--requests 2000] [--url http://127.0.0.1:8080]
+'''
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+CLIENTS = 50
+REQUESTS = 2000
+
+# Paths the clients pick from, each with a weight. Snapshots are the heaviest so they're asked least.
+PACKAGE_IDS = range(1, 41)
+TIMES = ["08:30", "09:00", "09:30", "10:00", "10:30", "11:00", "12:00", "13:00"]
+ENDPOINTS = [
+    ("package", 6, lambda rng: f"/packages/{rng.choice(PACKAGE_IDS)}?at={rng.choice(TIMES)}"),
+    ("route", 2, lambda rng: f"/trucks/{rng.choice([1, 2])}/route"),
+    ("find", 1, lambda rng: f"/packages?status=!delivered&due={rng.choice(TIMES)}"),
+    ("snapshot", 1, lambda rng: f"/snapshot?at={rng.choice(TIMES)}"),
+]
+
+
+def _start_service():
+    '''Starts the service on a free port and returns the process and its address'''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "service", "--port", "0"],
+        cwd=root,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+    # The service prints its address once the day is planned and it's listening.
+    for line in process.stderr:
+        if line.startswith("Serving on "):
+            return process, line.split()[-1]
+    process.wait()
+    raise RuntimeError(f"the service exited with {process.returncode} before listening")
+
+
+
+async def _client(host: str, port: int, paths, results):
+    '''Sends its paths one after another on one keep-alive connection and records each latency'''
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for name, path in paths:
+            start = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                header, _, value = line.decode("latin-1").partition(":")
+                if header.lower() == "content-length":
+                    length = int(value)
+            json.loads(await reader.readexactly(length))
+            results.append((name, status, time.perf_counter() - start))
+    finally:
+        writer.close()
+
+
+
+async def _load(host: str, port: int, clients: int, requests: int):
+    '''Runs the clients at once and returns every result and the seconds they took together'''
+    rng = random.Random(0)
+    names = [name for name, _, _ in ENDPOINTS]
+    weights = [weight for _, weight, _ in ENDPOINTS]
+    paths_by_name = {name: path for name, _, path in ENDPOINTS}
+
+    # Deal the requests out so every client has its own share.
+    plans = [[] for _ in range(clients)]
+    for i in range(requests):
+        name = rng.choices(names, weights)[0]
+        plans[i % clients].append((name, paths_by_name[name](rng)))
+
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, plan, results) for plan in plans))
+    return results, time.perf_counter() - start
+
+
+
+def _percentile(values, fraction: float):
+    '''Returns the value at a fraction of the way through the sorted values'''
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+
+def main(url: str, clients: int, requests: int):
+    process = None
+    if url is None:
+        print("planning the day and starting the service", file=sys.stderr)
+        process, url = _start_service()
+    address = urlsplit(url)
+
+    try:
+        results, elapsed = asyncio.run(_load(address.hostname, address.port, clients, requests))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    endpoints = []
+    for name, _, _ in ENDPOINTS:
+        latencies = [latency for n, _, latency in results if n == name]
+        if not latencies:
+            continue
+        endpoints.append({
+            "endpoint": name,
+            "requests": len(latencies),
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": _percentile(latencies, 0.95) * 1000,
+            "p99_ms": _percentile(latencies, 0.99) * 1000,
+            "max_ms": max(latencies) * 1000,
+        })
+        print(f"{name:<10} {len(latencies):>6}   p50 {endpoints[-1]['p50_ms']:>8.2f} ms   p99 {endpoints[-1]['p99_ms']:>8.2f} ms", file=sys.stderr)
+
+    errors = sum(1 for _, status, _ in results if status != 200)
+    print(f"{len(results)} requests from {clients} clients in {elapsed:.2f} sec, {len(results) / elapsed:.0f} per sec, {errors} errors", file=sys.stderr)
+    print(json.dumps({
+        "python": sys.version.split()[0],
+        "clients": clients,
+        "requests": len(results),
+        "seconds": elapsed,
+        "requests_per_sec": len(results) / elapsed,
+        "errors": errors,
+        "endpoints": endpoints,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the HTTP status service.")
+    parser.add_argument("--url", help="a running service, one is started when there's none")
+    parser.add_argument("--clients", type=int, default=CLIENTS)
+    parser.add_argument("--requests", type=int, default=REQUESTS)
+    args = parser.parse_args()
+    main(args.url, args.clients, args.requests)
@@ -0,0 +1,92 @@
+'''Measures the discrete-event engine on its own and running a synthetic delivery day
+with many trucks.
+
+Run from the repository root:
+    python -m benchmarks.bench_simulation [events] [trucks]
+'''
+import random
+import sys
+import time
+from globals import TRUCK_CAPACITY
+from hash_table import Dictionary
+from history import PackageHistory
+from models import DeliveryStatus, Location, Package
+from simulation import HUB_ID, DeliverySimulation, Simulator
+
+
+def bench_engine(events: int, timers: int = 1000):
+    '''Runs timers that each reschedule themselves until the event count is reached O(e*log(t))'''
+    simulator = Simulator()
+    rng = random.Random(0)
+    remaining = [events]
+
+    def tick(now: int, _):
+        remaining[0] -= 1
+        if remaining[0] > 0:
+            simulator.schedule(now + rng.randint(1, 600), kind)
+
+    kind = simulator.register(tick)
+    for _ in range(timers):
+        simulator.schedule(rng.randint(0, 600), kind)
+
+    start = time.perf_counter()
+    processed = simulator.run()
+    return processed, time.perf_counter() - start
+
+
+
+def bench_day(trucks: int, loads_per_truck: int = 4):
+    '''Simulates a day where every truck delivers full loads to random locations O(e*log(t))'''
+    rng = random.Random(trucks)
+    n = trucks * loads_per_truck * TRUCK_CAPACITY
+    points = [(rng.random() * 20, rng.random() * 20) for _ in range(n + 1)]
+
+    # Distances are worked out on demand so the matrix doesn't need n^2 memory.
+    class Row:
+        def __init__(self, i):
+            self.point = points[i]
+
+        def __getitem__(self, j):
+            (ax, ay), (bx, by) = self.point, points[j]
+            return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 or float("inf")
+
+    class Matrix:
+        def __getitem__(self, i):
+            return Row(i)
+
+    locations = Dictionary[int, Location]()
+    packages = PackageHistory()
+    locations[HUB_ID] = Location(HUB_ID, "hub", "", "", "", "", [], 0, 32400)
+    for l_id in range(1, n + 1):
+        locations[l_id] = Location(l_id, "", "", "", "", "", [l_id], 0, 32400)
+        packages.add(Package(l_id, l_id, "1", "", 0, 32400, DeliveryStatus.hub), 0)
+
+    simulation = DeliverySimulation(locations, Matrix(), packages)
+    ids = list(range(1, n + 1))
+    for t in range(trucks):
+        schedule = []
+        for k in range(loads_per_truck):
+            start = (t * loads_per_truck + k) * TRUCK_CAPACITY
+            schedule.append([HUB_ID])
+            schedule.append(ids[start:start + TRUCK_CAPACITY])
+        simulation.add_truck(t + 1, schedule[:-1], 0)
+
+    start = time.perf_counter()
+    simulation.run()
+    return simulation.simulator.processed, time.perf_counter() - start
+
+
+
+def main(events: int, trucks: int):
+    processed, elapsed = bench_engine(events)
+    print(f"engine, {processed} events")
+    print(f"    {elapsed:.2f} sec   ({processed / elapsed:,.0f} events/sec)")
+
+    processed, elapsed = bench_day(trucks)
+    print(f"delivery day, {trucks} trucks")
+    print(f"    {processed} events in {elapsed:.2f} sec   ({processed / elapsed:,.0f} events/sec)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args or [1_000_000, 100]))
@@ -0,0 +1,151 @@
+'''Times loading, routing, planning, and status queries on synthetic instances of growing size
+and prints the results as JSON, so runs can be saved and compared across commits.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite [locations...] > results.json
+
+Progress goes to stderr. Instances above LIST_MATRIX_LIMIT locations are loaded as a float32
+NumPy matrix, a list of lists that size doesn't fit in memory.
+'''
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import main as planner
+from benchmarks.generator import generate_instance
+from datalayer import get_data
+from globals import START_OF_DAY_SECONDS
+from partition import partition_loads
+from scenario import Scenario
+
+# NumPy is only needed for the large instances.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+SIZES = [10, 100, 1000, 10000]
+LIST_MATRIX_LIMIT = 2000
+PACKAGES_PER_LOCATION = 2
+TIGHTNESS = 0.3
+NOTES = 0.1
+
+# Status queries are asked at these times, seconds since the start of the day.
+QUERY_TIMES = [3600, 7200, 10800, 14400]
+
+
+def _use_instance(locations, matrix, packages):
+    '''Points main.py's state at a synthetic instance'''
+    scenario = Scenario("synthetic", locations, matrix, packages)
+    # Synthetic days have no package 9 address correction.
+    scenario.applied_changes[9] = True
+    planner.use_scenario(scenario)
+
+
+
+def _timed(function, *args, **kwargs):
+    '''Returns the function's result and how long it took in seconds'''
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+
+def bench_size(directory: str, location_count: int):
+    '''Generates one instance and times each step on it'''
+    result = {"locations": location_count, "packages": PACKAGES_PER_LOCATION * (location_count - 1)}
+
+    (distances_path, packages_path), result["generate_sec"] = _timed(
+        generate_instance, directory, location_count, result["packages"], TIGHTNESS, NOTES
+    )
+
+    matrix_format = "list" if location_count <= LIST_MATRIX_LIMIT else "float32"
+    result["matrix_format"] = matrix_format
+
+    # The float formats cache the matrix in the working directory, keep that cache in the instance folder.
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        (locations, matrix, packages), result["get_data_sec"] = _timed(
+            get_data, matrix_format, distances_path, packages_path
+        )
+    finally:
+        os.chdir(cwd)
+    _use_instance(locations, matrix, packages)
+
+    # Packages whose notes hold them back until their flight lands.
+    result["delayed_packages"] = sum(
+        1 for p_id in packages.iter_package_ids() if packages.latest(p_id).package.earliest > START_OF_DAY_SECONDS
+    )
+
+    # Enough trucks that every load goes out.
+    plans, result["partition_sec"] = _timed(
+        partition_loads, locations, matrix, packages, range(1, max(2, location_count // 50) + 1)
+    )
+    loads = [list(load) for _, schedule, _ in plans for load in schedule if load != [0]]
+    result["loads"] = len(loads)
+    result["largest_load"] = max((sum(len(locations[l_id].package_ids) for l_id in load) for load in loads), default=0)
+
+    # Plan every truck's whole day.
+    start = time.perf_counter()
+    for truck_id, schedule, start_time in plans:
+        planner.plan_truck_schedule(truck_id, schedule, start_time)
+    result["plan_truck_schedule_sec"] = time.perf_counter() - start
+
+    # Route each load again on its own from the hub.
+    start = time.perf_counter()
+    for load in loads:
+        planner.route_load(0, START_OF_DAY_SECONDS, 1, load)
+    elapsed = time.perf_counter() - start
+    result["route_load_sec"] = elapsed
+    result["route_load_mean_sec"] = elapsed / len(loads) if loads else 0.0
+
+    # A full status table per time, and every package looked up one at a time.
+    _, result["snapshot_sec"] = _timed(lambda: [packages.snapshot(t) for t in QUERY_TIMES])
+    _, result["update_at_sec"] = _timed(
+        lambda: [packages.update_at(p_id, t) for t in QUERY_TIMES for p_id in packages.iter_package_ids()]
+    )
+    result["history_rows"] = packages.row_count
+    return result
+
+
+
+def _commit():
+    '''Returns the current git commit, or None outside a repository'''
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+
+def main(sizes):
+    results = []
+    for location_count in sizes:
+        print(f"{location_count} locations...", file=sys.stderr, flush=True)
+        with tempfile.TemporaryDirectory() as directory:
+            results.append(bench_size(directory, location_count))
+
+    print(json.dumps({
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__ if np is not None else None,
+        "settings": {
+            "packages_per_location": PACKAGES_PER_LOCATION,
+            "tightness": TIGHTNESS,
+            "notes": NOTES,
+            "query_times": QUERY_TIMES,
+        },
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args or SIZES)
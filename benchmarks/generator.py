@@ -0,0 +1,201 @@
+'''Writes synthetic delivery days in the same formats as distances.csv and packages.csv,
+so get_data and everything after it can be measured at any size.
+
+Run from the repository root:
+    python -m benchmarks.generator folder [locations] [packages]
+'''
+import csv
+import os
+import random
+import sys
+from globals import TRUCK_CAPACITY
+
+
+# Deadlines are drawn from these, everything else is EOD.
+DEADLINES = ["9:00 AM", "9:30 AM", "10:00 AM", "10:30 AM", "11:00 AM", "11:30 AM", "12:00 PM"]
+DELAYED_NOTE = "Delayed on flight---will not arrive to depot until 9:05 am"
+TRUCK_NOTE = "Can only be on truck 2"
+PACKAGE_HEADERS = ["Package ID", "Address", "City", "State", "Zip", "Delivery Deadline", "Weight KILO", "Special Notes"]
+
+# Delayed packages with a deadline get one at least an hour after they reach the hub.
+DELAYED_DEADLINES = ["10:30 AM", "11:00 AM", "11:30 AM", "12:00 PM"]
+
+# The source packages file has 5 empty columns after the notes.
+EMPTY_COLUMNS = 5
+CITY = "Salt Lake City"
+STATE = "UT"
+
+
+
+def _address(l_id: int):
+    '''Returns a unique street address for a location O(1)'''
+    return f"{l_id * 10} W {(l_id % 97 + 1) * 100} S"
+
+
+
+def _postal_code(l_id: int):
+    '''Returns the zip code of a location O(1)'''
+    return f"841{l_id % 100:02d}"
+
+
+
+def write_distances(path: str, location_count: int, rng: random.Random, area_miles: float = 10.0):
+    '''Writes a lower triangle distances csv file for random points in a square O(n^2)
+
+    Args:
+        path: the file to write
+        location_count: number of locations, the hub included
+        rng: random source
+        area_miles: side of the square the points are in
+
+    '''
+    points = [(rng.random() * area_miles, rng.random() * area_miles) for _ in range(location_count)]
+
+    header = ["DISTANCE BETWEEN HUBS IN MILES", ""]
+    header.append(f"Synthetic Hub\n{_address(0)}, \n{CITY}, {STATE} {_postal_code(0)}")
+    for l_id in range(1, location_count):
+        header.append(f"Location {l_id}\n {_address(l_id)}")
+
+    with open(path, mode="w", newline="") as file:
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow(header)
+
+        # Row i holds the distances to locations 0..i, the rest of the row is empty like the source file.
+        empty = [""] * location_count
+        for i, (ax, ay) in enumerate(points):
+            label = " HUB" if i == 0 else f" {_address(i)}\n({_postal_code(i)})"
+            distances = [f"{((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5:.1f}" for bx, by in points[:i]]
+            writer.writerow([header[i + 2], label] + distances + ["0.0"] + empty[i + 1:])
+
+
+
+def _find(parents, l_id: int):
+    '''Returns the root of a location's delivered-together group, shortening the path on the way O(log n)'''
+    root = l_id
+    while parents[root] != root:
+        root = parents[root]
+    while parents[l_id] != root:
+        parents[l_id], l_id = root, parents[l_id]
+    return root
+
+
+
+def write_packages(
+    path: str,
+    location_count: int,
+    package_count: int,
+    rng: random.Random,
+    tightness: float = 0.3,
+    notes: float = 0.1,
+    capacity: int = TRUCK_CAPACITY,
+):
+    '''Writes a packages csv file with packages spread over the locations O(m)
+
+    Every note is one the loader acts on. Delayed packages reach the hub at 9:05 and get
+    a deadline they can still make. No location gets more than capacity packages, and a "Must be
+    delivered with" note is only written when the locations it ties together still fit in one truck,
+    so partitioning never sees a group it can't load.
+
+    Args:
+        path: the file to write
+        location_count: number of locations, the hub included
+        package_count: number of packages
+        rng: random source
+        tightness: share of packages with a deadline before the end of the day
+        notes: share of packages with a special note
+        capacity: the most packages a truck carries
+
+    '''
+    if package_count > capacity * (location_count - 1):
+        raise ValueError(f"{package_count} packages don't fit {location_count - 1} locations of {capacity}")
+
+    # Every location gets a package before any gets a second, then the rest go to locations with room.
+    package_locations = [0]
+    location_packages = [0] * location_count
+    for p_id in range(1, package_count + 1):
+        if p_id < location_count:
+            l_id = p_id
+        else:
+            l_id = rng.randrange(1, location_count)
+            while location_packages[l_id] >= capacity:
+                l_id = l_id % (location_count - 1) + 1
+        package_locations.append(l_id)
+        location_packages[l_id] += 1
+
+    # Locations tied together by notes, and the packages in each group.
+    parents = list(range(location_count))
+    group_packages = list(location_packages)
+
+    with open(path, mode="w", newline="") as file:
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow(PACKAGE_HEADERS + [""] * EMPTY_COLUMNS)
+
+        for p_id in range(1, package_count + 1):
+            l_id = package_locations[p_id]
+            deadline = rng.choice(DEADLINES) if rng.random() < tightness else "EOD"
+
+            note = ""
+            if rng.random() < notes:
+                kind = rng.randrange(3)
+                if kind == 0:
+                    note = TRUCK_NOTE
+                elif kind == 1:
+                    note = DELAYED_NOTE
+                    if deadline != "EOD":
+                        deadline = rng.choice(DELAYED_DEADLINES)
+                elif p_id > 2:
+                    first, second = rng.sample(range(1, p_id), 2)
+                    roots = {_find(parents, package_locations[other]) for other in (p_id, first, second)}
+                    if sum(group_packages[root] for root in roots) <= capacity:
+                        note = f"Must be delivered with {first}, {second}"
+                        root = roots.pop()
+                        for other in roots:
+                            parents[other] = root
+                            group_packages[root] += group_packages[other]
+
+            row = [p_id, _address(l_id), CITY, STATE, _postal_code(l_id), deadline, rng.randint(1, 50), note]
+            writer.writerow(row + [""] * EMPTY_COLUMNS)
+
+
+
+def generate_instance(
+    directory: str,
+    location_count: int,
+    package_count: int = None,
+    tightness: float = 0.3,
+    notes: float = 0.1,
+    seed: int = 0,
+    capacity: int = TRUCK_CAPACITY,
+):
+    '''Writes a distances.csv and packages.csv pair for a synthetic day O(n^2 + m)
+
+    Args:
+        directory: folder to write the files to, created if it doesn't exist
+        location_count: number of locations, the hub included
+        package_count: number of packages, 2 per location other than the hub by default
+        tightness: share of packages with a deadline before the end of the day
+        notes: share of packages with a special note
+        seed: random seed, the same arguments always write the same files
+        capacity: the most packages a truck carries, no location or delivered-together group gets more
+    Returns:
+        distances_path: the distances csv file
+        packages_path: the packages csv file
+
+    '''
+    if location_count < 2:
+        raise ValueError("An instance needs the hub and at least one other location")
+    if package_count is None:
+        package_count = 2 * (location_count - 1)
+
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    distances_path = os.path.join(directory, "distances.csv")
+    packages_path = os.path.join(directory, "packages.csv")
+    write_distances(distances_path, location_count, rng)
+    write_packages(packages_path, location_count, package_count, rng, tightness, notes, capacity)
+    return distances_path, packages_path
+
+
+if __name__ == "__main__":
+    directory, *counts = sys.argv[1:]
+    print(*generate_instance(directory, *[int(c) for c in counts] or [100]))
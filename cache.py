@@ -0,0 +1,194 @@
+import glob
+import hashlib
+import os
+import pickle
+import struct
+from datalayer import MATRIX_CACHE_DIR
+
+
+# Warm start files share the folder the NumPy matrices are cached in, .cache next to the program.
+# Loading a cache entry unpickles it, so the folder must only be writable by the user running the
+# program. It's created that way, and a folder other users can write to is never read or written.
+CACHE_DIR = MATRIX_CACHE_DIR
+
+# Entries kept per name. Saving past this many removes the least recently saved ones.
+MAX_ENTRIES = 8
+
+# Every file starts with the magic, the format version, the sha256 of its key, the payload length,
+# and the sha256 of the payload. The payload is a pickle of whatever was saved.
+MAGIC = b"CVRPTW\x00\x01"
+VERSION = 1
+HEADER = struct.Struct("<8sI32sQ32s")
+
+# The sha256 of this program's source files, see source_digest.
+_source_digest: bytes = None
+
+
+
+def source_digest():
+    '''Returns the sha256 of every .py file next to this one, computed once per process O(n)
+
+    Cached results depend on the code that made them, so any change to it has to miss the cache.
+
+    Returns:
+        digest: The raw digest
+
+    '''
+    global _source_digest
+    if _source_digest is None:
+        digest = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+            with open(path, mode="rb") as file:
+                digest.update(os.path.basename(path).encode())
+                digest.update(hashlib.sha256(file.read()).digest())
+        _source_digest = digest.digest()
+    return _source_digest
+
+
+
+def cache_key(*parts):
+    '''Returns the key for a cache entry built from the things its payload depends on O(n)
+
+    Args:
+        parts: file digests, options, truck plans, anything with a stable repr
+    Returns:
+        key: A 32 byte sha256 that also covers the source code
+
+    '''
+    digest = hashlib.sha256(source_digest())
+    digest.update(repr(parts).encode())
+    return digest.digest()
+
+
+
+def cache_path(name: str, key: bytes):
+    '''Returns the file a cache entry is stored in O(1)
+
+    Args:
+        name: what kind of entry it is, entries of different kinds never share a file
+        key: from cache_key
+    Returns:
+        path: The file
+
+    '''
+    return os.path.join(CACHE_DIR, f"{name}-{key.hex()[:16]}.bin")
+
+
+
+def is_private(directory: str):
+    '''Returns whether a folder is owned by this user and no one else can write to it O(1)
+
+    Args:
+        directory: the folder
+    Returns:
+        private: False if it's shared or missing, always True where there are no user ids
+
+    '''
+    try:
+        status = os.stat(directory)
+    except OSError:
+        return False
+    if not hasattr(os, "getuid"):
+        return True
+    return status.st_uid == os.getuid() and not status.st_mode & 0o022
+
+
+
+def load_cache(name: str, key: bytes):
+    '''Returns a cached payload, or None if there isn't a valid one O(n)
+
+    The header has to match this version and the whole key, and the payload its length and hash,
+    so a truncated, corrupt, or colliding file is a miss instead of an error.
+
+    Args:
+        name: what kind of entry it is
+        key: from cache_key
+    Returns:
+        payload: The object that was saved, or None
+
+    '''
+    if not is_private(CACHE_DIR):
+        return None
+    try:
+        with open(cache_path(name, key), mode="rb") as file:
+            header = file.read(HEADER.size)
+            if len(header) != HEADER.size:
+                return None
+            magic, version, key_digest, length, payload_digest = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION or key_digest != key:
+                return None
+            data = file.read(length + 1)
+    except OSError:
+        return None
+
+    if len(data) != length or hashlib.sha256(data).digest() != payload_digest:
+        return None
+    try:
+        return pickle.loads(data)
+    except (pickle.UnpicklingError, AttributeError, EOFError, ImportError, IndexError, TypeError, ValueError):
+        # The classes it refers to changed shape since it was written.
+        return None
+
+
+
+def save_cache(name: str, key: bytes, payload):
+    '''Writes a payload to the cache without leaving a partial file behind on failure O(n)
+
+    Args:
+        name: what kind of entry it is
+        key: from cache_key
+        payload: anything pickle can store
+    Returns:
+        saved: Whether it was written, a read only folder just means the next run misses
+
+    '''
+    data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    path = cache_path(name, key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        if not is_private(CACHE_DIR):
+            return False
+        with open(tmp_path, mode="wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, key, len(data), hashlib.sha256(data).digest()))
+            file.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    evict(name)
+    return True
+
+
+
+def evict(name: str, keep: int = MAX_ENTRIES):
+    '''Removes all but the most recently saved entries of a name O(n*log(n))
+
+    Each change to the source or the input files makes new keys, so without this the old entries
+    would pile up forever.
+
+    Args:
+        name: what kind of entry it is
+        keep: how many to keep
+    Returns:
+        removed: How many entries were removed
+
+    '''
+    paths = []
+    for path in glob.glob(os.path.join(CACHE_DIR, f"{name}-*.bin")):
+        try:
+            paths.append((os.path.getmtime(path), path))
+        except OSError:
+            # Removed by another run since the glob.
+            continue
+    paths.sort(reverse=True)
+
+    removed = 0
+    for _, path in paths[keep:]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            continue
+    return removed
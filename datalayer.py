@@ -1,22 +1,168 @@
 import csv
-from typing import List
+import hashlib
+import os
+import re
+from typing import Callable, Iterable, Iterator, List, Tuple
+from dataclasses import replace
 from datetime import datetime, date, time
-from globals import END_OF_DAY, START_OF_DAY, TODAY
+from globals import (
+    END_OF_DAY_SECONDS,
+    START_OF_DAY_CLOCK_SECONDS,
+    START_OF_DAY_SECONDS,
+    TODAY_SECONDS,
+)
 from hash_table import Dictionary
-from models import Location, Package, DeliveryStatus, PackageUpdate
+from history import PackageHistory
+from instrumentation import timed
+from models import Location, Package, PackageRecord, DeliveryStatus
+from optional import optional_import
 
+DISTANCES_FILE = "distances.csv"
+PACKAGES_FILE = "packages.csv"
+# A day's address corrections sit next to its packages file, packages.changes.csv for packages.csv.
+ADDRESS_CHANGES_SUFFIX = ".changes.csv"
+# Next to the program rather than in the working directory, so every run shares one cache wherever it's started.
+MATRIX_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+MATRIX_FORMATS = ["list", "float64", "float32"]
+
+# Special note of a package that reaches the hub late, like "Delayed on flight---will not arrive to depot until 9:05 am".
+DELAYED_FLIGHT_NOTE = re.compile(r"delayed on flight.*?until\s+(\d{1,2}):(\d{2})\s*([ap])\.?m", re.IGNORECASE)
+
+# Records per chunk yielded by the streaming readers, and rows between progress reports.
+CHUNK_SIZE = 1000
+PROGRESS_INTERVAL = 10000
+
+# Called with (path, rows read, bytes read, total bytes) while a csv file streams in.
+ProgressCallback = Callable[[str, int, int, int], None]
+
+
+# Long forms of the address words that show up abbreviated in the source files.
+ADDRESS_ABBREVIATIONS = Dictionary[str, str]()
+for long_form, short_form in [
+    ("NORTH", "N"), ("SOUTH", "S"), ("EAST", "E"), ("WEST", "W"),
+    ("STREET", "ST"), ("AVENUE", "AVE"), ("BOULEVARD", "BLVD"), ("ROAD", "RD"),
+    ("DRIVE", "DR"), ("LANE", "LN"), ("STATION", "STA"),
+]:
+    ADDRESS_ABBREVIATIONS[long_form] = short_form
+
+# Normalized street address -> locations at that address, filled by __build_locations.
+address_index = Dictionary[str, List[Location]]()
+
+
+
+def normalize_address(value: str):
+    '''Normalizes an address so spelling differences between the csv files still match O(n)
+
+    Args:
+        value: The address, city, or postal code to normalize
+    Returns:
+        normalized: Upper case words without punctuation and with common words abbreviated
+
+    '''
+    if not value:
+        return ""
+
+    words = value.upper().replace(",", " ").replace(".", " ").split()
+    return " ".join(ADDRESS_ABBREVIATIONS[w] or w for w in words)
+
+
+
+def index_location(location: Location):
+    '''Adds a location to the address index O(1)
+
+    Args:
+        location: The location to index by its street address
+
+    '''
+    key = normalize_address(location.address)
+    matches = address_index[key]
+    if matches is None:
+        matches = []
+        address_index[key] = matches
+    matches.append(location)
+
+
+
+def find_location(address: str, city: str = None, postal_code: str = None):
+    '''Returns the location at the given address O(1)
+
+    The city and postal code are optional. When given, they pick between locations that share a street
+    address, and a location whose city or postal code isn't known yet still matches.
+
+    Args:
+        address: The street address to look up
+        city: The city of the address
+        postal_code: The zip code of the address
+    Returns:
+        location: The matching location or None if the address is unknown
+
+    '''
+    matches = address_index[normalize_address(address)]
+    if not matches:
+        return None
+
+    city = normalize_address(city)
+    postal_code = normalize_address(postal_code)
+
+    # Return the first location that doesn't conflict with the city or zip.
+    for location in matches: # O(k) where k is the number of locations sharing the address
+        if city and location.city and normalize_address(location.city) != city:
+            continue
+        if postal_code and location.postal_code and normalize_address(location.postal_code) != postal_code:
+            continue
+        return location
+
+    # Otherwise fall back to the first location at the address.
+    return matches[0]
+
+
+
+def iter_csv_rows(path: str, progress: ProgressCallback = None) -> Iterator[List[str]]:
+    '''Lazily yields the rows of a csv file, reporting progress as it goes O(n)
+
+    Only the current line is held in memory, so the file can be larger than RAM.
+
+    Args:
+        path: The csv file to read
+        progress: Called every PROGRESS_INTERVAL rows and once at the end
+    Returns:
+        rows: An iterator over the parsed rows, headers included
+
+    '''
+    total_bytes = os.path.getsize(path)
+    bytes_read = 0
+    rows_read = 0
+
+    with open(path, mode="r") as file:
+        # Count characters as lines are handed to the csv reader. They equal bytes for ascii files.
+        def lines():
+            nonlocal bytes_read
+            for line in file:
+                bytes_read += len(line)
+                yield line
+
+        for row in csv.reader(lines()):
+            yield row
+            rows_read += 1
+            if progress and rows_read % PROGRESS_INTERVAL == 0:
+                progress(path, rows_read, bytes_read, total_bytes)
+
+    if progress:
+        progress(path, rows_read, total_bytes, total_bytes)
 
 
-def __build_locations(line: List[str]):
-    '''Builds a hash table of locations from the first row of the distances csv file O(n)
+
+def iter_locations(line: List[str], chunk_size: int = CHUNK_SIZE) -> Iterator[List[Location]]:
+    '''Lazily parses the first row of the distances csv file into chunks of locations O(n)
 
     Args:
         line: The first row of the distances csv file
+        chunk_size: The most locations per chunk
     Returns:
-        locations: The locations parsed from the csv file
+        chunks: An iterator over lists of locations, in location id order
 
     '''
-    locations = Dictionary[int, Location]()
+    chunk: List[Location] = []
 
     # Enumerate location headers to create ids.
     # Skip first two columns that are not locations.
@@ -31,96 +177,300 @@ def __build_locations(line: List[str]):
         name = values[0].strip()
         address = values[1].replace(",", "").strip()
 
+        # Only the hub's header has a city, state and zip. The rest are filled in from the packages.
+        city = state = postal_code = None
         if i == 0:
             city_state_zip = values[2].split(",")
             state_zip = city_state_zip[1].strip().split(" ")
-            locations[i] = Location(
-                i,
-                name,
-                address,
-                city=city_state_zip[0],
-                state=state_zip[0],
-                postal_code=state_zip[1],
-                package_ids=[],
-                earliest=START_OF_DAY,
-                latest=END_OF_DAY,
-                truck_id=None,
-            )
-            continue
+            city, state, postal_code = city_state_zip[0], state_zip[0], state_zip[1]
 
-        # Add new location to our hashmap.
-        locations[i] = Location(
+        chunk.append(Location(
             i,
             name,
             address,
-            city=None,
-            state=None,
-            postal_code=None,
-            earliest=START_OF_DAY,
-            latest=END_OF_DAY,
+            city=city,
+            state=state,
+            postal_code=postal_code,
             package_ids=[],
+            earliest=START_OF_DAY_SECONDS,
+            latest=END_OF_DAY_SECONDS,
+            truck_id=None,
+        ))
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+
+def iter_distance_rows(rows: Iterable[List[str]]) -> Iterator[List[float]]:
+    '''Lazily parses the rows below the header of the distances csv file O(n^2)
+
+    The file is a lower triangle, so row i only holds the distances to locations 0..i.
+    The distance from a location to itself is replaced with inf to make comparing nearest
+    neighbor easier and cleaner.
+
+    Args:
+        rows: The csv rows after the header
+    Returns:
+        rows: An iterator over each row's distances to locations 0..i
+
+    '''
+    for i, line in enumerate(rows):
+        # Instantiate matrix row.
+        row = []
+
+        # Enumerate columns to map column/index location ids in row.
+        # again skip label columns
+        for location_id, distance_str in enumerate(line, -2):
+            if location_id < 0:
+                continue
+
+            # TODO Handle distance CSV tables whose row and column
+            #      labels/indexes are not sorted.
+
+            # If distance is for the same location,
+            # replace 0 with inf to make comparing nearest neighbor easier and cleaner.
+            elif i == location_id:
+                row.append(float("inf"))
+                # Break out of for loop on this last filled element to reduce cycles.
+                break
+
+            # Otherwise, add the parsed distance to the row at the index of the column.
+            row.append(float(distance_str))
+
+        yield row
+
+
+
+def iter_packages(rows: Iterable[List[str]], chunk_size: int = CHUNK_SIZE) -> Iterator[List[PackageRecord]]:
+    '''Lazily parses the rows of the packages csv file into chunks of package records O(n)
+
+    Args:
+        rows: The csv rows after the header
+        chunk_size: The most records per chunk
+    Returns:
+        chunks: An iterator over lists of packages paired with their address details
+
+    '''
+    chunk: List[PackageRecord] = []
+
+    for line in rows:
+        # Create location details that can be overridden in special cases
+        package = Package(
+            package_id = int(line[0]),
+            location_id = None,
+            weight = line[6],
+            notes = line[7],
+            earliest = START_OF_DAY_SECONDS,
+            latest = __strp_deadline(line[5]),
+            status = DeliveryStatus.hub,
         )
-    return locations
 
+        # "Delayed on flight---will not arrive to depot until 9:05 am"
+        arrival = __strp_flight_arrival(package.notes)
+        if arrival is not None:
+            package.earliest = arrival
+            package.status = DeliveryStatus.Airport
 
+        chunk.append(PackageRecord(package, str(line[1]), line[2], line[3], line[4]))
 
-def __get_locations():
-    '''Reads data from the distances csv file then returns a hash table of locations and a matrix of distances O(n)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
 
+
+
+def __build_locations(line: List[str], chunk_size: int = CHUNK_SIZE):
+    '''Builds a hash table of locations from the first row of the distances csv file O(n)
+
+    Args:
+        line: The first row of the distances csv file
+        chunk_size: The most locations parsed and indexed at a time
     Returns:
         locations: The locations parsed from the csv file
-        matrix: The matrix of distances between locations
 
     '''
+    locations = Dictionary[int, Location]()
+
+    # Start a fresh address index for this set of locations.
+    global address_index
+    address_index = Dictionary[str, List[Location]]()
 
-    # Instantiate return objects in outer method scope.
-    locations = None
-    matrix: List[List[float]] = []
+    # Add each chunk to our hashmap and the address index as it is parsed.
+    for chunk in iter_locations(line, chunk_size):
+        for location in chunk:
+            locations[location.location_id] = location
+            index_location(location)
+    return locations
 
-    with open("distances.csv", mode="r") as file:
-        lines = csv.reader(file)
 
-        # Enumerate rows to map row/location ids.
-        for i, line in enumerate(lines, -1):
-            # If it's the header row, build the locations hashmap.
-            if i < 0:
-                locations = __build_locations(line)
-                continue
 
-            # Instantiate matrix row.
-            row = []
+def index_locations(locations: Dictionary[int, Location]):
+    '''Replaces the address index with one for the given locations O(n)
+
+    Used by worker processes that receive the locations without the module state that indexed them.
 
-            # Enumerate columns to map column/index location ids in row.
-            # again skip label columns
-            for location_id, distance_str in enumerate(line, -2):
-                if location_id < 0:
-                    continue
+    Args:
+        locations: The locations find_location should return
+
+    '''
+    global address_index
+    address_index = Dictionary[str, List[Location]]()
+    for l_id in sorted(locations.iter_keys()):
+        index_location(locations[l_id])
 
-                # TODO Handle distance CSV tables whose row and column
-                #      labels/indexes are not sorted.
 
-                # If distance is for the same location,
-                # replace 0 with inf to make comparing nearest neighbor easier and cleaner.
-                elif i == location_id:
-                    row.append(float("inf"))
-                    # Break out of for loop on this last filled element to reduce cycles.
-                    break
 
-                # Otherwise, add the parsed distance to the row at the index of the column.
-                distance = float(distance_str)
-                row.append(distance)
+def copy_locations(locations: Dictionary[int, Location]):
+    '''Copies locations so another day's packages can be added without changing them O(n)
 
-                # Also add the distance to the mirrored coordinates to make it
-                # easier to access the distance from either location_id.
-                matrix[location_id].append(distance)
+    Args:
+        locations: Locations from load_locations, before any packages were added
+    Returns:
+        locations: New location objects with their own package lists
+
+    '''
+    copies = Dictionary[int, Location]()
+    for l_id, location in locations.iter_items():
+        copies[l_id] = replace(location, package_ids=list(location.package_ids))
+    return copies
+
+
+
+def hash_file(path: str):
+    '''Returns the sha256 hex digest of a file's contents O(n)
+
+    Args:
+        path: The file to hash
+    Returns:
+        digest: The hex digest
+
+    '''
+    digest = hashlib.sha256()
+    with open(path, mode="rb") as file:
+        # Read in blocks so large tables don't have to fit in memory at once.
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+
+def __matrix_cache_path(digest: str, matrix_format: str):
+    '''Returns the path of the cached matrix for a distances file O(1)
+
+    Args:
+        digest: The sha256 of the distances csv file
+        matrix_format: The NumPy dtype of the cached matrix
+    Returns:
+        path: Where the .npy file is or will be stored
+
+    '''
+    return os.path.join(MATRIX_CACHE_DIR, f"distances-{digest[:16]}-{matrix_format}.npy")
+
+
+
+def __save_matrix_cache(path: str, matrix):
+    '''Writes a matrix to the cache without leaving a partial file behind on failure O(n^2)
+
+    Args:
+        path: The .npy file to write
+        matrix: The NumPy matrix to store
+
+    '''
+    np = optional_import("numpy")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, mode="wb") as file:
+        np.save(file, matrix)
+    os.replace(tmp_path, path)
+
+
+
+def __get_locations(
+    matrix_format: str = "list",
+    distances_path: str = DISTANCES_FILE,
+    chunk_size: int = CHUNK_SIZE,
+    progress: ProgressCallback = None,
+):
+    '''Reads data from the distances csv file then returns a hash table of locations and a matrix of distances O(n)
+
+    The file is streamed a row at a time. The "float64" and "float32" formats fill a dense NumPy
+    matrix directly instead of building a list of lists, and cache it next to the working directory
+    as a .npy file keyed on the csv's hash, so later runs only parse the header row and memory map it.
+
+    Args:
+        matrix_format: One of MATRIX_FORMATS. Defaults to "list".
+        distances_path: The distances csv file
+        chunk_size: The most locations parsed and indexed at a time
+        progress: Called while the file streams in, see iter_csv_rows
+    Returns:
+        locations: The locations parsed from the csv file
+        matrix: The matrix of distances between locations
+
+    '''
+    if matrix_format not in MATRIX_FORMATS:
+        raise ValueError(f"Unknown matrix format {matrix_format!r}, expected one of {MATRIX_FORMATS}")
+
+    # NumPy is only needed for the dense matrix formats, the default list matrix works without it.
+    np = optional_import("numpy") if matrix_format != "list" else None
+
+    cache_path = None
+    if matrix_format != "list":
+        if np is None:
+            raise ImportError(f"The {matrix_format!r} matrix format requires numpy")
+
+        cache_path = __matrix_cache_path(hash_file(distances_path), matrix_format)
+
+        # If the matrix was cached, only the header row needs to be parsed for the locations.
+        if os.path.exists(cache_path):
+            with open(distances_path, mode="r") as file:
+                locations = __build_locations(next(csv.reader(file)), chunk_size)
+            matrix = np.load(cache_path, mmap_mode="r")
+            if matrix.shape == (len(locations), len(locations)):
+                return locations, matrix
+
+    rows = iter_csv_rows(distances_path, progress)
+
+    # The header row holds the locations.
+    locations = __build_locations(next(rows), chunk_size)
+
+    # Fill the dense matrix in place, or grow the list of lists a row at a time.
+    if cache_path:
+        matrix = np.empty((len(locations), len(locations)), dtype=matrix_format)
+    else:
+        matrix: List[List[float]] = []
+
+    # Enumerate rows to map row/location ids.
+    for i, row in enumerate(iter_distance_rows(rows)):
+        if cache_path:
+            # Write the row and mirror it into the column so either location_id can be used first.
+            matrix[i, :i + 1] = row
+            matrix[:i, i] = row[:i]
+            continue
+
+        # Also add the distance to the mirrored coordinates to make it
+        # easier to access the distance from either location_id.
+        for location_id in range(i): # O(n)
+            matrix[location_id].append(row[location_id])
+        matrix.append(row)
+
+    # Cache the dense matrix for the next run.
+    if cache_path:
+        __save_matrix_cache(cache_path, matrix)
 
-            matrix.append(row)
     return locations, matrix
 
 
 
 def __strp_deadline(value: str):
-    '''Parses a deadline string into a datetime object O(1)
+    '''Parses a deadline string into seconds since the start of the day O(1)
     
     Args:
         value: The deadline string to parse
@@ -129,107 +479,209 @@ def __strp_deadline(value: str):
 
     '''
     # Default deadline to eod.
-    deadline = END_OF_DAY
+    deadline = END_OF_DAY_SECONDS
 
-    # If value is valid and not EOD, parse time and combine with today's date.
+    # If value is valid and not EOD, parse the time of day and offset it from the start of the day.
     if value.strip() and value != "EOD":
         deadline_time = datetime.strptime(value, "%I:%M %p")
-        deadline = datetime.combine(TODAY, deadline_time.time())
+        deadline = deadline_time.hour * 3600 + deadline_time.minute * 60 - START_OF_DAY_CLOCK_SECONDS
 
     return deadline
 
 
 
-def __add_packages_to_locations(locations: Dictionary[int, Location]): 
-    '''Reads data from the packages csv file then adds packages to their respective locations O(n)*O(n) 
+def __strp_flight_arrival(notes: str):
+    '''Parses when a package delayed on a flight reaches the hub from its special notes O(1)
+
+    Args:
+        notes: The package's special notes
+    Returns:
+        arrival: Seconds since the start of the day the package reaches the hub, None if it isn't delayed
+
+    '''
+    match = DELAYED_FLIGHT_NOTE.search(notes)
+    if match is None:
+        return None
+    hour, minute, half = int(match.group(1)), int(match.group(2)), match.group(3).lower()
+    hour = hour % 12 + (12 if half == "p" else 0)
+    return hour * 3600 + minute * 60 - START_OF_DAY_CLOCK_SECONDS
+
+
+
+def __add_packages_to_locations(
+    locations: Dictionary[int, Location],
+    packages_path: str = PACKAGES_FILE,
+    chunk_size: int = CHUNK_SIZE,
+    progress: ProgressCallback = None,
+):
+    '''Streams the packages csv file in chunks then adds packages to their respective locations O(n)
 
     Args:
         locations: The locations to add packages to
+        packages_path: The packages csv file
+        chunk_size: The most packages parsed at a time
+        progress: Called while the file streams in, see iter_csv_rows
     Returns:
         packages: The packages parsed from the csv file
         locations: The locations that were updated with packages
 
-    ''' 
+    '''
     # TODO Make locations immutable
     # Create hashmap to hold packages.
-    packages = Dictionary[int, List[PackageUpdate]]()
-
-    with open("packages.csv") as csv_file:
-        # Skip headers because we can't use labels without dictReader.
-        next(csv_file)
-
-        reader = csv.reader(csv_file)
-        for line in reader:
-            # Create location details that can be overridden in special cases
-            package = Package(
-                package_id = int(line[0]),
-                location_id = None,
-                weight = line[6],
-                notes = line[7],
-                earliest = START_OF_DAY,
-                latest = __strp_deadline(line[5]),
-                status = DeliveryStatus.hub,
-            )
-            address = str(line[1])
-            city = line[2]
-            state = line[3]
-            postal_code = line[4]
-
-
-            if(package.package_id in [6,25,28,32]):
-                package.earliest = TODAY.replace(hour = 9, minute = 5)
-                package.status = DeliveryStatus.Airport
-
-            # Find matching location for address
-            for location in locations.values:
-                if address == location.address:
-                    package.location_id = location.location_id
-                    packages[package.package_id] = [PackageUpdate(TODAY, package)]
-
-                    # Don't add package 9 to a location because it's address is incorrect.
-                    if package.package_id == 9:
-                        continue
-
-                    # Set location address details.
-                    # TODO Handle locations with the same address but different
-                    #      cities, states, or zip codes.
-
-                    location.package_ids.append(package.package_id)
-
-                    if not location.city and city:
-                        location.city = city
-
-                    if not location.state and state:
-                        location.state = state
-
-                    if not location.postal_code and postal_code:
-                        location.postal_code = postal_code
-
-                    if package.earliest > location.earliest:
-                        location.earliest = package.earliest
-
-                    if package.latest < location.latest:
-                        location.latest = package.latest
-
-                    # Since we found a matching location,
-                    # we don't need to continue through the rest.
-                    # TODO Handle duplicate locations
-                    break
+    packages = PackageHistory()
+
+    rows = iter_csv_rows(packages_path, progress)
+
+    # Skip headers because we can't use labels without dictReader.
+    next(rows)
+
+    for chunk in iter_packages(rows, chunk_size):
+        for record in chunk:
+            package = record.package
+
+            # Find matching location for address with the address index instead of scanning every location.
+            location = find_location(record.address, record.city, record.postal_code) # O(1)
+            if location is None:
+                continue
+
+            # The index may hold another copy of the locations, use the one being filled.
+            location = locations[location.location_id]
+
+            package.location_id = location.location_id
+            packages.add(package, TODAY_SECONDS)
+
+            # Don't add package 9 to a location because it's address is incorrect.
+            if package.package_id == 9:
+                continue
+
+            # Set location address details.
+            location.package_ids.append(package.package_id)
+
+            if not location.city and record.city:
+                location.city = record.city
+
+            if not location.state and record.state:
+                location.state = record.state
+
+            if not location.postal_code and record.postal_code:
+                location.postal_code = record.postal_code
+
+            if package.earliest > location.earliest:
+                location.earliest = package.earliest
+
+            if package.latest < location.latest:
+                location.latest = package.latest
     return packages, locations
 
 
 
-def get_data():
-    '''Reads data from the csv files then returns the locations, distance matrix, and packages O(1)
+@timed
+def get_data(
+    matrix_format: str = "list",
+    distances_path: str = DISTANCES_FILE,
+    packages_path: str = PACKAGES_FILE,
+    chunk_size: int = CHUNK_SIZE,
+    progress: ProgressCallback = None,
+):
+    '''Streams the csv files in then returns the locations, distance matrix, and packages O(1)
 
+    Args:
+        matrix_format: "list" for a list of lists, or "float64"/"float32" for a cached NumPy matrix.
+        distances_path: The distances csv file
+        packages_path: The packages csv file
+        chunk_size: The most records parsed and indexed at a time
+        progress: Called with (path, rows read, bytes read, total bytes) while each file streams in
     Returns:
         locations: The locations parsed from the csv file
         matrix: The matrix of distances between locations
         packages: The history of packages parsed from the csv file
 
     '''
-    locations, matrix = __get_locations()
+    locations, matrix = __get_locations(matrix_format, distances_path, chunk_size, progress)
 
-    packages, locations = __add_packages_to_locations(locations)
+    packages, locations = __add_packages_to_locations(locations, packages_path, chunk_size, progress)
 
     return locations, matrix, packages
+
+
+
+@timed
+def load_locations(
+    matrix_format: str = "list",
+    distances_path: str = DISTANCES_FILE,
+    chunk_size: int = CHUNK_SIZE,
+    progress: ProgressCallback = None,
+):
+    '''Streams the distances csv file in then returns the locations and distance matrix, without packages O(n^2)
+
+    The matrix and the address index can be shared by many days of packages, see copy_locations and
+    load_packages.
+
+    Args:
+        matrix_format: "list" for a list of lists, or "float64"/"float32" for a cached NumPy matrix.
+        distances_path: The distances csv file
+        chunk_size: The most records parsed and indexed at a time
+        progress: Called while the file streams in, see iter_csv_rows
+    Returns:
+        locations: The locations parsed from the csv file
+        matrix: The matrix of distances between locations
+
+    '''
+    return __get_locations(matrix_format, distances_path, chunk_size, progress)
+
+
+
+@timed
+def load_packages(
+    locations: Dictionary[int, Location],
+    packages_path: str = PACKAGES_FILE,
+    chunk_size: int = CHUNK_SIZE,
+    progress: ProgressCallback = None,
+):
+    '''Streams a packages csv file in and adds its packages to the locations O(n)
+
+    Args:
+        locations: The locations to add packages to, usually a copy_locations copy
+        packages_path: The packages csv file
+        chunk_size: The most packages parsed at a time
+        progress: Called while the file streams in, see iter_csv_rows
+    Returns:
+        packages: The history of packages parsed from the csv file
+
+    '''
+    packages, _ = __add_packages_to_locations(locations, packages_path, chunk_size, progress)
+    return packages
+
+
+
+def address_changes_path(packages_path: str):
+    '''Returns the file a packages file's address corrections are read from O(1)'''
+    return os.path.splitext(packages_path)[0] + ADDRESS_CHANGES_SUFFIX
+
+
+
+def load_address_changes(packages_path: str = PACKAGES_FILE) -> List[Tuple[int, str, int]]:
+    '''Reads the address corrections of the day a packages file belongs to O(n)
+
+    Each row below the header is a package id, the address it really goes to, and the time the
+    correction is known, like 9,410 S State St,10:20 AM. A day without a corrections file has none.
+
+    Args:
+        packages_path: The day's packages csv file
+    Returns:
+        changes: (package_id, new_address, effective_time) per correction, the way a scenario takes them
+
+    '''
+    path = address_changes_path(packages_path)
+    if not os.path.exists(path):
+        return []
+
+    changes = []
+    rows = iter_csv_rows(path)
+    next(rows, None)
+    for line in rows:
+        if not line or not line[0].strip():
+            continue
+        # The time is written like a deadline.
+        changes.append((int(line[0]), line[1].strip(), __strp_deadline(line[2].strip())))
+    return changes
@@ -0,0 +1,359 @@
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import List
+from hash_table import Dictionary
+from history import NO_ID, STATUSES, PackageHistory
+from models import Stop, StopReason
+from optional import optional_import
+
+
+# Rows held in memory per table before they're written out.
+BUFFER_ROWS = 4096
+
+# Stop reasons are stored as indexes into this list.
+REASONS = [StopReason.loading, StopReason.delivery]
+
+# Columns of each table as (name, array typecode). Missing ids are stored as NO_ID like the history.
+TABLES = [
+    ("history", [("package_id", "i"), ("timestamp", "i"), ("status", "b"), ("location_id", "i"), ("truck_id", "i")]),
+    ("stops", [("truck_id", "i"), ("trip", "i"), ("stop_time", "i"), ("location_id", "i"), ("travel_distance", "d"), ("reason", "b")]),
+    ("routes", [("truck_id", "i"), ("trips", "i"), ("stops", "i"), ("end_time", "i"), ("miles", "d")]),
+]
+
+# The .npy header is padded to this size so it can be rewritten in place once the row count is known.
+NPY_HEADER_BYTES = 128
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+
+def _npy_descr(typecode: str):
+    '''Returns the NumPy dtype string of an array typecode on this machine O(1)'''
+    kind = "f" if typecode == "d" else "i"
+    size = array(typecode).itemsize
+    order = "|" if size == 1 else ("<" if sys.byteorder == "little" else ">")
+    return f"{order}{kind}{size}"
+
+
+
+def _arrow_type(typecode: str):
+    '''Returns the Arrow type of an array typecode O(1)'''
+    pa = optional_import("pyarrow")
+    if typecode == "d":
+        return pa.float64()
+    return pa.int8() if typecode == "b" else pa.int32()
+
+
+
+class NpyFile:
+    '''One column streamed to a .npy file, written without NumPy.
+
+    The header is written first with room for any row count, then rewritten with the real count on
+    close, so rows can be appended as they happen and the file can be memory-mapped afterwards.
+    '''
+
+    def __init__(self, path: str, typecode: str):
+        '''Creates the file and writes a header for zero rows O(1)'''
+        self.path = path
+        self.typecode = typecode
+        self.rows = 0
+        self._file = open(path, "wb")
+        self._file.write(self._header())
+
+
+
+    def write(self, values: array):
+        '''Appends values to the file O(n)'''
+        values.tofile(self._file)
+        self.rows += len(values)
+
+
+
+    def close(self):
+        '''Rewrites the header with the row count and closes the file O(1)'''
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.close()
+
+
+
+    def _header(self):
+        '''Builds the version 1.0 .npy header, padded to NPY_HEADER_BYTES O(1)'''
+        header = f"{{'descr': '{_npy_descr(self.typecode)}', 'fortran_order': False, 'shape': ({self.rows},), }}"
+        # Magic, version, and the 2 byte length come first, the header ends with a newline.
+        header = header.ljust(NPY_HEADER_BYTES - len(NPY_MAGIC) - 2 - 1) + "\n"
+        return NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+
+
+class ColumnTable:
+    '''A table streamed to disk in batches of BUFFER_ROWS rows.
+
+    With pyarrow the table is one Arrow IPC file with a record batch per flush. Otherwise each column is
+    its own .npy file, written in pure Python.
+    '''
+
+    def __init__(self, directory: str, name: str, columns: List[tuple], arrow: bool):
+        '''Creates the table's files O(c)
+
+        Args:
+            directory: folder the files go in
+            name: the table name, used for the file names
+            columns: (name, array typecode) per column
+            arrow: write an Arrow file instead of .npy files
+
+        '''
+        self.name = name
+        self.columns = columns
+        self.rows = 0
+        self._buffers = [array(typecode) for _, typecode in columns]
+        self._writer = None
+        self._npy_files: List[NpyFile] = []
+
+        if arrow:
+            pa = optional_import("pyarrow")
+            self.files = [f"{name}.arrow"]
+            self._schema = pa.schema([(column, _arrow_type(typecode)) for column, typecode in columns])
+            self._writer = pa.ipc.new_file(os.path.join(directory, self.files[0]), self._schema)
+        else:
+            self.files = [f"{name}.{column}.npy" for column, _ in columns]
+            for file, (_, typecode) in zip(self.files, columns):
+                self._npy_files.append(NpyFile(os.path.join(directory, file), typecode))
+
+
+
+    def append(self, *values):
+        '''Adds a row, writing the buffered rows out once there are BUFFER_ROWS of them O(c)'''
+        for buffer, value in zip(self._buffers, values):
+            buffer.append(value)
+        if len(self._buffers[0]) >= BUFFER_ROWS:
+            self.flush()
+
+
+
+    def flush(self):
+        '''Writes the buffered rows out O(c*n)'''
+        count = len(self._buffers[0])
+        if count == 0:
+            return
+
+        if self._writer is not None:
+            pa = optional_import("pyarrow")
+            arrays = [pa.array(buffer, type=_arrow_type(buffer.typecode)) for buffer in self._buffers]
+            self._writer.write_batch(pa.record_batch(arrays, schema=self._schema))
+        else:
+            for file, buffer in zip(self._npy_files, self._buffers):
+                file.write(buffer)
+
+        self.rows += count
+        self._buffers = [array(buffer.typecode) for buffer in self._buffers]
+
+
+
+    def close(self):
+        '''Writes the rest of the rows and closes the files O(c*n)'''
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+        for file in self._npy_files:
+            file.close()
+
+
+
+
+class ResultExporter:
+    '''Streams a run's package history, stops, and per-truck routes into a folder of column files.
+
+    Rows are added while the run goes and written in batches, so memory stays at BUFFER_ROWS rows per
+    table. close writes manifest.json, which lists each table's files, column types, and row count,
+    and the names behind the status and reason codes. Use load_results to read the folder back.
+    '''
+
+    def __init__(self, directory: str, arrow: bool = None):
+        '''Creates the folder and the empty tables O(1)
+
+        Args:
+            directory: folder to write to, created if it doesn't exist
+            arrow: write Arrow files, by default only when pyarrow is installed
+
+        '''
+        # pyarrow is only needed to write Arrow files.
+        pa = optional_import("pyarrow")
+        if arrow is None:
+            arrow = pa is not None
+        if arrow and pa is None:
+            raise ImportError("pyarrow is needed to export Arrow files")
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.arrow = arrow
+        self.closed = False
+        self.tables = Dictionary[str, ColumnTable]()
+        for name, columns in TABLES:
+            self.tables[name] = ColumnTable(directory, name, columns, arrow)
+
+        # The next history row to export.
+        self._history_row = 0
+
+
+
+    def __enter__(self):
+        '''Returns the exporter for a with block O(1)'''
+        return self
+
+
+
+    def __exit__(self, *_):
+        '''Closes the exporter at the end of a with block O(n)'''
+        self.close()
+
+
+
+    def add_history(self, packages: PackageHistory):
+        '''Exports the history rows recorded since the last call O(r)
+
+        Args:
+            packages: package history, rows are exported as they were recorded
+
+        '''
+        table = self.tables["history"]
+        for row in range(self._history_row, packages.row_count): # O(r)
+            table.append(
+                packages.package_ids[row],
+                packages.timestamps[row],
+                packages.statuses[row],
+                packages.location_ids[row],
+                packages.truck_ids[row],
+            )
+        self._history_row = packages.row_count
+
+
+
+    def add_stop(self, truck_id: int, trip: int, stop: Stop):
+        '''Exports one stop O(1)
+
+        Args:
+            truck_id: the truck that made the stop
+            trip: index of the trip the stop is in
+            stop: the stop
+
+        '''
+        self.tables["stops"].append(
+            truck_id,
+            trip,
+            stop.stop_time,
+            stop.location.location_id,
+            float(stop.travel_distance),
+            REASONS.index(stop.reason),
+        )
+
+
+
+    def add_route(self, truck_id: int, routes: List[List[Stop]], end_time: int, miles: float):
+        '''Exports a truck's totals, its stops are exported with add_stop O(t)
+
+        Args:
+            truck_id: the truck
+            routes: the truck's trips
+            end_time: seconds since the start of the day the truck finished
+            miles: the distance the truck drove
+
+        '''
+        self.tables["routes"].append(truck_id, len(routes), sum(len(trip) for trip in routes), end_time, float(miles))
+
+
+
+    def add_routes(self, truck_id: int, routes: List[List[Stop]], end_time: int, miles: float):
+        '''Exports a finished truck's stops and totals O(s)
+
+        Args:
+            truck_id: the truck
+            routes: the truck's trips
+            end_time: seconds since the start of the day the truck finished
+            miles: the distance the truck drove
+
+        '''
+        for trip, stops in enumerate(routes):
+            for stop in stops:
+                self.add_stop(truck_id, trip, stop)
+        self.add_route(truck_id, routes, end_time, miles)
+
+
+
+    def close(self):
+        '''Writes the rest of every table and the manifest O(n)'''
+        if self.closed:
+            return
+        self.closed = True
+
+        manifest = {
+            "format": "arrow" if self.arrow else "npy",
+            "no_id": NO_ID,
+            "statuses": [status.value for status in STATUSES],
+            "reasons": REASONS,
+            "tables": {},
+        }
+        for name, columns in TABLES:
+            table = self.tables[name]
+            table.close()
+            manifest["tables"][name] = {
+                "rows": table.rows,
+                "files": table.files,
+                "columns": [{"name": column, "dtype": _npy_descr(typecode)} for column, typecode in columns],
+            }
+
+        with open(os.path.join(self.directory, "manifest.json"), "w") as file:
+            json.dump(manifest, file, indent=2)
+
+
+
+
+def load_results(directory: str):
+    '''Reads a folder written by ResultExporter, memory-mapping the columns when NumPy is installed O(c)
+
+    Without NumPy the .npy columns are read into arrays, which takes O(n).
+
+    Args:
+        directory: folder written by ResultExporter
+    Returns:
+        tables: table name -> column name -> column values
+
+    '''
+    with open(os.path.join(directory, "manifest.json")) as file:
+        manifest = json.load(file)
+
+    # NumPy is only needed to memory-map the columns, pyarrow to read Arrow files.
+    np = optional_import("numpy")
+    pa = optional_import("pyarrow") if manifest["format"] == "arrow" else None
+
+    tables = Dictionary[str, Dictionary[str, object]]()
+    for name, table in manifest["tables"].items():
+        columns = Dictionary[str, object]()
+        tables[name] = columns
+
+        # An Arrow file is mapped once and each column is taken from it.
+        if manifest["format"] == "arrow":
+            if pa is None:
+                raise ImportError("pyarrow is needed to read Arrow files")
+            source = pa.memory_map(os.path.join(directory, table["files"][0]))
+            arrow_table = pa.ipc.open_file(source).read_all()
+            for column in table["columns"]:
+                values = arrow_table.column(column["name"])
+                columns[column["name"]] = values.to_numpy() if np is not None else values.to_pylist()
+            continue
+
+        typecodes = [typecode for table_name, spec in TABLES if table_name == name for _, typecode in spec]
+        for file, column, typecode in zip(table["files"], table["columns"], typecodes):
+            path = os.path.join(directory, file)
+            if np is not None:
+                columns[column["name"]] = np.load(path, mmap_mode="r")
+                continue
+            values = array(typecode)
+            with open(path, "rb") as npy:
+                npy.seek(NPY_HEADER_BYTES)
+                values.fromfile(npy, table["rows"])
+            columns[column["name"]] = values
+    return tables
@@ -1,11 +1,70 @@
+from datetime import date, datetime, time
 
-from datetime import datetime
+# Clock times of the day's events. The date is only looked up when a datetime is needed, so
+# importing this module doesn't depend on the day it happens on, see start_of_day.
+START_OF_DAY_CLOCK = time(hour = 8)
+END_OF_DAY_CLOCK = time(hour = 17)
+INCORRECT_ADDRESS_UPDATE_CLOCK = time(hour = 10, minute = 20)
+DELAYED_FLIGHT_ARRIVAL_CLOCK = time(hour = 9, minute = 5)
 
-TODAY = datetime.today().replace(hour = 0, minute = 0, second = 0, microsecond = 0)
-START_OF_DAY = TODAY.replace(hour = 8)
-END_OF_DAY = START_OF_DAY.replace(hour=17)
-SECONDS_IN_DAY = (END_OF_DAY - START_OF_DAY).total_seconds()
-INCORRECT_ADDRESS_UPDATE_TIME = TODAY.replace(hour = 10, minute = 20)
 
+MPH = 18
+TRUCK_CAPACITY = 16
+SECONDS_PER_HOUR = 3600
 
-MPH = 18
\ No newline at end of file
+
+
+def clock_seconds(clock: time):
+    '''Returns the seconds since midnight of a clock time O(1)'''
+    return clock.hour * 3600 + clock.minute * 60 + clock.second
+
+
+
+# The simulation keeps time as whole seconds offset from START_OF_DAY so the hot paths
+# only do integer math. Datetimes are only built when something is displayed.
+START_OF_DAY_CLOCK_SECONDS = clock_seconds(START_OF_DAY_CLOCK)
+START_OF_DAY_SECONDS = 0
+END_OF_DAY_SECONDS = clock_seconds(END_OF_DAY_CLOCK) - START_OF_DAY_CLOCK_SECONDS
+SECONDS_IN_DAY = float(END_OF_DAY_SECONDS)
+TODAY_SECONDS = -START_OF_DAY_CLOCK_SECONDS
+INCORRECT_ADDRESS_UPDATE_SECONDS = clock_seconds(INCORRECT_ADDRESS_UPDATE_CLOCK) - START_OF_DAY_CLOCK_SECONDS
+DELAYED_FLIGHT_ARRIVAL_SECONDS = clock_seconds(DELAYED_FLIGHT_ARRIVAL_CLOCK) - START_OF_DAY_CLOCK_SECONDS
+
+
+
+def drive_seconds(distance: float):
+    '''Returns the time a truck takes to drive a distance in whole seconds O(1)'''
+    return round(float(distance) / MPH * SECONDS_PER_HOUR)
+
+
+
+def travel_seconds(matrix, from_id: int, to_id: int):
+    '''Returns the travel time between two locations of a distance matrix in whole seconds, zero for staying put O(1)'''
+    if from_id == to_id:
+        return 0
+    return drive_seconds(matrix[from_id][to_id])
+
+
+
+def start_of_day():
+    '''Returns the start of the day as a datetime on today's date O(1)'''
+    return datetime.combine(date.today(), START_OF_DAY_CLOCK)
+
+
+
+# The datetime constants this module used to set at import, built from the clock time on access.
+_CLOCKS = {
+    "TODAY": time(),
+    "START_OF_DAY": START_OF_DAY_CLOCK,
+    "END_OF_DAY": END_OF_DAY_CLOCK,
+    "INCORRECT_ADDRESS_UPDATE_TIME": INCORRECT_ADDRESS_UPDATE_CLOCK,
+    "DELAYED_FLIGHT_ARRIVAL_TIME": DELAYED_FLIGHT_ARRIVAL_CLOCK,
+}
+
+
+
+def __getattr__(name: str):
+    '''Builds TODAY, START_OF_DAY and the other datetimes on today's date when they're used O(1)'''
+    if name in _CLOCKS:
+        return datetime.combine(date.today(), _CLOCKS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,19 +1,40 @@
-from typing import List, Generic
+from typing import Iterator, List, Generic, Tuple
 from models import KT, VT, Entry
 
 
 class Dictionary(Generic[KT, VT]):
-    def __init__(self, capacity=7):
+    def __new__(cls, capacity=7, open_addressing=False):
+        '''Picks the table engine for a new dictionary O(1)
+
+        Args:
+            capacity: The initial capacity of the dictionary. Defaults to 7.
+            open_addressing: Use the array backed open addressing engine instead of chained buckets.
+        Returns:
+            Dictionary[KT,VT]): An empty dictionary of the requested engine
+
+        '''
+        # Only swap the engine when the base class is constructed so subclasses keep their own type.
+        if open_addressing and cls is Dictionary:
+            cls = OpenAddressingDictionary
+        return super().__new__(cls)
+
+
+
+    def __init__(self, capacity=7, open_addressing=False):
         '''Creates a new dictionary with the given capacity O(n)
 
         Args:
             capacity: The initial capacity of the dictionary. Defaults to 7.
+            open_addressing: Handled by __new__, see OpenAddressingDictionary.
         Returns:
             Dictionary[KT,VT]): A new dictionary with the given capacity
 
         '''
         self._table: List[List[Entry[KT, VT]]] = [[] for i in range(0, capacity)]
 
+        # Track the number of entries so len() doesn't have to walk the buckets.
+        self._count = 0
+
 
 
     @property
@@ -52,6 +73,45 @@ class Dictionary(Generic[KT, VT]):
 
 
 
+    def iter_keys(self) -> Iterator[KT]:
+        '''Lazily yields every key in the dictionary without building a list O(n)
+
+        Returns:
+            (Iterator[KT]): The keys in bucket order
+
+        '''
+        for b in self._table:
+            for e in b:
+                yield e.key
+
+
+
+    def iter_values(self) -> Iterator[VT]:
+        '''Lazily yields every value in the dictionary without building a list O(n)
+
+        Returns:
+            (Iterator[VT]): The values in bucket order
+
+        '''
+        for b in self._table:
+            for e in b:
+                yield e.value
+
+
+
+    def iter_items(self) -> Iterator[Tuple[KT, VT]]:
+        '''Lazily yields every (key, value) pair in the dictionary without building a list O(n)
+
+        Returns:
+            (Iterator[Tuple[KT, VT]]): The key value pairs in bucket order
+
+        '''
+        for b in self._table:
+            for e in b:
+                yield e.key, e.value
+
+
+
     def __str__(self):
         '''Returns a string representation of the dictionary O(n*log(n))
         
@@ -63,8 +123,8 @@ class Dictionary(Generic[KT, VT]):
 
         # Sort the entries by key to order the values in the output string.
         # For each entry add the key and value indented on a new line.
-        for e in sorted(self.entries, key=lambda e: e.key): # O(n*log(n))
-            result += f'\n\r    {e.key}: "{e.value}",'
+        for key, value in sorted(self.iter_items(), key=lambda item: item[0]): # O(n*log(n))
+            result += f'\n\r    {key}: "{value}",'
         
         # Add a closing brace on a new line.
         result += "\n}"
@@ -113,6 +173,7 @@ class Dictionary(Generic[KT, VT]):
                 
             # Otherwise, add the entry.
             bucket.append(Entry(key, value))
+            self._count += 1
 
 
 
@@ -123,7 +184,7 @@ class Dictionary(Generic[KT, VT]):
             (int): The number of entries in the dictionary
 
         '''
-        return len(self.entries)
+        return self._count
 
 
 
@@ -158,10 +219,35 @@ class Dictionary(Generic[KT, VT]):
         for i, e in enumerate(b): # O(n)
             if e.key == key:
                 del b[i]
+                self._count -= 1
                 return
 
 
 
+    def __reduce__(self):
+        '''Pickles the entries instead of the table, see _rebuild O(n)'''
+        return _rebuild, (type(self), self._size(), list(self.iter_items()))
+
+
+
+    def _size(self):
+        '''Returns the number of buckets O(1)'''
+        return len(self._table)
+
+
+
+    def _reset(self, size: int):
+        '''Empties the dictionary into a table of the given size O(n)
+
+        Args:
+            size: The number of buckets
+
+        '''
+        self._table = [[] for i in range(0, size)]
+        self._count = 0
+
+
+
     def _bucket_idx(self, key: KT):
         '''Returns the index of the bucket for the given key O(1)
         
@@ -196,12 +282,17 @@ class Dictionary(Generic[KT, VT]):
         cur_cap = len(self._table)
         capacity = self._next_prime(cur_cap)
 
+        # Keep the current buckets before the table is replaced, otherwise the entries would be lost.
+        old_table = self._table
+
         # Create a new table with the number of buckets being equal to the new capacity
         self._table = [[] for i in range(0, capacity)]
+        self._count = 0
 
         # Reassign all entries into the new table
-        for e in self.entries: # O(n)
-            self[e.key] = e.value
+        for b in old_table: # O(n)
+            for e in b:
+                self[e.key] = e.value
 
 
 
@@ -247,3 +338,345 @@ class Dictionary(Generic[KT, VT]):
             inc = 2
             
         return n > 1
+
+
+
+# Sentinels for open addressing slots. A deleted slot (tombstone) keeps probe chains intact
+# so keys that were placed after it can still be found.
+_EMPTY = object()
+_DELETED = object()
+
+
+
+class OpenAddressingDictionary(Dictionary[KT, VT]):
+    '''Dictionary engine that stores keys, values, and hashes in parallel arrays and resolves
+    collisions with linear probing instead of chaining buckets of Entry objects.
+
+    Create one with Dictionary(open_addressing=True) so callers only change a constructor argument.
+    '''
+
+    # Resize once this fraction of the slots are either used or tombstones.
+    MAX_LOAD_FACTOR = 2 / 3
+
+
+
+    def __init__(self, capacity=7, open_addressing=True):
+        '''Creates a new open addressing dictionary with room for at least the given capacity O(n)
+
+        Args:
+            capacity: The minimum number of entries to hold before resizing. Defaults to 7.
+            open_addressing: Ignored, kept so the signature matches Dictionary.
+
+        '''
+        self._count = 0
+        self._tombstones = 0
+        self._allocate(self._slots_for(capacity))
+
+
+
+    @property
+    def entries(self) -> List[Entry[KT, VT]]:
+        '''Returns a list of all entries in the dictionary O(n)
+
+        Returns:
+            (List[Entry[KT, VT]]): A list of all entries in the dictionary
+
+        '''
+        return [Entry(k, v) for k, v in zip(self._keys, self._values) if k is not _EMPTY and k is not _DELETED]
+
+
+
+    @property
+    def values(self) -> List[VT]:
+        '''Returns a list of all values in the dictionary O(n)
+
+        Returns:
+            (List[VT]): A list of all values in the dictionary
+
+        '''
+        return [v for k, v in zip(self._keys, self._values) if k is not _EMPTY and k is not _DELETED]
+
+
+
+    @property
+    def keys(self) -> List[KT]:
+        '''Returns a list of all keys in the dictionary O(n)
+
+        Returns:
+            (List[KT]): A list of all keys in the dictionary
+
+        '''
+        return [k for k in self._keys if k is not _EMPTY and k is not _DELETED]
+
+
+
+    def iter_keys(self) -> Iterator[KT]:
+        '''Lazily yields every key in the dictionary without building a list O(n)
+
+        Returns:
+            (Iterator[KT]): The keys in slot order
+
+        '''
+        for k in self._keys:
+            if k is not _EMPTY and k is not _DELETED:
+                yield k
+
+
+
+    def iter_values(self) -> Iterator[VT]:
+        '''Lazily yields every value in the dictionary without building a list O(n)
+
+        Returns:
+            (Iterator[VT]): The values in slot order
+
+        '''
+        for k, v in zip(self._keys, self._values):
+            if k is not _EMPTY and k is not _DELETED:
+                yield v
+
+
+
+    def iter_items(self) -> Iterator[Tuple[KT, VT]]:
+        '''Lazily yields every (key, value) pair in the dictionary without building a list O(n)
+
+        Returns:
+            (Iterator[Tuple[KT, VT]]): The key value pairs in slot order
+
+        '''
+        for k, v in zip(self._keys, self._values):
+            if k is not _EMPTY and k is not _DELETED:
+                yield k, v
+
+
+
+    def __getitem__(self, key: KT) -> VT:
+        '''Returns the value associated with the given key O(1) average
+
+        Args:
+            key: The key to search for
+        Returns:
+            (VT): The value associated with the given key, or None when it is missing
+
+        '''
+        idx = self._find_slot(key, hash(key))
+        if idx < 0:
+            return None
+        return self._values[idx]
+
+
+
+    def __setitem__(self, key: KT, value: VT):
+        '''Sets the value associated with the given key O(1) amortized
+
+        Args:
+            key: The key to set
+            value: The value to set
+
+        '''
+        h = hash(key)
+
+        # If the key already exists, only the value changes.
+        idx = self._find_slot(key, h)
+        if idx >= 0:
+            self._values[idx] = value
+            return
+
+        # Resize before inserting if the new entry would push the table past its load factor.
+        if (self._count + self._tombstones + 1) > len(self._keys) * self.MAX_LOAD_FACTOR:
+            self._resize(self._slots_for(self._count + 1))
+
+        self._insert_new(key, value, h)
+
+
+
+    def __len__(self):
+        '''Returns the number of entries in the dictionary O(1)
+
+        Returns:
+            (int): The number of entries in the dictionary
+
+        '''
+        return self._count
+
+
+
+    def __contains__(self, key: KT):
+        '''Returns whether or not the dictionary contains the given key O(1) average
+
+        Args:
+            key: The key to search for
+        Returns:
+            (bool): Whether or not the dictionary contains the given key
+
+        '''
+        return self._find_slot(key, hash(key)) >= 0
+
+
+
+    def __delitem__(self, key: KT):
+        '''Deletes the entry with the given key by leaving a tombstone in its slot O(1) average
+
+        Args:
+            key: The key to delete
+
+        '''
+        idx = self._find_slot(key, hash(key))
+        if idx < 0:
+            return
+
+        self._keys[idx] = _DELETED
+        self._values[idx] = None
+        self._count -= 1
+        self._tombstones += 1
+
+
+
+    def _slots_for(self, capacity: int):
+        '''Returns the smallest power of two slot count that holds capacity entries under the load factor O(log(n))
+
+        Args:
+            capacity: The number of entries that must fit
+        Returns:
+            (int): The number of slots to allocate
+
+        '''
+        slots = 8
+        while capacity > slots * self.MAX_LOAD_FACTOR:
+            slots *= 2
+        return slots
+
+
+
+    def _allocate(self, slots: int):
+        '''Replaces the slot arrays with empty arrays of the given size O(n)
+
+        Args:
+            slots: The number of slots, must be a power of two
+
+        '''
+        self._keys: List[KT] = [_EMPTY] * slots
+        self._values: List[VT] = [None] * slots
+        self._hashes: List[int] = [0] * slots
+        self._mask = slots - 1
+        self._tombstones = 0
+
+
+
+    def _find_slot(self, key: KT, h: int):
+        '''Returns the slot index holding the given key or -1 if it is missing O(1) average
+
+        Args:
+            key: The key to search for
+            h: The hash of the key
+        Returns:
+            (int): The slot index or -1
+
+        '''
+        keys = self._keys
+        hashes = self._hashes
+        mask = self._mask
+        idx = h & mask
+
+        # Walk the probe chain until an empty slot ends it. Tombstones are skipped, not stopped on.
+        while True:
+            k = keys[idx]
+            if k is _EMPTY:
+                return -1
+            if k is not _DELETED and hashes[idx] == h and (k is key or k == key):
+                return idx
+            idx = (idx + 1) & mask
+
+
+
+    def _insert_new(self, key: KT, value: VT, h: int):
+        '''Places a key that is known to be missing into the first free slot of its probe chain O(1) average
+
+        Args:
+            key: The key to insert
+            value: The value to insert
+            h: The hash of the key
+
+        '''
+        keys = self._keys
+        mask = self._mask
+        idx = h & mask
+
+        while keys[idx] is not _EMPTY and keys[idx] is not _DELETED:
+            idx = (idx + 1) & mask
+
+        # Reusing a tombstone frees it up again.
+        if keys[idx] is _DELETED:
+            self._tombstones -= 1
+
+        keys[idx] = key
+        self._values[idx] = value
+        self._hashes[idx] = h
+        self._count += 1
+
+
+
+    def _resize(self, slots: int):
+        '''Rehashes every live entry into new arrays of the given size, dropping tombstones O(n)
+
+        Args:
+            slots: The new number of slots
+
+        '''
+        old_keys = self._keys
+        old_values = self._values
+        old_hashes = self._hashes
+
+        self._allocate(slots)
+        self._count = 0
+
+        # Cached hashes mean the keys never need to be hashed again.
+        for k, v, h in zip(old_keys, old_values, old_hashes): # O(n)
+            if k is not _EMPTY and k is not _DELETED:
+                self._insert_new(k, v, h)
+
+
+
+    def _grow(self):
+        '''Doubles the number of slots O(n)'''
+        self._resize(len(self._keys) * 2)
+
+
+
+    def _size(self):
+        '''Returns the number of slots O(1)'''
+        return len(self._keys)
+
+
+
+    def _reset(self, size: int):
+        '''Empties the dictionary into arrays of the given size O(n)
+
+        Args:
+            size: The number of slots, must be a power of two
+
+        '''
+        self._allocate(size)
+        self._count = 0
+
+
+
+def _rebuild(cls, size: int, items: List[Tuple[KT, VT]]):
+    '''Recreates a pickled dictionary by inserting its entries again O(n)
+
+    String hashes change between processes and the open addressing sentinels are only the same
+    objects in the process that made them, so the table itself can't be pickled. Inserting the
+    entries in their old order into a table of the old size keeps the iteration order.
+
+    Args:
+        cls: Dictionary or OpenAddressingDictionary
+        size: The number of buckets or slots the pickled dictionary had
+        items: The (key, value) pairs in iteration order
+    Returns:
+        (Dictionary[KT,VT]): The new dictionary
+
+    '''
+    dictionary = cls()
+    dictionary._reset(size)
+    for key, value in items:
+        dictionary[key] = value
+    return dictionary
@@ -0,0 +1,789 @@
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple
+from hash_table import Dictionary
+from models import DeliveryStatus, Location, Package, PackageUpdate
+
+
+# Status codes stored in the history are indexes into this list.
+STATUSES = list(DeliveryStatus)
+STATUS_CODES = Dictionary[DeliveryStatus, int]()
+for code, status in enumerate(STATUSES):
+    STATUS_CODES[status] = code
+
+# Typed arrays can't hold None, so missing ids and rows are stored as -1.
+NO_ID = -1
+
+# Deadlines are indexed in buckets of this many seconds, see PackageIndex.
+DEADLINE_BUCKET_SECONDS = 1800
+
+
+
+class PackageHistory:
+    '''Compact store of every package's status history.
+
+    The attributes that never change (weight, notes, earliest, latest) are kept once per package
+    in columns. Each status change is a row of (timestamp, status, location_id, truck_id) in parallel
+    typed arrays, linked to the package's previous row. Package and PackageUpdate objects are only
+    rebuilt when someone asks for them.
+    '''
+
+    def __init__(self):
+        '''Creates an empty history O(1)'''
+        # Package id -> the package's slot in the attribute columns.
+        self._slots = Dictionary[int, int](open_addressing=True)
+
+        # Attribute columns, one entry per package. Strings are interned so repeated weights and notes are shared.
+        self._package_ids = array("i")
+        self._weights: List[str] = []
+        self._notes: List[str] = []
+        self._earliest = array("i")
+        self._latest = array("i")
+        self._last_rows = array("i")
+
+        # Status change rows, one entry per update. Each row points at the same package's previous row.
+        self.package_ids = array("i")
+        self.timestamps = array("i")
+        self.statuses = array("b")
+        self.location_ids = array("i")
+        self.truck_ids = array("i")
+        self._prev_rows = array("i")
+
+        # Truck id -> the rows recorded with that truck, in the order they were recorded.
+        self._truck_rows = Dictionary[int, array](open_addressing=True)
+
+        # Built on the first snapshot query and rebuilt only after new rows are recorded.
+        self._snapshot_index: SnapshotIndex = None
+
+        # Kept up to date with every package's latest row once build_index is called.
+        self.index: PackageIndex = None
+
+
+
+    def __len__(self):
+        '''Returns the number of packages in the history O(1)'''
+        return len(self._package_ids)
+
+
+
+    def __contains__(self, package_id: int):
+        '''Returns whether or not the history has the given package O(1)'''
+        return package_id in self._slots
+
+
+
+    def __getitem__(self, package_id: int) -> List[PackageUpdate]:
+        '''Returns every update of a package, oldest first O(k) where k is the package's update count
+
+        Args:
+            package_id: The package to look up
+        Returns:
+            (List[PackageUpdate]): The rebuilt updates or None if the package is unknown
+
+        '''
+        slot = self._slots[package_id]
+        if slot is None:
+            return None
+        return [self._update(row) for row in reversed(self._rows(slot))]
+
+
+
+    @property
+    def row_count(self):
+        '''Returns the number of recorded status changes across all packages O(1)'''
+        return len(self.timestamps)
+
+
+
+    def iter_package_ids(self) -> Iterator[int]:
+        '''Lazily yields every package id in the order the packages were added O(n)'''
+        return iter(self._package_ids)
+
+
+
+    def add(self, package: Package, timestamp: int, truck_id: int = None):
+        '''Adds a new package and records its starting status O(1)
+
+        Args:
+            package: The package with its starting location and status
+            timestamp: Seconds since the start of the day the package was loaded
+            truck_id: The truck the package starts on, if any
+
+        '''
+        slot = len(self._package_ids)
+        self._slots[package.package_id] = slot
+        self._package_ids.append(package.package_id)
+        self._weights.append(sys.intern(package.weight))
+        self._notes.append(sys.intern(package.notes))
+        self._earliest.append(package.earliest)
+        self._latest.append(package.latest)
+        self._last_rows.append(NO_ID)
+        self._append(slot, timestamp, package.status, package.location_id, truck_id)
+
+
+
+    def record(
+        self,
+        package_id: int,
+        timestamp: int,
+        status: DeliveryStatus = None,
+        location_id: int = None,
+        truck_id: int = None,
+    ):
+        '''Records a status change, carrying forward anything that isn't given O(1)
+
+        Args:
+            package_id: The package that changed
+            timestamp: Seconds since the start of the day of the change
+            status: The new status
+            location_id: The new delivery location
+            truck_id: The truck the package is on
+        Returns:
+            (Package): A view of the package after the change
+
+        '''
+        slot = self._slots[package_id]
+        last = self._last_rows[slot]
+
+        if status is None:
+            status = STATUSES[self.statuses[last]]
+        if location_id is None:
+            location_id = self._id_or_none(self.location_ids[last])
+        if truck_id is None:
+            truck_id = self._id_or_none(self.truck_ids[last])
+
+        row = self._append(slot, timestamp, status, location_id, truck_id)
+        return self._package(row)
+
+
+
+    def insert(
+        self,
+        package_id: int,
+        timestamp: int,
+        status: DeliveryStatus = None,
+        location_id: int = None,
+        truck_id: int = None,
+    ):
+        '''Records a status change that may be older than the package's newest rows O(k)
+
+        The row is linked in after the package's last row at or before the timestamp, so update_at and
+        latest stay in time order. Anything that isn't given is carried forward from that row.
+
+        Args:
+            package_id: The package that changed
+            timestamp: Seconds since the start of the day of the change
+            status: The new status
+            location_id: The new delivery location
+            truck_id: The truck the package is on
+        Returns:
+            (int): The index of the new row
+
+        '''
+        slot = self._slots[package_id]
+
+        # Find the newest row that isn't after the timestamp, and the row after it if there is one.
+        later = NO_ID
+        row = self._last_rows[slot]
+        while row != NO_ID and self.timestamps[row] > timestamp: # O(k)
+            later, row = row, self._prev_rows[row]
+
+        if row != NO_ID:
+            if status is None:
+                status = STATUSES[self.statuses[row]]
+            if location_id is None:
+                location_id = self._id_or_none(self.location_ids[row])
+            if truck_id is None:
+                truck_id = self._id_or_none(self.truck_ids[row])
+
+        new_row = self._append(slot, timestamp, status, location_id, truck_id)
+
+        # _append linked the row last, move it in front of the later rows.
+        if later != NO_ID:
+            self._last_rows[slot] = self._prev_rows[new_row]
+            self._prev_rows[new_row] = self._prev_rows[later]
+            self._prev_rows[later] = new_row
+            if self.index is not None:
+                self.index.update(slot)
+        return new_row
+
+
+
+    def rows(self, package_id: int):
+        '''Returns a package's row indexes, oldest first O(k)
+
+        Args:
+            package_id: The package to look up
+        Returns:
+            (List[int]): The row indexes
+
+        '''
+        return list(reversed(self._rows(self._slots[package_id])))
+
+
+
+    def row_update(self, row: int):
+        '''Returns the update view of a row O(1)
+
+        Args:
+            row: The row index
+        Returns:
+            (PackageUpdate): The timestamp, package view, and truck of the row
+
+        '''
+        return self._update(row)
+
+
+
+    def amend(self, row: int, timestamp: int = None, location_id: int = None):
+        '''Changes the time or location of a recorded row in place O(1)
+
+        The new time must keep the row between the package's rows before and after it.
+
+        Args:
+            row: The row index
+            timestamp: The new seconds since the start of the day
+            location_id: The new delivery location
+
+        '''
+        if timestamp is not None:
+            self.timestamps[row] = timestamp
+        if location_id is not None:
+            self.location_ids[row] = location_id
+            if self.index is not None:
+                self.index.update(self._slots[self.package_ids[row]])
+        self._snapshot_index = None
+
+
+
+    def truck_rows(self, truck_id: int):
+        '''Returns the rows recorded with a truck, in the order they were recorded O(1)
+
+        Args:
+            truck_id: The truck to look up
+        Returns:
+            (array): The row indexes, empty if the truck has none
+
+        '''
+        rows = self._truck_rows[truck_id]
+        return array("i") if rows is None else rows
+
+
+
+    def retime(self, moves: List[Tuple[int, int]]):
+        '''Moves each given row to its new time O(m)
+
+        Used when a stop is added to a truck's route and every later stop shifts. The times must not
+        change the order of a package's rows.
+
+        Args:
+            moves: (row index, new seconds since the start of the day) per row that moves
+        Returns:
+            (List[tuple]): (old timestamp, PackageUpdate after the move) for each moved row
+
+        '''
+        moved = []
+        timestamps = self.timestamps
+        for row, new_time in moves: # O(m)
+            if new_time != timestamps[row]:
+                old_time = timestamps[row]
+                timestamps[row] = new_time
+                moved.append((old_time, self._update(row)))
+        if moved:
+            self._snapshot_index = None
+        return moved
+
+
+
+    def rows_since(self, row: int):
+        '''Returns the rows recorded from the given row index on, for copying into another history O(r)
+
+        Args:
+            row: The first row index to return, usually an earlier row_count
+        Returns:
+            (List[tuple]): (package_id, timestamp, status, location_id, truck_id) per row
+
+        '''
+        return [
+            (
+                self.package_ids[r],
+                self.timestamps[r],
+                STATUSES[self.statuses[r]],
+                self._id_or_none(self.location_ids[r]),
+                self._id_or_none(self.truck_ids[r]),
+            )
+            for r in range(row, self.row_count)
+        ]
+
+
+
+    def extend(self, rows: List[tuple]):
+        '''Appends rows returned by rows_since, in order O(r)
+
+        Args:
+            rows: (package_id, timestamp, status, location_id, truck_id) per row
+
+        '''
+        for package_id, timestamp, status, location_id, truck_id in rows:
+            self._append(self._slots[package_id], timestamp, status, location_id, truck_id)
+
+
+
+    def latest(self, package_id: int):
+        '''Returns a view of the package as of its most recent update O(1)
+
+        Args:
+            package_id: The package to look up
+        Returns:
+            (PackageUpdate): The latest update
+
+        '''
+        return self._update(self._last_rows[self._slots[package_id]])
+
+
+
+    def update_at(self, package_id: int, timestamp: int):
+        '''Returns a view of the package's most recent update at or before the given time O(k)
+
+        Args:
+            package_id: The package to look up
+            timestamp: Seconds since the start of the day
+        Returns:
+            (PackageUpdate): The update in effect at that time, or None if the package had no updates yet
+
+        '''
+        # Walk back from the newest row until one isn't in the future.
+        row = self._last_rows[self._slots[package_id]]
+        while row != NO_ID:
+            if self.timestamps[row] <= timestamp:
+                return self._update(row)
+            row = self._prev_rows[row]
+        return None
+
+
+
+    @property
+    def snapshot_index(self):
+        '''Returns the index used for time queries, rebuilding it if rows were recorded since O(r*log(r))
+
+        Returns:
+            (SnapshotIndex): An index over every row recorded so far
+
+        '''
+        if self._snapshot_index is None or self._snapshot_index.row_count != self.row_count:
+            self._snapshot_index = SnapshotIndex(self)
+        return self._snapshot_index
+
+
+
+    def snapshot(self, timestamp: int) -> List[PackageUpdate]:
+        '''Returns the update in effect for every package at the given time O(n*log(k))
+
+        Args:
+            timestamp: Seconds since the start of the day
+        Returns:
+            (List[PackageUpdate]): One update per package ordered by package id, None for a package without updates yet
+
+        '''
+        return [self._update_or_none(row) for row in self.snapshot_index.rows_at(timestamp)]
+
+
+
+    def snapshots(self, timestamps: List[int]) -> List[List[PackageUpdate]]:
+        '''Returns a snapshot for each of many times with one pass over every package's updates O(n*(k+m) + m*log(m))
+
+        Args:
+            timestamps: Seconds since the start of the day, in any order
+        Returns:
+            (List[List[PackageUpdate]]): The snapshot for each time, in the same order as timestamps
+
+        '''
+        return [[self._update_or_none(row) for row in rows] for rows in self.snapshot_index.rows_at_many(timestamps)]
+
+
+
+    def build_index(self, locations: Dictionary[int, Location]):
+        '''Indexes every package's latest status, truck, location, zip code, and deadline O(n)
+
+        From then on every recorded row updates the index, see PackageIndex.
+
+        Args:
+            locations: locations by id, for the zip codes
+        Returns:
+            (PackageIndex): The index, also kept as self.index
+
+        '''
+        self.index = PackageIndex(self, locations)
+        return self.index
+
+
+
+    def find(
+        self,
+        statuses: Iterable[DeliveryStatus] = None,
+        truck_id: int = None,
+        location_id: int = None,
+        postal_code: str = None,
+        due_before: int = None,
+    ):
+        '''Returns the packages whose latest update matches every given field O(r*log(r)) for r results
+
+        Needs build_index to have been called first.
+
+        Args:
+            statuses: any of these statuses
+            truck_id: on or delivered by this truck
+            location_id: going to this location
+            postal_code: going to this zip code
+            due_before: with a deadline before these seconds since the start of the day
+        Returns:
+            (List[int]): The package ids in order
+
+        '''
+        if self.index is None:
+            raise RuntimeError("Call build_index before find")
+        return self.index.find(statuses, truck_id, location_id, postal_code, due_before)
+
+
+
+    def _update_or_none(self, row: int):
+        '''Rebuilds the update view for a row, mapping NO_ID to None O(1)'''
+        return None if row == NO_ID else self._update(row)
+
+
+
+    def _rows(self, slot: int):
+        '''Returns a package's row indexes, newest first O(k)'''
+        rows = []
+        row = self._last_rows[slot]
+        while row != NO_ID:
+            rows.append(row)
+            row = self._prev_rows[row]
+        return rows
+
+
+
+    def _append(self, slot: int, timestamp: int, status: DeliveryStatus, location_id: int, truck_id: int):
+        '''Appends one row to the arrays and links it to the package's previous row O(1)
+
+        Returns:
+            (int): The index of the new row
+
+        '''
+        row = len(self.timestamps)
+        self.package_ids.append(self._package_ids[slot])
+        self.timestamps.append(timestamp)
+        self.statuses.append(STATUS_CODES[status])
+        self.location_ids.append(NO_ID if location_id is None else location_id)
+        self.truck_ids.append(NO_ID if truck_id is None else truck_id)
+        self._prev_rows.append(self._last_rows[slot])
+        self._last_rows[slot] = row
+        if truck_id is not None:
+            rows = self._truck_rows[truck_id]
+            if rows is None:
+                rows = array("i")
+                self._truck_rows[truck_id] = rows
+            rows.append(row)
+        if self.index is not None:
+            self.index.update(slot)
+        return row
+
+
+
+    def _package(self, row: int):
+        '''Rebuilds the package view for a row O(1)
+
+        Args:
+            row: The row index
+        Returns:
+            (Package): The package's attributes with the row's status and location
+
+        '''
+        slot = self._slots[self.package_ids[row]]
+        return Package(
+            package_id=self._package_ids[slot],
+            location_id=self._id_or_none(self.location_ids[row]),
+            weight=self._weights[slot],
+            notes=self._notes[slot],
+            earliest=self._earliest[slot],
+            latest=self._latest[slot],
+            status=STATUSES[self.statuses[row]],
+        )
+
+
+
+    def _update(self, row: int):
+        '''Rebuilds the update view for a row O(1)
+
+        Args:
+            row: The row index
+        Returns:
+            (PackageUpdate): The timestamp, package view, and truck of the row
+
+        '''
+        return PackageUpdate(self.timestamps[row], self._package(row), self._id_or_none(self.truck_ids[row]))
+
+
+
+    def _id_or_none(self, value: int):
+        '''Maps the stored NO_ID back to None O(1)'''
+        return None if value == NO_ID else value
+
+
+
+
+class SnapshotIndex:
+    '''Answers "which update was in effect at time T" for every package.
+
+    Every package's rows are laid out next to each other, packages ordered by id and rows ordered by
+    timestamp, so one query is a binary search per package. Rows with the same timestamp keep the
+    order they were recorded in, so the newest of them wins like it does in update_at.
+    '''
+
+    def __init__(self, history: PackageHistory):
+        '''Builds the index from every row recorded so far O(r*log(r))
+
+        Args:
+            history: The history to index
+
+        '''
+        self.row_count = history.row_count
+
+        # Sort row indexes by package id, then time, then the order they were recorded in.
+        package_ids = history.package_ids
+        timestamps = history.timestamps
+        order = sorted(range(self.row_count), key=lambda row: (package_ids[row], timestamps[row], row))
+
+        self.package_ids = array("i")
+        self.rows = array("i", order)
+        self.timestamps = array("i", (timestamps[row] for row in order))
+
+        # offsets[i]:offsets[i+1] are the rows of the i-th package.
+        self.offsets = array("i")
+        previous = None
+        for i, row in enumerate(order): # O(r)
+            if package_ids[row] != previous:
+                previous = package_ids[row]
+                self.package_ids.append(previous)
+                self.offsets.append(i)
+        self.offsets.append(len(order))
+
+
+
+    def rows_at(self, timestamp: int):
+        '''Returns the row in effect for every package at the given time O(n*log(k))
+
+        Args:
+            timestamp: Seconds since the start of the day
+        Returns:
+            (array): One row index per package ordered by package id, NO_ID if it has no row yet
+
+        '''
+        result = array("i")
+        timestamps = self.timestamps
+        offsets = self.offsets
+        for i in range(len(self.package_ids)):
+            lo = offsets[i]
+            idx = bisect_right(timestamps, timestamp, lo, offsets[i + 1]) - 1
+            result.append(self.rows[idx] if idx >= lo else NO_ID)
+        return result
+
+
+
+    def rows_at_many(self, timestamps: List[int]):
+        '''Returns rows_at for many times by sweeping each package's rows once O(n*(k+m) + m*log(m))
+
+        Args:
+            timestamps: Seconds since the start of the day, in any order
+        Returns:
+            (List[array]): The rows_at result for each time, in the same order as timestamps
+
+        '''
+        # Answer the times in ascending order so each package's pointer only moves forward.
+        order = sorted(range(len(timestamps)), key=lambda i: timestamps[i])
+        results = [array("i", [NO_ID]) * len(self.package_ids) for _ in timestamps]
+
+        for i in range(len(self.package_ids)): # O(n)
+            idx = self.offsets[i] - 1
+            hi = self.offsets[i + 1]
+            for t in order: # O(k+m)
+                while idx + 1 < hi and self.timestamps[idx + 1] <= timestamps[t]:
+                    idx += 1
+                if idx >= self.offsets[i]:
+                    results[t][i] = self.rows[idx]
+        return results
+
+
+
+class PackageIndex:
+    '''Secondary indexes over every package's latest update, for finding packages by field.
+
+    Each package is under one key per field: its status, truck, location, and zip code, and its
+    status paired with its truck and with its deadline bucket. The pairs answer the common
+    combined questions, like the enroute packages on a truck or the undelivered packages due by
+    a time, by walking only the packages that match. The history calls update whenever a
+    package's latest row changes, so the index never has to be rebuilt.
+
+    A key's packages are an array of history slots. Each package remembers its arrays and its
+    position in each one, so moving it to a new key is a swap with the last slot and an append.
+    '''
+
+    # The fields of each key, in the order they're kept per package.
+    FIELDS = ["status", "truck", "location", "postal_code", "status_truck", "status_deadline"]
+
+    def __init__(self, history: PackageHistory, locations: Dictionary[int, Location]):
+        '''Indexes every package in a history O(n)
+
+        Args:
+            history: The history to index, it keeps the index up to date from then on
+            locations: locations by id, for the zip codes
+
+        '''
+        self.history = history
+        self.locations = locations
+
+        # Key -> slots of the packages under it.
+        self._sets = Dictionary[tuple, array](open_addressing=True)
+
+        # Per slot, the keys it's under and those keys' arrays. Per field, each slot's position in its array.
+        self._keys: List[tuple] = []
+        self._members: List[list] = []
+        self._positions = [array("i") for _ in self.FIELDS]
+
+        # Deadline buckets that have packages, in order, so a deadline query skips empty ones.
+        self._buckets: List[int] = []
+
+        for slot in range(len(history)): # O(n)
+            self.update(slot)
+
+
+
+    def update(self, slot: int):
+        '''Moves a package to the keys of its latest row O(1)
+
+        Args:
+            slot: The history slot of the package whose latest row changed
+
+        '''
+        history = self.history
+        row = history._last_rows[slot]
+        status = history.statuses[row]
+        truck_id = history.truck_ids[row]
+        location_id = history.location_ids[row]
+        location = self.locations[location_id] if location_id != NO_ID else None
+        bucket = history._latest[slot] // DEADLINE_BUCKET_SECONDS
+
+        keys = (
+            ("status", status),
+            ("truck", truck_id),
+            ("location", location_id),
+            ("postal_code", location.postal_code if location else None),
+            ("status_truck", status, truck_id),
+            ("status_deadline", status, bucket),
+        )
+
+        # A new package gets room in every field, and its deadline bucket is noted once since deadlines don't change.
+        if slot == len(self._keys):
+            self._keys.append(None)
+            self._members.append([None] * len(keys))
+            for positions in self._positions:
+                positions.append(NO_ID)
+            i = bisect_right(self._buckets, bucket)
+            if i == 0 or self._buckets[i - 1] != bucket:
+                self._buckets.insert(i, bucket)
+
+        # Only the keys that changed are touched, usually just the status ones.
+        old_keys = self._keys[slot]
+        if old_keys == keys:
+            return
+        members = self._members[slot]
+        for i, key in enumerate(keys):
+            if old_keys is not None and old_keys[i] == key:
+                continue
+            positions = self._positions[i]
+
+            # Swap the last slot into this one's place in the old array.
+            if old_keys is not None:
+                slots = members[i]
+                position = positions[slot]
+                last = slots.pop()
+                if last != slot:
+                    slots[position] = last
+                    positions[last] = position
+
+            slots = self._sets[key]
+            if slots is None:
+                slots = self._sets[key] = array("i")
+            positions[slot] = len(slots)
+            slots.append(slot)
+            members[i] = slots
+        self._keys[slot] = keys
+
+
+
+    def count(self, *key):
+        '''Returns how many packages are under a key, like ("status", code) or ("status_truck", code, truck_id) O(1)'''
+        slots = self._sets[key]
+        return 0 if slots is None else len(slots)
+
+
+
+    def find(
+        self,
+        statuses: Iterable[DeliveryStatus] = None,
+        truck_id: int = None,
+        location_id: int = None,
+        postal_code: str = None,
+        due_before: int = None,
+    ):
+        '''Returns the packages whose latest update matches every given field O(c + r*log(r))
+
+        The narrowest key that was given picks the candidates, c of them, and the rest of the
+        fields filter them. A truck or deadline with statuses, or any single field, has no
+        candidates that don't match, so it takes time proportional to the r results.
+
+        Args:
+            statuses: any of these statuses
+            truck_id: on or delivered by this truck
+            location_id: going to this location
+            postal_code: going to this zip code
+            due_before: with a deadline before these seconds since the start of the day
+        Returns:
+            (List[int]): The package ids in order
+
+        '''
+        codes = [STATUS_CODES[status] for status in (STATUSES if statuses is None else statuses)]
+
+        # Pick the candidates from the narrowest key.
+        if due_before is not None:
+            last_bucket = (due_before - 1) // DEADLINE_BUCKET_SECONDS
+            buckets = self._buckets[:bisect_right(self._buckets, last_bucket)]
+            keys = [("status_deadline", code, bucket) for code in codes for bucket in buckets]
+        elif truck_id is not None:
+            keys = [("status_truck", code, truck_id) for code in codes]
+        elif location_id is not None:
+            keys = [("location", location_id)]
+        elif postal_code is not None:
+            keys = [("postal_code", postal_code)]
+        else:
+            keys = [("status", code) for code in codes]
+
+        # Check each candidate against the fields its key didn't cover.
+        history = self.history
+        results = []
+        for key in keys:
+            for slot in self._sets[key] or (): # O(c)
+                row = history._last_rows[slot]
+                if due_before is not None and history._latest[slot] >= due_before:
+                    continue
+                if truck_id is not None and history.truck_ids[row] != truck_id:
+                    continue
+                if location_id is not None and history.location_ids[row] != location_id:
+                    continue
+                if postal_code is not None and self._keys[slot][3][1] != postal_code:
+                    continue
+                if history.statuses[row] not in codes:
+                    continue
+                results.append(history._package_ids[slot])
+        return sorted(results)
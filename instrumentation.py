@@ -0,0 +1,251 @@
+import atexit
+import cProfile
+import functools
+import marshal
+import os
+import sys
+from time import perf_counter_ns
+from typing import Callable
+
+
+# Set to turn instrumentation on for a run, for example
+#   CVRPTW_INSTRUMENT=summary python main.py
+#   CVRPTW_INSTRUMENT=summary,stats=phases.pstats python main.py
+#   CVRPTW_INSTRUMENT=profile=run.prof python main.py
+# summary prints the phase timers and counters to stderr at exit, stats writes the phase timers as a
+# pstats file, and profile runs cProfile over the whole program and writes its stats.
+# Only this process is measured, work done in worker processes isn't included.
+ENVIRONMENT_VARIABLE = "CVRPTW_INSTRUMENT"
+
+ENABLED = False
+
+# Everything is kept in plain dicts, a Dictionary would count its own probes.
+# Counter name -> total, None while instrumentation is off so call sites can skip counting.
+counters: dict = None
+# Counter name -> largest single amount counted.
+maxima: dict = {}
+# (file, line, function) -> [calls, own ns, total ns, {caller key: calls}]
+timers: dict = {}
+
+# Child time of each timed call in progress, and their keys. The bottom entry stands for the program.
+_child_ns = [0]
+_keys = [("~", 0, "<program>")]
+
+_summary = False
+_stats_path: str = None
+_profile: cProfile.Profile = None
+_profile_path: str = None
+
+
+
+def enable(summary: bool = True, stats_path: str = None, profile_path: str = None):
+    '''Turns instrumentation on and registers the exit report O(1)
+
+    Functions are only timed if they were decorated after this was called, so it has to run before
+    the modules are imported. Setting CVRPTW_INSTRUMENT does that. Counters and the Dictionary
+    probe counts work whenever this is called.
+
+    Args:
+        summary: print the timers and counters to stderr at exit
+        stats_path: write the timers to this file in the pstats format at exit
+        profile_path: run cProfile until exit and write its stats to this file
+
+    '''
+    global ENABLED, counters, _summary, _stats_path, _profile, _profile_path
+    if ENABLED:
+        return
+    ENABLED = True
+    counters = {}
+    _summary = summary
+    _stats_path = stats_path
+    _patch_dictionaries()
+
+    if profile_path:
+        _profile_path = profile_path
+        _profile = cProfile.Profile()
+        _profile.enable()
+
+    atexit.register(_report)
+
+
+
+def _enable_from_environment():
+    '''Enables instrumentation with the settings in CVRPTW_INSTRUMENT, if it's set O(1)'''
+    setting = os.environ.get(ENVIRONMENT_VARIABLE, "").strip()
+    if not setting or setting == "0":
+        return
+
+    options = {}
+    for part in setting.split(","):
+        name, _, value = part.partition("=")
+        options[name.strip()] = value.strip()
+    enable(
+        summary="summary" in options or not ("stats" in options or "profile" in options),
+        stats_path=options.get("stats") or None,
+        profile_path=options.get("profile") or None,
+    )
+
+
+
+def timed(function: Callable):
+    '''Times every call of a function while instrumentation is on, returns it unchanged when it's off O(1)
+
+    Own time excludes time spent in other timed functions it calls, like a profiler's tottime.
+
+    '''
+    if not ENABLED:
+        return function
+
+    code = getattr(function, "__code__", None)
+    key = (
+        code.co_filename if code else function.__module__,
+        code.co_firstlineno if code else 0,
+        function.__qualname__,
+    )
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        caller = _keys[-1]
+        _keys.append(key)
+        _child_ns.append(0)
+        start = perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = perf_counter_ns() - start
+            _keys.pop()
+            own = elapsed - _child_ns.pop()
+            _child_ns[-1] += elapsed
+
+            timer = timers.get(key)
+            if timer is None:
+                timer = timers[key] = [0, 0, 0, {}]
+            timer[0] += 1
+            timer[1] += own
+            timer[2] += elapsed
+            timer[3][caller] = timer[3].get(caller, 0) + 1
+
+    return wrapper
+
+
+
+def count(name: str, amount: int = 1):
+    '''Adds to a counter, call sites check counters is not None first so nothing runs when off O(1)
+
+    Args:
+        name: the counter
+        amount: how much to add
+
+    '''
+    counters[name] = counters.get(name, 0) + amount
+    if amount > maxima.get(name, 0):
+        maxima[name] = amount
+
+
+
+def reset():
+    '''Clears every timer and counter O(n)'''
+    timers.clear()
+    maxima.clear()
+    if counters is not None:
+        counters.clear()
+
+
+
+def _patch_dictionaries():
+    '''Wraps the Dictionary lookups to count bucket lengths and open addressing probes O(1)
+
+    Patching the classes keeps the normal methods free of any counting code when instrumentation is off.
+
+    '''
+    from hash_table import _EMPTY, Dictionary, OpenAddressingDictionary
+
+    get_bucket = Dictionary._get_bucket
+    find_slot = OpenAddressingDictionary._find_slot
+
+    def counted_get_bucket(self, key):
+        '''Counts the length of every bucket a lookup has to walk'''
+        bucket = get_bucket(self, key)
+        count("dictionary.lookups")
+        count("dictionary.bucket_entries", len(bucket))
+        return bucket
+
+    def counted_find_slot(self, key, h):
+        '''Counts the slots a lookup probes, from the key's home slot to where it stopped'''
+        idx = find_slot(self, key, h)
+        home = h & self._mask
+        if idx >= 0:
+            probes = ((idx - home) & self._mask) + 1
+        else:
+            # A miss stops on the first empty slot.
+            probes = 1
+            slot = home
+            while self._keys[slot] is not _EMPTY:
+                slot = (slot + 1) & self._mask
+                probes += 1
+        count("open_addressing.lookups")
+        count("open_addressing.probes", probes)
+        return idx
+
+    Dictionary._get_bucket = counted_get_bucket
+    OpenAddressingDictionary._find_slot = counted_find_slot
+
+
+
+def summary():
+    '''Returns the timers and counters as a printable report O(n*log(n))'''
+    lines = [f"{'phase':<52} {'calls':>9} {'total ms':>11} {'own ms':>11} {'mean us':>10}"]
+    for key, (calls, own, total, _) in sorted(timers.items(), key=lambda item: -item[1][2]):
+        name = f"{os.path.splitext(os.path.basename(key[0]))[0]}.{key[2]}"
+        lines.append(f"{name:<52} {calls:>9} {total / 1e6:>11.3f} {own / 1e6:>11.3f} {total / calls / 1e3:>10.2f}")
+
+    lines.append("")
+    lines.append(f"{'counter':<52} {'total':>9} {'max':>11}")
+    for name in sorted(counters or ()):
+        lines.append(f"{name:<52} {counters[name]:>9} {maxima.get(name, 0):>11}")
+
+    # Averages that are easier to read than the raw totals.
+    averages = [
+        ("route_load.candidates per step", "route_load.candidates", "route_load.steps"),
+        ("dictionary.bucket_entries per lookup", "dictionary.bucket_entries", "dictionary.lookups"),
+        ("open_addressing.probes per lookup", "open_addressing.probes", "open_addressing.lookups"),
+    ]
+    for label, total, per in averages:
+        if counters and counters.get(per):
+            lines.append(f"{label:<52} {counters.get(total, 0) / counters[per]:>9.2f}")
+    return "\n".join(lines)
+
+
+
+def write_stats(path: str):
+    '''Writes the timers in the marshal format pstats.Stats loads O(n)
+
+    Args:
+        path: the file to write
+
+    '''
+    stats = {}
+    for key, (calls, own, total, callers) in timers.items():
+        stats[key] = (calls, calls, own / 1e9, total / 1e9, dict(callers))
+
+    # Top level calls have the program as their caller, so it needs an entry for print_callers to find.
+    # Its time is the time spent in those calls.
+    stats[_keys[0]] = (1, 1, 0.0, _child_ns[0] / 1e9, {})
+    with open(path, "wb") as file:
+        marshal.dump(stats, file)
+
+
+
+def _report():
+    '''Writes the reports that were asked for, run at exit O(n*log(n))'''
+    if _profile is not None:
+        _profile.disable()
+        _profile.dump_stats(_profile_path)
+    if _stats_path:
+        write_stats(_stats_path)
+    if _summary:
+        print(summary(), file=sys.stderr)
+
+
+
+_enable_from_environment()
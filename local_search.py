@@ -0,0 +1,310 @@
+import time
+from typing import List
+from globals import START_OF_DAY_SECONDS, travel_seconds
+from hash_table import Dictionary
+from instrumentation import timed
+from models import Location
+from neighbors import nearest, neighbor_lists
+
+
+# Defaults for the improvement pass, small enough to keep planning a load interactive.
+TIME_BUDGET_SECONDS = 0.05
+NEIGHBOR_COUNT = 8
+MAX_SEGMENT_LENGTH = 3
+
+# Ignore float noise when deciding if a move shortens the route.
+EPSILON = 1e-9
+
+
+
+def _arrival(matrix, locations: Dictionary[int, Location], from_id: int, to_id: int, cur_time: int):
+    '''Returns the arrival time at a location, the same estimate route_load uses O(1)'''
+    return max(cur_time + travel_seconds(matrix, from_id, to_id), locations[to_id].earliest or START_OF_DAY_SECONDS)
+
+
+
+def route_distance(matrix, start_id: int, sequence: List[int]):
+    '''Returns the distance driven from the start through a sequence of locations O(n)'''
+    distance = float(0)
+    previous = start_id
+    for l_id in sequence:
+        distance += float(matrix[previous][l_id])
+        previous = l_id
+    return distance
+
+
+
+@timed
+def greedy_sequence(
+    matrix,
+    locations: Dictionary[int, Location],
+    start_id: int,
+    start_time: int,
+    load: List[int],
+    neighbor_k: int = None,
+):
+    '''Returns the order route_load visits a load in, without recording anything O(n^2), O(n*k) with neighbor_k
+
+    Args:
+        matrix: distances between locations
+        locations: locations by id
+        start_id: the location the truck starts from
+        start_time: seconds since the start of the day the truck starts
+        load: location ids on the truck
+        neighbor_k: compare the k nearest locations first like route_load, see neighbor_lists
+    Returns:
+        sequence: location ids in the order of the earliest arrival from each stop
+
+    '''
+    remaining = list(load)
+    on_truck = Dictionary[int, bool]()
+    for l_id in load:
+        on_truck[l_id] = True
+    candidates = neighbor_lists(matrix, neighbor_k) if neighbor_k else None
+
+    sequence = []
+    current_id = start_id
+    cur_time = start_time
+    while remaining: # O(n)
+        best_id = None
+        best_time = None
+
+        # Neighbors first, only those that make their deadline.
+        if candidates is not None:
+            for other_id in candidates[current_id]: # O(k)
+                if not on_truck[other_id]:
+                    continue
+                arrival = _arrival(matrix, locations, current_id, other_id, cur_time)
+                if arrival <= locations[other_id].latest and (best_time is None or best_time > arrival):
+                    best_id, best_time = other_id, arrival
+
+        # Otherwise scan every location still on the truck.
+        if best_id is None:
+            for other_id in remaining: # O(n)
+                if other_id == current_id:
+                    continue
+                arrival = _arrival(matrix, locations, current_id, other_id, cur_time)
+                if best_time is None or best_time > arrival:
+                    best_id, best_time = other_id, arrival
+        if best_id is None:
+            break
+        sequence.append(best_id)
+        remaining.remove(best_id)
+        del on_truck[best_id]
+        current_id, cur_time = best_id, best_time
+    return sequence
+
+
+
+@timed
+def improve_route(
+    matrix,
+    locations: Dictionary[int, Location],
+    start_id: int,
+    start_time: int,
+    sequence: List[int],
+    time_budget: float = TIME_BUDGET_SECONDS,
+    neighbor_count: int = NEIGHBOR_COUNT,
+):
+    '''Shortens a route with 2-opt and Or-opt moves until no move helps or the time budget runs out O(n*k) per pass
+
+    The route starts at start_id and ends at its last stop, the trip back to the hub is its own load.
+    Moves are only tried between a location and its neighbor_count nearest locations in the route, and
+    a location whose moves all failed is skipped (its don't-look bit is set) until a move changes one of
+    its edges. The distance change of a move is computed in O(1) from the four or six edges it touches,
+    assuming the matrix is symmetric. A shorter route is only kept if its stops aren't later past their
+    deadlines than before. The arrival time, lateness, and slack (how much later a stop could be reached
+    without any stop from it on getting later past its deadline) of every position are kept up to date,
+    so the check only goes over the stops the move reorders and the later ones it delays past their slack.
+
+    Args:
+        matrix: distances between locations
+        locations: locations by id
+        start_id: the location the truck starts from
+        start_time: seconds since the start of the day the truck starts
+        sequence: location ids in the order they would be visited, usually from greedy_sequence
+        time_budget: the most seconds to spend improving
+        neighbor_count: how many nearest locations each location tries moves with
+    Returns:
+        sequence: the improved order of location ids
+        miles_saved: how much shorter the improved route is than the given one
+
+    '''
+    if len(sequence) < 3:
+        return list(sequence), float(0)
+
+    deadline = time.perf_counter() + time_budget
+    path = [start_id] + list(sequence)
+    n = len(path) - 1
+    d = lambda a, b: float(matrix[a][b])
+
+    # Neighbor lists hold the nearest stops of the route, not of the whole map.
+    neighbors = Dictionary[int, List[int]]()
+    for l_id in path:
+        neighbors[l_id] = nearest(matrix, l_id, sequence, neighbor_count)
+
+    positions = Dictionary[int, int]()
+    for i, l_id in enumerate(path):
+        positions[l_id] = i
+
+    # Every location starts with its don't-look bit cleared.
+    dont_look = Dictionary[int, bool]()
+    queue = list(reversed(path))
+    for l_id in path:
+        dont_look[l_id] = False
+
+    def stop_slack(t: int):
+        '''Returns how much later position t could be reached without adding lateness from it on O(1)'''
+        own = max(0, locations[path[t]].latest - arrivals[t])
+        if t == n:
+            return own
+        wait = arrivals[t + 1] - arrivals[t] - travel_seconds(matrix, path[t], path[t + 1])
+        return min(own, wait + slack[t + 1])
+
+    # Arrival time, seconds past the deadline, and slack at each position of the path.
+    arrivals = [start_time] * (n + 1)
+    late_at = [0] * (n + 1)
+    slack = [0] * (n + 1)
+    for t in range(1, n + 1):
+        arrivals[t] = _arrival(matrix, locations, path[t - 1], path[t], arrivals[t - 1])
+        late_at[t] = max(0, arrivals[t] - locations[path[t]].latest)
+    for t in range(n, 0, -1):
+        slack[t] = stop_slack(t)
+    lateness = sum(late_at)
+
+    def lateness_change(l: int, window: List[int]):
+        '''Returns how many more seconds past their deadlines the stops are with window at positions l.. O(w+m)
+
+        Only the window and the later stops it delays past their slack are driven again, m of them.
+
+        '''
+        r = l + len(window) - 1
+        change = -sum(late_at[l:r + 1])
+        previous, cur_time = path[l - 1], arrivals[l - 1]
+        for t in range(l, n + 1):
+            l_id = window[t - l] if t <= r else path[t]
+            cur_time = _arrival(matrix, locations, previous, l_id, cur_time)
+            if t > r:
+                # The rest of the route is as late as before once the delay is gone or absorbed.
+                delay = cur_time - arrivals[t]
+                if delay == 0 or 0 < delay <= slack[t] or (delay < 0 and lateness == 0):
+                    break
+                change -= late_at[t]
+            change += max(0, cur_time - locations[l_id].latest)
+            previous = l_id
+        return change
+
+    def accept(l: int, window: List[int], touched: List[int]):
+        '''Puts window into the path at l if it doesn't make the deadlines worse O(w+m)'''
+        nonlocal lateness
+        change = lateness_change(l, window)
+        if change > 0:
+            return False
+        r = l + len(window) - 1
+        path[l:r + 1] = window
+        for t in range(l, r + 1):
+            positions[path[t]] = t
+        lateness += change
+
+        # Arrival times change from the window on, until they're back to what they were.
+        t = l
+        while t <= n:
+            arrival = _arrival(matrix, locations, path[t - 1], path[t], arrivals[t - 1])
+            if t > r and arrival == arrivals[t]:
+                break
+            arrivals[t] = arrival
+            late_at[t] = max(0, arrival - locations[path[t]].latest)
+            t += 1
+
+        # Slack changes from there back, until it's back to what it was before the window.
+        for u in range(t - 1, 0, -1):
+            value = stop_slack(u)
+            if u < l and value == slack[u]:
+                break
+            slack[u] = value
+
+        for l_id in touched:
+            if dont_look[l_id]:
+                dont_look[l_id] = False
+                queue.append(l_id)
+        return True
+
+    def try_two_opt(a: int):
+        '''Reverses a section so a is next to one of its neighbors O(k)'''
+        i = positions[a]
+        for c in neighbors[a]:
+            j = positions[c]
+            # Reverse path[l..r], the new edge (a, c) is at one end of it.
+            l, r = (i + 1, j) if j > i else (j + 1, i)
+            if r - l < 1:
+                continue
+            after = path[r + 1] if r < n else None
+            delta = d(path[l - 1], path[r]) - d(path[l - 1], path[l])
+            if after is not None:
+                delta += d(path[l], after) - d(path[r], after)
+            if delta < -EPSILON:
+                touched = [path[l - 1], path[l], path[r]] + ([after] if after is not None else [])
+                if accept(l, path[l:r + 1][::-1], touched):
+                    return True
+        return False
+
+    def try_or_opt(a: int):
+        '''Moves a short section starting at a next to one of its neighbors O(k)'''
+        i = positions[a]
+        if i == 0:
+            return False
+        for length in range(1, MAX_SEGMENT_LENGTH + 1):
+            e = i + length - 1
+            if e > n:
+                break
+            before, first, last = path[i - 1], path[i], path[e]
+            after = path[e + 1] if e < n else None
+            section = path[i:e + 1]
+
+            # Distance saved by taking the section out and closing the gap.
+            removed = d(before, first)
+            if after is not None:
+                removed += d(last, after) - d(before, after)
+
+            for c in neighbors[a]:
+                j = positions[c]
+                if i - 1 <= j <= e:
+                    continue
+
+                # c's stops on either side once the section is taken out.
+                c_next = path[j + 1] if j < n else None
+                c_prev = None
+                if j > 0:
+                    c_prev = before if j - 1 == e else path[j - 1]
+
+                # c, first..last, c's next stop
+                added = d(c, first)
+                if c_next is not None:
+                    added += d(last, c_next) - d(c, c_next)
+                if added - removed < -EPSILON:
+                    l, window = (i, path[e + 1:j + 1] + section) if j > e else (j + 1, section + path[j + 1:i])
+                    if accept(l, window, [before, first, last, c] + [x for x in (after, c_next) if x is not None]):
+                        return True
+
+                # c's previous stop, last..first, c
+                if c_prev is None:
+                    continue
+                added = d(c_prev, last) + d(first, c) - d(c_prev, c)
+                if added - removed < -EPSILON:
+                    l, window = (i, path[e + 1:j] + section[::-1]) if j > e else (j, section[::-1] + path[j:i])
+                    if accept(l, window, [before, first, last, c, c_prev] + ([after] if after is not None else [])):
+                        return True
+        return False
+
+    initial = route_distance(matrix, start_id, sequence)
+    while queue and time.perf_counter() < deadline:
+        a = queue.pop()
+        if dont_look[a]:
+            continue
+        if not (try_two_opt(a) or try_or_opt(a)):
+            dont_look[a] = True
+        else:
+            queue.append(a)
+
+    improved = path[1:]
+    return improved, initial - route_distance(matrix, start_id, improved)
@@ -1,11 +1,248 @@
+from array import array
 from datetime import datetime
-from typing import Any, List
-from globals import START_OF_DAY
+from typing import Iterator, List, Tuple
+from globals import start_of_day
 from hash_table import Dictionary
-from models import DeliveryStatus, Location, Package, PackageUpdate, strfdatetime
+from history import NO_ID, STATUS_CODES, STATUSES, PackageHistory
+from instrumentation import timed
+from models import (
+    BatchSummary,
+    DeliveryStatus,
+    Location,
+    Package,
+    PackageUpdate,
+    ScenarioResult,
+    strfseconds,
+    to_datetime,
+    to_seconds,
+)
+
+
+
+class EventLog:
+    '''Buffer of every logged event, stored as numbers until a table is printed.
+
+    Each event is a row of (timestamp, package_id, status, location_id, truck_id) in parallel typed
+    arrays. Package events have no message, their table row is built from the package and location
+    when the log is printed. Other events keep an index into a list of interned messages, so the many
+    identical separator lines share one string. Discarded events are only marked, so row indexes
+    never change once an event is logged.
+    '''
+
+    def __init__(self):
+        '''Creates an empty log O(1)'''
+        self.timestamps = array("i")
+        self.package_ids = array("i")
+        self.statuses = array("b")
+        self.location_ids = array("i")
+        self.truck_ids = array("i")
+        self.message_ids = array("i")
+
+        # 1 for an event that was discarded, and how many were.
+        self._removed = array("b")
+        self._removed_count = 0
+
+        # Truck id -> the truck's events, and package id -> the package's events, in the order they were logged.
+        self._truck_rows = Dictionary[int, array](open_addressing=True)
+        self._package_rows = Dictionary[int, array](open_addressing=True)
+
+        # Message id -> message, and message -> id to intern them.
+        self._messages: List[str] = []
+        self._message_ids = Dictionary[str, int]()
+
+
+
+    def __len__(self):
+        '''Returns the number of events that weren't discarded O(1)'''
+        return len(self.timestamps) - self._removed_count
+
+
+
+    @property
+    def row_count(self):
+        '''Returns the number of events ever logged, discarded ones too O(1)'''
+        return len(self.timestamps)
+
+
+
+    def append(
+        self,
+        timestamp: int,
+        package_id: int = None,
+        status: DeliveryStatus = None,
+        location_id: int = None,
+        truck_id: int = None,
+        message: str = None,
+    ):
+        '''Adds one event O(1)
+
+        Args:
+            timestamp: seconds since the start of the day of the event
+            package_id: the package the event is about, None for a message
+            status: the package's status after the event
+            location_id: the location the package goes to
+            truck_id: the truck the event is about
+            message: text of an event that isn't about a package
+
+        '''
+        message_id = NO_ID
+        if message is not None:
+            message_id = self._message_ids[message]
+            if message_id is None:
+                message_id = len(self._messages)
+                self._messages.append(message)
+                self._message_ids[message] = message_id
+
+        self.timestamps.append(timestamp)
+        self.package_ids.append(NO_ID if package_id is None else package_id)
+        self.statuses.append(NO_ID if status is None else STATUS_CODES[status])
+        self.location_ids.append(NO_ID if location_id is None else location_id)
+        self.truck_ids.append(NO_ID if truck_id is None else truck_id)
+        self.message_ids.append(message_id)
+        self._removed.append(0)
+
+        # Index the event under its truck and package.
+        row = len(self.timestamps) - 1
+        for rows_by_id, key in ((self._truck_rows, truck_id), (self._package_rows, package_id)):
+            if key is None:
+                continue
+            rows = rows_by_id[key]
+            if rows is None:
+                rows = array("i")
+                rows_by_id[key] = rows
+            rows.append(row)
+
+
+
+    def row(self, row: int):
+        '''Returns an event as a tuple O(1)
+
+        Args:
+            row: the row index
+        Returns:
+            (tuple): (timestamp, package_id, status, location_id, truck_id, message), None for missing values
+
+        '''
+        return (
+            self.timestamps[row],
+            self._id_or_none(self.package_ids[row]),
+            None if self.statuses[row] == NO_ID else STATUSES[self.statuses[row]],
+            self._id_or_none(self.location_ids[row]),
+            self._id_or_none(self.truck_ids[row]),
+            None if self.message_ids[row] == NO_ID else self._messages[self.message_ids[row]],
+        )
+
+
+
+    def rows_since(self, row: int):
+        '''Returns the events logged from the given row index on, for copying into another log O(r)
+
+        Args:
+            row: The first row index to return, usually an earlier row_count
+        Returns:
+            (List[tuple]): an event tuple per row that wasn't discarded, see row
+
+        '''
+        return [self.row(r) for r in range(row, self.row_count) if not self._removed[r]]
+
+
+
+    def extend(self, rows: List[tuple]):
+        '''Appends events returned by rows_since, in order O(r)'''
+        for row in rows:
+            self.append(*row)
+
+
+
+    def truck_rows(self, truck_id: int):
+        '''Returns a truck's events, in the order they were logged O(1)
+
+        Args:
+            truck_id: The truck to look up
+        Returns:
+            (array): The row indexes, empty if the truck has none
+
+        '''
+        rows = self._truck_rows[truck_id]
+        return array("i") if rows is None else rows
+
+
+
+    def retime(self, moves: List[Tuple[int, int]]):
+        '''Moves each given event to its new time O(m)
+
+        Mirrors PackageHistory.retime, so the log keeps matching the history when a truck's later
+        stops shift.
+
+        Args:
+            moves: (row index, new seconds since the start of the day) per event that moves
+        Returns:
+            (int): The number of events moved
+
+        '''
+        moved = 0
+        timestamps = self.timestamps
+        for row, new_time in moves: # O(m)
+            if new_time != timestamps[row]:
+                timestamps[row] = new_time
+                moved += 1
+        return moved
+
+
+
+    def discard(self, package_id: int, since: int):
+        '''Removes a package's events from a time on O(k) where k is the package's event count
+
+        Args:
+            package_id: The package whose events are removed
+            since: Seconds since the start of the day of the first event to remove
+
+        '''
+        rows = self._package_rows[package_id]
+        if rows is None:
+            return
+
+        kept = array("i")
+        for row in rows:
+            if self.timestamps[row] < since:
+                kept.append(row)
+            else:
+                self._removed[row] = 1
+                self._removed_count += 1
+        self._package_rows[package_id] = kept
+
+
+
+    def ordered(self) -> Iterator[int]:
+        '''Returns the row indexes ordered by time, then package id with messages first O(e*log(e))
+
+        The sort is stable, so events at the same time about the same package, or messages at the
+        same time, stay in the order they were logged.
+
+        '''
+        timestamps = self.timestamps
+        package_ids = self.package_ids
+        removed = self._removed
+        rows = [r for r in range(self.row_count) if not removed[r]]
+        return sorted(rows, key=lambda r: (timestamps[r], max(package_ids[r], 0)))
+
+
+
+    def message(self, row: int):
+        '''Returns the message of a row, None for a package event O(1)'''
+        message_id = self.message_ids[row]
+        return None if message_id == NO_ID else self._messages[message_id]
+
+
+
+    def _id_or_none(self, value: int):
+        '''Maps the stored NO_ID back to None O(1)'''
+        return None if value == NO_ID else value
+
 
 
-event_log = []
+
+event_log = EventLog()
 
 def build_format_str(cols: List[int]):
     '''Builds a format string for use with str.format() O(n)
@@ -23,32 +260,36 @@ def build_format_str(cols: List[int]):
 
 
 
-def log_event(timestamp: datetime, message: str):
+@timed
+def log_event(timestamp: int, message: str, truck_id: int = None, events: EventLog = event_log):
     '''Adds an event to the log object O(1)
 
     Args:
-        timestamp: datetime of the event
+        timestamp: seconds since the start of the day of the event
         message: string describing the event
+        truck_id: the truck the event is about, its events move with it when it's rerouted
+        events: the log to add to, a scenario's own log instead of the global one
 
     '''
-    time_str = strfdatetime(timestamp)
-    event_log.append([time_str, "", message])
+    events.append(timestamp, truck_id=truck_id, message=message)
 
 
 
-def log_line(timestamp: datetime, char: str = "—"):
+def log_line(timestamp: int, char: str = "—", truck_id: int = None, events: EventLog = event_log):
     '''Adds a line to the log object O(1)
 
     Args:
-        timestamp: datetime of the event
+        timestamp: seconds since the start of the day of the event
         char: character to use for the line
+        truck_id: the truck the line belongs to
+        events: the log to add to
 
     '''
-    log_event(timestamp, 105*char)
+    log_event(timestamp, 105*char, truck_id, events)
 
 
 
-def create_status_description(current_time: datetime, package: Package):
+def create_status_description(current_time: int, package: Package):
     '''Creates a string describing the status of a package O(1)
 
     Args:
@@ -63,13 +304,31 @@ def create_status_description(current_time: datetime, package: Package):
 
 
 log_msg_format = build_format_str([25, 8, 16, 5, 6, 21, 6])
-def create_package_log_message(location: Location, package: Package, timestamp: datetime, truck_id: int):
+def create_package_log_message(location: Location, package: Package, timestamp: int, truck_id: int):
     '''Creates a string describing the status of a package O(1)
     
     Args:
         location: location object
         package: package object
-        timestamp: datetime of the event
+        timestamp: seconds since the start of the day of the event
+        truck_id: id of the truck
+    Returns:
+        message: string describing the status of the package
+
+    '''
+    return format_package_message(location, package.weight, package.latest, package.status, timestamp, truck_id)
+
+
+
+def format_package_message(location: Location, weight: str, latest: int, status: DeliveryStatus, timestamp: int, truck_id: int):
+    '''Formats the columns of a package's table row O(1)
+
+    Args:
+        location: the location the package goes to
+        weight: the package's weight
+        latest: the package's deadline in seconds since the start of the day
+        status: the package's status
+        timestamp: seconds since the start of the day the status started
         truck_id: id of the truck
     Returns:
         message: string describing the status of the package
@@ -77,60 +336,87 @@ def create_package_log_message(location: Location, package: Package, timestamp:
     '''
     status_message = None
     # If the package has been delivered, return the delivery time.
-    if package.status == DeliveryStatus.delivered:
-        status_message = f"Delivered at {strfdatetime(timestamp)}"
+    if status == DeliveryStatus.delivered:
+        status_message = f"Delivered at {strfseconds(timestamp)}"
     
     # If the package is enroute, return the enroute time.
-    elif package.status == DeliveryStatus.enroute:
-        status_message = f"Enroute at {strfdatetime(timestamp)}"
+    elif status == DeliveryStatus.enroute:
+        status_message = f"Enroute at {strfseconds(timestamp)}"
     
     # If the package is at the hub, return at hub.
-    elif package.status == DeliveryStatus.hub:
-        status_message = f"At hub at {strfdatetime(timestamp)}"
+    elif status == DeliveryStatus.hub:
+        status_message = f"At hub at {strfseconds(timestamp)}"
     
     # Otherwise, package has not arrived at the hub yet.
     else:
         status_message = "Delayed on flight"
     
 
-    deadline = strfdatetime(package.latest)
-    message = log_msg_format.format(*[location.address, deadline, location.city, location.postal_code, package.weight, status_message, str(truck_id)])
+    deadline = strfseconds(latest)
+    message = log_msg_format.format(*[location.address, deadline, location.city, location.postal_code, weight, status_message, str(truck_id)])
     return message
 
 
 
-def log(location: Location, package: Package, timestamp: datetime, truck_id: int):
-    '''Adds a package status updates to the log object O(n)
+@timed
+def log(location: Location, package: Package, timestamp: int, truck_id: int, events: EventLog = event_log):
+    '''Adds a package status updates to the log object O(1)
 
     Args:
         location: location object
         package: package object
-        timestamp: datetime of the event
+        timestamp: seconds since the start of the day of the event
         truck_id: id of the truck
+        events: the log to add to
 
     '''
-    message = create_package_log_message(location, package, timestamp, truck_id)
-    event_log.append([strfdatetime(timestamp), package.package_id, message])
+    events.append(timestamp, package.package_id, package.status, location.location_id, truck_id)
+
 
 
+def create_log_row(row: int, packages: PackageHistory, locations: Dictionary[int, Location], log: EventLog = event_log):
+    '''Formats one event of the log as a table row O(1)
+
+    Args:
+        row: the row index in the log
+        packages: package history, for the package's weight and deadline
+        locations: locations by id
+        log: the event log
+    Returns:
+        row: the table row
 
-def print_package_table(package_list: List[List[Any]] = event_log):
-    '''Prints the log as a table O(n)
+    '''
+    timestamp, package_id, status, location_id, truck_id, message = log.row(row)
+    if package_id is None:
+        return [strfseconds(timestamp), "", message]
+
+    package = packages.latest(package_id).package
+    message = format_package_message(locations[location_id], package.weight, package.latest, status, timestamp, truck_id)
+    return [strfseconds(timestamp), package_id, message]
+
+
+
+@timed
+def print_event_log(packages: PackageHistory, locations: Dictionary[int, Location], log: EventLog = event_log):
+    '''Prints the log as a table in time order O(e*log(e))
+
+    Args:
+        packages: package history
+        locations: locations by id
+        log: the event log
+
+    '''
+    print_package_table([create_log_row(row, packages, locations, log) for row in log.ordered()])
+
+
+
+def print_package_table(package_list: List[list]):
+    '''Prints rows as a table, in the order given O(n)
     
     Args:
-        print_list: list of lists to print as a table
+        package_list: [time, package id, message] rows to print as a table
     
     '''
-    
-    def sort_key(s):
-        pkg_time = datetime.strptime(s[0], "%H:%M:%S")
-        try:
-            pkg_time.replace(microsecond=s[1])
-        except:
-            pass
-        return pkg_time
-
-    sorted_list = sorted(package_list, key=sort_key)
     headers_format = build_format_str([9, 2])+log_msg_format
 
     log_headers = ["Timestamp", "ID", "Address", "Deadline", "City", "Zip", "Weight", "Status", "Truck"]
@@ -138,40 +424,109 @@ def print_package_table(package_list: List[List[Any]] = event_log):
     print(headers_format.format(*log_headers))
 
     log_row_format = build_format_str([9, 2, 150])
-    for row in sorted_list: # O(n)
+    for row in package_list: # O(n)
         print(log_row_format.format(*row))
 
 
 
 def print_route_distances_and_times(end_time1,miles1,end_time2,miles2):
     '''Prints the route distances and times O(1)'''
-    
+
+    # End times are simulation seconds, convert them for display.
+    end_time1 = to_datetime(end_time1)
+    end_time2 = to_datetime(end_time2)
+
     print(f"truck1:\n    end_time: {end_time1}\n    miles_traveled: {miles1}\n")
     print(f"truck2:\n    end_time: {end_time2}\n    miles_traveled: {miles2}\n")
     print(f"totals:\n    end_time: {max(end_time1, end_time2)}\n    miles_traveled: {miles1 + miles2}\n")
 
 
 
-def print_packages_at_time(current_time: datetime, packages: Dictionary[int, List[PackageUpdate]], locations: Dictionary[int, Location]):
+def print_batch_summary(results: List[ScenarioResult], summary: BatchSummary):
+    '''Prints each scenario's totals and the aggregate stats of a batch O(n)'''
+    row_format = build_format_str([24, 10, 10, 10, 6, 10])
+    print(row_format.format("Scenario", "Miles", "End time", "Delivered", "Late", "Seconds"))
+    for result in results: # O(n)
+        print(row_format.format(
+            result.name,
+            f"{result.miles:.1f}",
+            strfseconds(result.end_time),
+            f"{result.delivered}/{result.packages}",
+            result.late,
+            f"{result.seconds:.3f}",
+        ))
+
+    print(f"\nscenarios: {summary.scenarios}")
+    print(f"    miles_traveled: {summary.miles:.1f} (mean {summary.mean_miles:.1f}, max {summary.max_miles:.1f})")
+    print(f"    latest_end_time: {strfseconds(summary.latest_end_time)}")
+    print(f"    delivered: {summary.delivered}/{summary.packages}, late: {summary.late}")
+    print(f"    seconds: {summary.seconds:.2f} ({summary.scenarios_per_second:.1f} scenarios/sec)\n")
+
+
+
+@timed
+def print_packages_at_time(current_time: datetime, packages: PackageHistory, locations: Dictionary[int, Location]):
     '''Prints the status of all packages at a given time O(n)
     
     Args:
         current_time: time to check the status of the packages
         
     '''
-    # Change the input time to the current day to prevent incorrect comparisons with package updates.
-    cleaned_time = START_OF_DAY.replace(hour=current_time.hour, minute=current_time.minute, second=current_time.second)
+    # Change the input time to simulation seconds on the current day to prevent incorrect comparisons with package updates.
+    cleaned_time = to_seconds(start_of_day().replace(hour=current_time.hour, minute=current_time.minute, second=current_time.second))
     package_rows = []
 
-    # Sort the packages by id to ensure they are printed in order.
-    for e in sorted(packages.entries, key= lambda e: e.key):
-        update = None
-        for i in range(1,len(e.value)+1):
-            u = e.value[-1*i]
-            if u.timestamp <= cleaned_time:
-                update = u
-                break
-        location = locations[update.package.location_id]
-        row = create_package_log_message(location, update.package, update.timestamp, location.truck_id)
-        package_rows.append([strfdatetime(cleaned_time), update.package.package_id, row])
+    # The snapshot is already ordered by package id.
+    for update in packages.snapshot(cleaned_time): # O(n*log(k))
+        if update is not None:
+            package_rows.append(create_snapshot_row(cleaned_time, update, locations))
     print_package_table(package_rows)
+
+
+
+@timed
+def print_packages_at_times(times: List[datetime], packages: PackageHistory, locations: Dictionary[int, Location]):
+    '''Prints a status table for each of many times, sharing one pass over the package history O(n*(k+m))
+
+    Args:
+        times: times to check the status of the packages
+        packages: package history
+        locations: locations by id
+
+    '''
+    cleaned_times = [to_seconds(start_of_day().replace(hour=t.hour, minute=t.minute, second=t.second)) for t in times]
+
+    for cleaned_time, snapshot in zip(cleaned_times, packages.snapshots(cleaned_times)):
+        print_package_table([create_snapshot_row(cleaned_time, update, locations) for update in snapshot if update])
+        print()
+
+
+
+def create_snapshot_row(current_time: int, update: PackageUpdate, locations: Dictionary[int, Location]):
+    '''Creates a table row for a package's update in a status snapshot O(1)
+
+    Args:
+        current_time: seconds since the start of the day of the snapshot
+        update: the package update in effect at that time
+        locations: locations by id
+    Returns:
+        row: the table row
+
+    '''
+    location = locations[update.package.location_id]
+    message = create_package_log_message(location, update.package, update.timestamp, update.truck_id)
+    return [strfseconds(current_time), update.package.package_id, message]
+
+
+def print_progress(path: str, rows: int, bytes_read: int, total_bytes: int):
+    '''Prints how far a csv file has been read, for use as the datalayer progress callback O(1)
+
+    Args:
+        path: file being read
+        rows: rows read so far
+        bytes_read: bytes read so far
+        total_bytes: size of the file
+
+    '''
+    percent = 100 * bytes_read / total_bytes if total_bytes else 100
+    print(f"\r{path}: {rows} rows ({percent:.0f}%)", end="\n" if bytes_read >= total_bytes else "", flush=True)
@@ -1,26 +1,77 @@
-from datetime import datetime, timedelta
-from typing import List
-from globals import INCORRECT_ADDRESS_UPDATE_TIME, MPH, START_OF_DAY
+from datetime import datetime
+from typing import List, Tuple
+from globals import (
+    DELAYED_FLIGHT_ARRIVAL_SECONDS,
+    INCORRECT_ADDRESS_UPDATE_SECONDS,
+    MPH,
+    SECONDS_PER_HOUR,
+    START_OF_DAY_SECONDS,
+    TRUCK_CAPACITY,
+    drive_seconds,
+)
 from logger import (
+    event_log,
     log_line,
     log_event,
     log,
-    print_package_table,
+    print_event_log,
     print_packages_at_time,
     print_route_distances_and_times,
 )
-from models import DeliveryStatus, Location, PackageUpdate, Stop, StopReason
-from datalayer import get_data
+from hash_table import Dictionary
+from history import PackageHistory
+from models import DeliveryStatus, Location, Stop, StopReason, TruckResult
+from cache import cache_key, load_cache, save_cache
+from datalayer import find_location, index_locations, load_address_changes
+import instrumentation
+from instrumentation import timed
+from export import ResultExporter
+from local_search import greedy_sequence, improve_route
+from neighbors import neighbor_lists
+from optional import optional_import
+from partition import partition_loads
+from rerouting import change_address
+from scenario import Scenario
+from simulation import simulate_day
+
+# The day this program plans, set by use_scenario. Its data is used directly below, and package 9's
+# address is corrected once scenario.applied_changes[9] is set. Nothing is loaded on import, main
+# loads packages.csv and distances.csv if no day was set first.
+scenario: Scenario = None
+locations: Dictionary[int, Location] = None
+matrix = None
+packages: PackageHistory = None
+
+# Streams the history rows and stops out as they're planned, set by plan_day while exporting.
+exporter: ResultExporter = None
+
+# Dense copy of the matrix for vectorized routing, built the first time it is needed.
+dense_matrix = None
+NO_ARRIVAL = 2**63 - 1
+
+
+def use_scenario(day: Scenario):
+    """Points the functions below at a day's data O(1)
+
+    Args:
+        day: the scenario to plan and update
+
+    """
+    global scenario, locations, matrix, packages, dense_matrix
+    scenario = day
+    locations, matrix, packages = day.locations, day.matrix, day.packages
+    dense_matrix = None
 
-locations, matrix, packages = get_data()
-global updated_package_9_address 
-updated_package_9_address = False
+    # Index the packages before planning so every update below keeps the index current.
+    if packages.index is None:
+        packages.build_index(locations)
 
 
+@timed
 def update_packages(
     status: DeliveryStatus,
     location: Location,
-    timestamp: datetime,
+    timestamp: int,
     truck_id: int,
 ):
     """Updates the status of a list of packages O(n)
@@ -29,18 +80,20 @@ def update_packages(
         status: status to set the packages to
         location: location object
         package_ids: list of package ids
-        timestamp: datetime of the event
+        timestamp: seconds since the start of the day of the event
         truck_id: id of the truck
     Returns:
         package_ids: list of package ids
 
     """
+    # Recording the change also moves each package to its new status and truck in packages.index.
     for p_id in location.package_ids:
-        package = packages[p_id][-1].package.copy()
-        package.status = status
-        packages[p_id].append(PackageUpdate(timestamp, package))
+        package = packages.record(p_id, timestamp, status=status, truck_id=truck_id)
 
         log(location, package, timestamp, truck_id)
+
+    if exporter is not None:
+        exporter.add_history(packages)
     return location.package_ids
 
 
@@ -61,19 +114,20 @@ def calculate_truck_load(truck_load: List[int]):
 
 
 # Determine the priority of neighbor by time
-def calc_arrival(distance: float, cur_time: datetime, earliest: datetime):
+def calc_arrival(distance: float, cur_time: int, earliest: int):
     """Calculates the priority of a neighbor O(1)
 
     Args:
         distance: distance to the neighbor
-        cur_time: current time
-        earliest: earliest time the neighbor can be visited
+        cur_time: current time in seconds since the start of the day
+        earliest: earliest time the neighbor can be visited in seconds since the start of the day
     Returns:
-        est_arrival_time: estimated arrival time
+        est_arrival_time: estimated arrival time in seconds since the start of the day
 
     """
-    est_travel_hours = distance / MPH
-    est_arrival_time = cur_time + timedelta(hours=(est_travel_hours))
+    # Round the travel time to whole seconds, calc_arrivals rounds the exact same way.
+    est_travel_seconds = drive_seconds(distance)
+    est_arrival_time = cur_time + est_travel_seconds
 
     # If would arrive before min location time, set estimated arrival to location min time
     if est_arrival_time < earliest:
@@ -82,7 +136,47 @@ def calc_arrival(distance: float, cur_time: datetime, earliest: datetime):
     return est_arrival_time
 
 
-def update_package_9_delivery(current_time: datetime, load: List[int]):
+def calc_arrivals(distances, cur_time: int, earliest):
+    """Vectorized calc_arrival for many candidates at once O(n)
+
+    Args:
+        distances: NumPy array of distances to the candidates
+        cur_time: current time in seconds since the start of the day
+        earliest: NumPy array of the candidates' earliest times in seconds since the start of the day
+    Returns:
+        arrivals: NumPy int64 array of estimated arrival times in seconds since the start of the day
+
+    """
+    np = optional_import("numpy")
+
+    # The diagonal is inf, zero it so the conversion doesn't overflow. Those candidates are masked by the caller.
+    finite = np.where(np.isfinite(distances), distances, 0.0)
+
+    # np.rint rounds halves to even like round(), so every arrival matches calc_arrival.
+    travel_seconds = np.rint(finite / MPH * SECONDS_PER_HOUR).astype(np.int64)
+
+    # If would arrive before min location time, set estimated arrival to location min time
+    return np.maximum(cur_time + travel_seconds, earliest)
+
+
+def get_dense_matrix():
+    """Returns the distance matrix as a NumPy array, converting the list matrix only once O(n^2)
+
+    Returns:
+        dense_matrix: float64 NumPy matrix
+
+    """
+    global dense_matrix
+    if dense_matrix is None:
+        # NumPy is only needed for vectorized routing.
+        np = optional_import("numpy")
+        if np is None:
+            raise ImportError("Vectorized routing requires numpy")
+        dense_matrix = np.asarray(matrix, dtype=np.float64)
+    return dense_matrix
+
+
+def update_package_9_delivery(current_time: int, load: List[int]):
     """Updates the address of package 9 O(n)
 
     Args:
@@ -91,23 +185,27 @@ def update_package_9_delivery(current_time: datetime, load: List[int]):
         load: list of location ids
 
     """
-    # Update the global variable to prevent this function from being called again.
-    globals()["updated_package_9_address"] = True
-    new_location = None
-
     # Find the location with the matching address.
-    for location in locations.values:
-        if location.address == "410 S State St":
-
-            # Update the package location and location package ids.
-            package = packages[9][-1].package.copy()
-            package.location_id = location.location_id
-            packages[9].append(PackageUpdate(current_time, package))
-            location.package_ids.append(9)
-            new_location = location
-    
+    new_location = find_location("410 S State St")
+
+    # If another truck still has to deliver the new location's packages, leave the correction to it.
+    # Otherwise package 9 would go out with them before its address was known.
     not_in_load = len([l_id for l_id in load if l_id == new_location.location_id]) == 0
-    truck_has_room = calculate_truck_load(load) < 16
+    still_scheduled = any(
+        packages.latest(p_id).package.status != DeliveryStatus.delivered
+        for p_id in new_location.package_ids
+    )
+    if(not_in_load and still_scheduled):
+        return load
+
+    # Mark the correction applied to prevent this function from being called again.
+    scenario.applied_changes[9] = True
+
+    # Update the package location and location package ids.
+    packages.record(9, current_time, location_id=new_location.location_id)
+    new_location.package_ids.append(9)
+
+    truck_has_room = calculate_truck_load(load) < TRUCK_CAPACITY
 
     # If the new location is not in the load and the load has room, add the location with package 9 to the load.
     if(not_in_load and truck_has_room):
@@ -117,21 +215,74 @@ def update_package_9_delivery(current_time: datetime, load: List[int]):
     return load
 
 
+def pick_neighbor(
+    neighbor_ids: List[int], remaining: Dictionary[int, bool], current_id: int, cur_time: int
+):
+    """Picks the earliest arrival among a location's nearest locations that are still on the truck O(k)
+
+    Args:
+        neighbor_ids: the current location's nearest location ids, see neighbor_lists
+        remaining: location ids still on the truck
+        current_id: the truck's current location id
+        cur_time: current time in seconds since the start of the day
+    Returns:
+        next_location: the picked location, None if no neighbor is on the truck and can make its deadline
+        closest_dist: distance to the picked location
+        best_time: arrival at the picked location in seconds since the start of the day
+
+    """
+    next_location: Location = None
+    best_time: int = NO_ARRIVAL
+    closest_dist: float = float("inf")
+
+    distances = matrix[current_id]
+    for other_id in neighbor_ids:
+        if not remaining[other_id]:
+            continue
+
+        distance = float(distances[other_id])
+        other = locations[other_id]
+        est_arrival_time = calc_arrival(
+            distance, cur_time, other.earliest or START_OF_DAY_SECONDS
+        )
+
+        # Skip neighbors that would be late so the full scan can decide between them.
+        if est_arrival_time <= other.latest and best_time > est_arrival_time:
+            closest_dist = distance
+            best_time = est_arrival_time
+            next_location = other
+
+    return next_location, closest_dist, best_time
+
+
 # Given an array of locations, use a hueristic algorithm to determine the path.
 # This uses the greedy nearest neighbors algorithm. This is the self adjusting part of the code.
+@timed
 def route_load(
-    start_location_id: int, start_time: datetime, truck_id: int, load: List[int]
+    start_location_id: int,
+    start_time: int,
+    truck_id: int,
+    load: List[int],
+    vectorized: bool = False,
+    order: List[int] = None,
+    neighbor_k: int = None,
 ):
-    """Calculates the route for a truck. O(n^2)
+    """Calculates the route for a truck. O(n^2), O(n*k) with neighbor_k when the neighbors are on the truck
 
     Args:
         start_location_id: the id of the location that the truck starts from (integer),
-        start_time: the time the truck starts this route (datetime),
+        start_time: the time the truck starts this route (seconds since the start of the day),
         truck_id: the id of the truck carrying the load,
         load: the list of location_ids in this truck load (Array[integer])
+        vectorized: pick each stop with one NumPy operation over the matrix row instead of a Python loop.
+            The route is identical, it just needs numpy.
+        order: visit the load in this order instead, for example from improve_route. Locations that
+            aren't in it, like one added by the package 9 correction, are picked as usual afterwards.
+        neighbor_k: only compare the current location's k nearest locations, see neighbor_lists. The whole
+            load is only scanned when none of them are on the truck and can be reached by their deadline.
     Returns:
         route: list of stops
-        cur_time: time the truck finishes
+        cur_time: time the truck finishes in seconds since the start of the day
         total_route_distance: total distance traveled
         updated_package_9_address: whether or not package 9's address has been updated
 
@@ -142,45 +293,118 @@ def route_load(
     route: List[Stop] = []
     total_route_distance = float(0)
     cur_time = start_time
+    planned = list(reversed(order)) if order else []
+
+    # Keep the locations still on the truck in a Dictionary so neighbors can be checked in O(1).
+    if neighbor_k:
+        candidates = neighbor_lists(matrix, neighbor_k)
+        remaining = Dictionary[int, bool]()
+        for l_id in load:
+            remaining[l_id] = True
+
+    # For vectorized routing keep the load as arrays in load order with a mask of the locations still on the truck.
+    if vectorized:
+        np = optional_import("numpy")
+        dense = get_dense_matrix()
+        load_ids = np.array(load, dtype=np.int64)
+        earliest = np.array([locations[l_id].earliest or START_OF_DAY_SECONDS for l_id in load], dtype=np.int64)
+        on_truck = np.ones(len(load), dtype=bool)
 
     # Repeat until load is empty
     while 0 < len(load):  # O(n*log(n))
         # Instantiate variables for comparing neighbors.
         # This is where the nearest neighbor is temporarily stored while comparing others.
         next_location: Location = None
-        best_time: datetime = datetime.max
+        best_time: int = NO_ARRIVAL
         closest_dist: float = float("inf")
+        evaluated = 0
+
+        if planned:
+            # Follow the planned order while it lasts.
+            evaluated = 1
+            next_location = locations[planned.pop()]
+            closest_dist = float(matrix[current_id][next_location.location_id])
+            best_time = calc_arrival(
+                closest_dist, cur_time, next_location.earliest or START_OF_DAY_SECONDS
+            )
+
+        elif neighbor_k:
+            # Try the nearest locations first.
+            evaluated = len(candidates[current_id])
+            next_location, closest_dist, best_time = pick_neighbor(
+                candidates[current_id], remaining, current_id, cur_time
+            )
 
-        # Loop through other package locations loaded on the truck.
-        for other_id in load:
-            if other_id == current_id:
-                continue
+        # Only scan the whole load if nothing was picked yet.
+        if next_location is not None:
+            if vectorized:
+                on_truck[load_ids == next_location.location_id] = False
+
+        elif vectorized:
+            # Calculate every candidate's arrival at once, masking delivered locations and the current one.
+            evaluated += len(load)
+            arrivals = calc_arrivals(dense[current_id, load_ids], cur_time, earliest)
+            arrivals[~on_truck | (load_ids == current_id)] = NO_ARRIVAL
+
+            # argmin returns the first minimum, the same tie break as the strict comparison below.
+            best_idx = int(np.argmin(arrivals))
+            if arrivals[best_idx] != NO_ARRIVAL:
+                next_location = locations[int(load_ids[best_idx])]
+                closest_dist = float(dense[current_id, load_ids[best_idx]])
+                best_time = int(arrivals[best_idx])
+                on_truck[best_idx] = False
 
-            distance = matrix[current_id][other_id]
-            other = locations[other_id]
+        else:
+            # Look the row up once, it works for both list and NumPy matrices.
+            distances = matrix[current_id]
+            evaluated += len(load)
 
-            # Calculate the estimated arrival time.
-            est_arrival_time = calc_arrival(
-                distance, cur_time, other.earliest or START_OF_DAY
-            )
+            # Loop through other package locations loaded on the truck.
+            for other_id in load:
+                if other_id == current_id:
+                    continue
 
-            # find the highest priority (min) by comparing each item in the load.
-            # this will change the nearest neighbor if a closer one is found.
-            if best_time > est_arrival_time:
-                closest_dist = distance
-                best_time = est_arrival_time
-                next_location = other
+                distance = float(distances[other_id])
+                other = locations[other_id]
+
+                # Calculate the estimated arrival time.
+                est_arrival_time = calc_arrival(
+                    distance, cur_time, other.earliest or START_OF_DAY_SECONDS
+                )
+
+                # find the highest priority (min) by comparing each item in the load.
+                # this will change the nearest neighbor if a closer one is found.
+                if best_time > est_arrival_time:
+                    closest_dist = distance
+                    best_time = est_arrival_time
+                    next_location = other
 
         assert next_location is not None
 
+        # Count the candidates this step compared, only while instrumentation is on.
+        if instrumentation.counters is not None:
+            instrumentation.count("route_load.steps")
+            instrumentation.count("route_load.candidates", evaluated)
+
         total_route_distance += closest_dist
         cur_time = best_time
         current_id = next_location.location_id
 
         # Update package 9 address if it's after the update time and the package hasn't been updated yet.
-        if(not globals()["updated_package_9_address"] and cur_time >= INCORRECT_ADDRESS_UPDATE_TIME):
+        if(not scenario.applied_changes[9] and cur_time >= INCORRECT_ADDRESS_UPDATE_SECONDS):
+            load_size = len(load)
             load = update_package_9_delivery(cur_time, load)
 
+            # Add any location the correction put on the truck to the vectorized arrays.
+            if vectorized and len(load) > load_size:
+                added = load[load_size:]
+                load_ids = np.append(load_ids, np.array(added, dtype=np.int64))
+                earliest = np.append(earliest, [locations[l_id].earliest or START_OF_DAY_SECONDS for l_id in added])
+                on_truck = np.append(on_truck, np.ones(len(added), dtype=bool))
+            if neighbor_k:
+                for l_id in load[load_size:]:
+                    remaining[l_id] = True
+
         # Set all stops to delivery except package hub
         reason = StopReason.delivery
         if next_location.location_id == 0:
@@ -199,39 +423,43 @@ def route_load(
         # Remove next location_id from load to reduce subsequent iterations,
         # prevent duplicate deliveries, and infinite loops.
         load.remove(next_location.location_id)  # O(n)
+        if neighbor_k:
+            del remaining[next_location.location_id]
 
     return route, cur_time, total_route_distance
 
 
+@timed
 def update_load_status(
-    start_location_id: int, start_time: datetime, truck_id: int, load: List[int]
+    start_location_id: int, start_time: int, truck_id: int, load: List[int]
 ):
     """Logs the status of a truck load O(1)
 
     Args:
         start_location_id: id of the starting location
-        start_time: time the truck starts
+        start_time: time the truck starts in seconds since the start of the day
         truck_id: id of the truck
         load: list of location ids
 
     """
-    one_second_later = start_time.replace(second=start_time.second + 1)
+    one_second_later = start_time + 1
 
     # If the truck is empty, log that it is heading back to the hub to reload.
     if len(load) == 1:
-        log_line(one_second_later, "")
+        log_line(one_second_later, "", truck_id)
         log_event(
-            one_second_later, f"Truck {truck_id} is heading back to the hub to reload."
+            one_second_later, f"Truck {truck_id} is heading back to the hub to reload.", truck_id
         )
-        log_line(one_second_later, "")
+        log_line(one_second_later, "", truck_id)
     # Otherwise, log the truck is loaded with the packages.
     else:
-        log_line(start_time)
+        log_line(start_time, truck_id=truck_id)
         log_event(
             start_time,
             f"Truck {truck_id} is loaded with these {calculate_truck_load(load)} packages.",
+            truck_id,
         )
-        log_line(start_time, "")
+        log_line(start_time, "", truck_id)
 
         start_location = locations[start_location_id]
 
@@ -246,20 +474,31 @@ def update_load_status(
                 truck_id,
             )
 
-        log_line(one_second_later)
-        log_line(one_second_later, "")
+        log_line(one_second_later, truck_id=truck_id)
+        log_line(one_second_later, "", truck_id)
 
 
-def plan_truck_schedule(truck_id: int, schedule: List[List[int]], start_time: datetime):
+@timed
+def plan_truck_schedule(
+    truck_id: int,
+    schedule: List[List[int]],
+    start_time: int,
+    vectorized: bool = False,
+    improve: bool = False,
+    neighbor_k: int = None,
+):
     """Plans the schedule for a truck O(n)
 
     Args:
         truck_id: id of the truck
         schedule: list of lists of location ids
-        start_time: time the truck starts
+        start_time: time the truck starts in seconds since the start of the day
+        vectorized: route each load with NumPy, see route_load
+        improve: shorten each greedy route with 2-opt and Or-opt moves, see improve_route
+        neighbor_k: route with k nearest neighbor lists, see route_load
     Returns:
         routes: list of lists of stops
-        current_time: time the truck finishes
+        current_time: time the truck finishes in seconds since the start of the day
         distance: total distance traveled
 
     """
@@ -270,11 +509,34 @@ def plan_truck_schedule(truck_id: int, schedule: List[List[int]], start_time: da
 
     while 0 < len(schedule):  # O(n)
         next_load = schedule.pop()
+
+        # Wait at the hub until every package in the load has arrived.
+        for l_id in next_load:
+            if locations[l_id].earliest > current_time:
+                current_time = locations[l_id].earliest
+
         update_load_status(last_location, current_time, truck_id, next_load)
+
+        # Improve on the greedy order before driving it and log the miles it saved.
+        order = None
+        if improve and len(next_load) > 2:
+            greedy = greedy_sequence(
+                matrix, locations, last_location, current_time, next_load, neighbor_k
+            )
+            order, miles_saved = improve_route(matrix, locations, last_location, current_time, greedy)
+            log_event(
+                current_time,
+                f"Truck {truck_id} local search saved {miles_saved:.1f} miles over the greedy route.",
+                truck_id,
+            )
+
         route, end_time, miles = route_load(
-            last_location, current_time, truck_id, next_load
+            last_location, current_time, truck_id, next_load, vectorized, order, neighbor_k
         )
         routes.append(route)
+        if exporter is not None:
+            for stop in route:
+                exporter.add_stop(truck_id, len(routes) - 1, stop)
         last_location = route[-1].location.location_id
         distance += miles
         current_time = end_time
@@ -282,17 +544,366 @@ def plan_truck_schedule(truck_id: int, schedule: List[List[int]], start_time: da
     return routes, current_time, distance
 
 
-def main():
-    """Main function O(n) Constant: time = 0.0029 (sec)"""
+def simulate_truck(
+    truck_id: int,
+    schedule: List[List[int]],
+    start_time: int,
+    vectorized: bool = False,
+    owns_address_correction: bool = True,
+    improve: bool = False,
+    neighbor_k: int = None,
+):
+    """Plans one truck's schedule and collects everything it changed O(n)
+
+    This is the worker entry point for plan_trucks_parallel. The worker runs on its own copy of
+    the module state, so the changes are returned instead of being left in place.
+
+    Args:
+        truck_id: id of the truck
+        schedule: list of lists of location ids
+        start_time: time the truck starts in seconds since the start of the day
+        vectorized: route each load with NumPy, see route_load
+        owns_address_correction: whether this truck may apply the package 9 address correction
+        improve: shorten each greedy route, see plan_truck_schedule
+        neighbor_k: route with k nearest neighbor lists, see route_load
+    Returns:
+        result: the truck's routes, totals, new history rows, new log rows, and touched locations
+
+    """
+    # Only the owning truck may apply the correction, every other truck behaves as if it already happened.
+    if not owns_address_correction:
+        scenario.applied_changes[9] = True
+    was_updated = bool(scenario.applied_changes[9])
+
+    row_mark = packages.row_count
+    log_mark = event_log.row_count
+    touched = sorted({l_id for load in schedule for l_id in load})
+
+    routes, end_time, miles = plan_truck_schedule(
+        truck_id, schedule, start_time, vectorized, improve, neighbor_k
+    )
+
+    # The correction also changes the location package 9 moves to.
+    applied = not was_updated and bool(scenario.applied_changes[9])
+    if applied:
+        touched.append(packages.latest(9).package.location_id)
+
+    return TruckResult(
+        truck_id=truck_id,
+        routes=routes,
+        end_time=end_time,
+        miles=miles,
+        history_rows=packages.rows_since(row_mark),
+        log_rows=event_log.rows_since(log_mark),
+        locations=[locations[l_id] for l_id in touched],
+        applied_address_correction=applied,
+    )
+
+
+def merge_truck_result(result: TruckResult):
+    """Applies a worker's changes to this process's state O(n)
+
+    Args:
+        result: the result returned by simulate_truck
+
+    """
+    packages.extend(result.history_rows)
+    event_log.extend(result.log_rows)
+
+    # Workers don't export, their rows and stops are streamed out as each one is merged.
+    if exporter is not None:
+        exporter.add_history(packages)
+        for trip, stops in enumerate(result.routes):
+            for stop in stops:
+                exporter.add_stop(result.truck_id, trip, stop)
+
+    # Copy the fields the simulation changes so existing references to the locations stay valid.
+    for changed in result.locations:
+        location = locations[changed.location_id]
+        location.truck_id = changed.truck_id
+        location.package_ids = changed.package_ids
+
+    if result.applied_address_correction:
+        scenario.applied_changes[9] = True
+
+
+def stop_exporting():
+    """Keeps a forked worker from writing to the exporter's files, the parent exports its results O(1)"""
+    global exporter
+    exporter = None
+
+
+def plan_trucks_parallel(
+    plans: List[Tuple[int, List[List[int]], int]],
+    vectorized: bool = False,
+    processes: int = None,
+    improve: bool = False,
+    neighbor_k: int = None,
+):
+    """Plans every truck's schedule in its own worker process, then merges the results O(n)
+
+    Each worker is forked from this process, so it gets a copy-on-write view of the
+    locations, matrix, and packages that it only reads from the parent's point of view.
+    Results are merged in truck id order, the same order the trucks are planned in sequentially.
+
+    The package 9 address correction couples the trucks, so only one truck owns it: the first
+    truck, in truck id order, whose simulation reaches the update time. The lowest id is assumed
+    to own it. If that truck finishes before the update time, the next truck is run again as the
+    owner, and so on, before anything is merged.
+
+    Falls back to planning sequentially where processes can't be forked.
+
+    Args:
+        plans: (truck_id, schedule, start_time) per truck
+        vectorized: route each load with NumPy, see route_load
+        processes: the most worker processes, defaults to one per truck up to the cpu count
+        improve: shorten each greedy route, see plan_truck_schedule
+        neighbor_k: route with k nearest neighbor lists, see route_load
+    Returns:
+        results: one TruckResult per truck, in truck id order
+
+    """
+    # Only planning in parallel needs it, importing it is slow next to the rest of this module.
+    import multiprocessing
+
+    plans = sorted(plans, key=lambda plan: plan[0])
+
+    # Keep copies of the schedules because planning consumes them and a truck may be run again.
+    def args(i: int, owner: bool):
+        truck_id, schedule, start_time = plans[i]
+        return truck_id, [list(load) for load in schedule], start_time, vectorized, owner, improve, neighbor_k
+
+    owner = 0
+    owns = not scenario.applied_changes[9]
+
+    # Without fork the trucks run here one after another, changing this process's state directly.
+    if "fork" not in multiprocessing.get_all_start_methods():
+        results = []
+        for i in range(len(plans)):
+            result = simulate_truck(*args(i, owns and i == owner))
+            if owns and i == owner and not result.applied_address_correction:
+                owner += 1
+            results.append(result)
+        return results
+
+    # Fork a fresh worker per truck so no worker sees another truck's changes. maxtasksperchild
+    # counts chunks, so each chunk has to be a single truck.
+    context = multiprocessing.get_context("fork")
+    processes = processes or min(len(plans), multiprocessing.cpu_count())
+    with context.Pool(processes, initializer=stop_exporting, maxtasksperchild=1) as pool:
+        results = pool.starmap(
+            simulate_truck, [args(i, owns and i == owner) for i in range(len(plans))], chunksize=1
+        )
+
+        # Pass the correction on until a truck actually reaches the update time.
+        while owns and owner < len(plans) and not results[owner].applied_address_correction:
+            owner += 1
+            if owner < len(plans):
+                results[owner] = pool.apply(simulate_truck, args(owner, True))
+
+    for result in results:
+        merge_truck_result(result)
+    return results
+
+
+@timed
+def plan_day(
+    truck1: List[List[int]],
+    truck2: List[List[int]],
+    parallel: bool = False,
+    auto_partition: bool = False,
+    improve: bool = False,
+    neighbor_k: int = None,
+    reroute: bool = False,
+    simulate: bool = False,
+    export: str = None,
+):
+    """Plans both trucks' days and records them in the package history and event log O(n^2)
+
+    Args:
+        truck1: truck 1's hand written loads, used unless auto_partition
+        truck2: truck 2's hand written loads, used unless auto_partition
+        parallel: plan each truck in its own worker process, see plan_trucks_parallel
+        auto_partition: build the truck loads with partition_loads instead of the hand written lists
+        improve: shorten each greedy route with local search, see plan_truck_schedule
+        neighbor_k: route with k nearest neighbor lists, see route_load
+        reroute: apply the package 9 correction to the planned routes with change_address
+            instead of while routing
+        simulate: run both trucks, the flight arrival, and the package 9 correction as events in one
+            timeline with simulate_day. parallel, improve, neighbor_k, and reroute don't apply.
+        export: folder to write the package history, stops, and routes to as column files, see
+            ResultExporter. They're streamed while the day is planned, except with reroute, which
+            changes the planned rows and is exported after the correction.
+    Returns:
+        (route1, t1_end, t1_miles, route2, t2_end, t2_miles): each truck's routes, end time, and miles
+
+    """
+
+    if auto_partition:
+        plans = partition_loads(locations, matrix, packages)
+
+        # Delayed packages reach the hub when their location opens up.
+        if not simulate:
+            for location in locations.iter_values():
+                if location.earliest > START_OF_DAY_SECONDS:
+                    update_packages(DeliveryStatus.hub, location, location.earliest, None)
+    else:
+        later_start_time = DELAYED_FLIGHT_ARRIVAL_SECONDS
+        if not simulate:
+            for location_id in truck1[-1]:
+                update_packages(DeliveryStatus.hub, locations[location_id], later_start_time, 1)
+
+        plans = [(1, truck1, later_start_time), (2, truck2, START_OF_DAY_SECONDS)]
+
+    # The correction is applied after planning, so routing must not apply it too.
+    if reroute and not simulate:
+        scenario.applied_changes[9] = True
+
+    global exporter
+    writer = ResultExporter(export) if export else None
+
+    # The simulation streams to the writer itself, the planners through update_packages and
+    # plan_truck_schedule. A reroute changes rows and stops that were already planned, so it's
+    # only exported once the correction is in.
+    if not simulate and not reroute:
+        exporter = writer
+
+    # Stop streaming and close the files even if planning fails, so later calls don't write to them.
+    try:
+        if simulate:
+            results = simulate_day(
+                plans,
+                locations,
+                matrix,
+                packages,
+                scenario.address_changes,
+                exporter=writer,
+            )
+            route1, t1_end, t1_miles = results[1]
+            route2, t2_end, t2_miles = results[2]
+        elif parallel:
+            result1, result2 = plan_trucks_parallel(plans, improve=improve, neighbor_k=neighbor_k)
+            route1, t1_end, t1_miles = result1.routes, result1.end_time, result1.miles
+            route2, t2_end, t2_miles = result2.routes, result2.end_time, result2.miles
+        else:
+            (_, truck1, start1), (_, truck2, start2) = plans
+            route1, t1_end, t1_miles = plan_truck_schedule(
+                1, truck1, start1, improve=improve, neighbor_k=neighbor_k
+            )
+            route2, t2_end, t2_miles = plan_truck_schedule(
+                2, truck2, start2, improve=improve, neighbor_k=neighbor_k
+            )
+
+        if reroute and not simulate:
+            routes = Dictionary[int, List[List[Stop]]]()
+            routes[1], routes[2] = route1, route2
+            change = change_address(
+                9, "410 S State St", INCORRECT_ADDRESS_UPDATE_SECONDS, routes, packages, locations, matrix
+            )
+
+            # Only the truck that took the package drives further or finishes later.
+            if change.truck_id == 1:
+                t1_end, t1_miles = routes[1][-1][-1].stop_time, t1_miles + change.added_miles
+            else:
+                t2_end, t2_miles = routes[2][-1][-1].stop_time, t2_miles + change.added_miles
+
+        # Each truck's totals are only known once it's planned.
+        if writer is not None:
+            if reroute and not simulate:
+                writer.add_history(packages)
+                writer.add_routes(1, route1, t1_end, t1_miles)
+                writer.add_routes(2, route2, t2_end, t2_miles)
+            elif not simulate:
+                writer.add_history(packages)
+                writer.add_route(1, route1, t1_end, t1_miles)
+                writer.add_route(2, route2, t2_end, t2_miles)
+    finally:
+        exporter = None
+        if writer is not None:
+            writer.close()
+
+    return route1, t1_end, t1_miles, route2, t2_end, t2_miles
+
+
+def run_day(
+    parallel: bool = False,
+    auto_partition: bool = False,
+    improve: bool = False,
+    neighbor_k: int = None,
+    reroute: bool = False,
+    simulate: bool = False,
+    export: str = None,
+    cache: bool = True,
+):
+    """Loads the day if no scenario was set and plans it, or takes the planned day from the cache O(n^2)
+
+    Plans the scenario in place, so it runs once per scenario.
+
+    Args:
+        parallel: plan each truck in its own worker process, see plan_trucks_parallel
+        auto_partition: build the truck loads with partition_loads instead of the hand written lists
+        improve: shorten each greedy route with local search, see plan_truck_schedule
+        neighbor_k: route with k nearest neighbor lists, see route_load
+        reroute: apply the package 9 correction to the planned routes with change_address
+            instead of while routing
+        simulate: run both trucks, the flight arrival, and the package 9 correction as events in one
+            timeline with simulate_day. parallel, improve, neighbor_k, and reroute don't apply.
+        export: folder to write the package history, stops, and routes to as column files, see
+            ResultExporter. They're streamed while the day is planned, except with reroute, which
+            changes the planned rows and is exported after the correction.
+        cache: reuse the planned day from the last run on the same files with the same options and
+            truck loads instead of planning it again, see cache.py. Not used when exporting.
+    Returns:
+        (route1, t1_end, t1_miles, route2, t2_end, t2_miles): each truck's routes, end time, and miles
 
-    later_start_time = START_OF_DAY.replace(hour=9, minute=5)
-    truck1 = [[22, 24, 26], [0], [2, 4, 5, 9, 11, 14, 15, 18]]
-    for location_id in truck1[-1]:
-        update_packages(DeliveryStatus.hub, locations[location_id], later_start_time, 1)
-    route1, t1_end, t1_miles = plan_truck_schedule(1, truck1, later_start_time)
+    """
+    # Read the files the first time, reusing what was parsed from them while they don't change.
+    if scenario is None:
+        use_scenario(Scenario.load(events=event_log, address_changes=load_address_changes(), cache=cache))
 
+    truck1 = [[22, 24, 26], [0], [2, 4, 5, 9, 11, 14, 15, 16, 18]]
     truck2 = [[1, 6, 7, 8, 12, 13, 19, 17, 25], [0], [3, 10, 23], [0], [20, 21]]
-    route2, t2_end, t2_miles = plan_truck_schedule(2, truck2, START_OF_DAY)
+    options = (parallel, auto_partition, improve, neighbor_k, reroute, simulate)
+
+    # The planned day, its history and event log included, is keyed on the files and everything
+    # that changes the plan.
+    day_key = None
+    day = None
+    if cache and not export and scenario.data_key is not None:
+        day_key = cache_key("day", scenario.data_key, options, truck1, truck2)
+        day = load_cache("day", day_key)
+
+    if day is not None:
+        cached, route1, t1_end, t1_miles, route2, t2_end, t2_miles = day
+        use_scenario(cached)
+        index_locations(locations)
+    else:
+        route1, t1_end, t1_miles, route2, t2_end, t2_miles = plan_day(truck1, truck2, *options, export)
+        if day_key is not None:
+            save_cache("day", day_key, (scenario, route1, t1_end, t1_miles, route2, t2_end, t2_miles))
+
+    return route1, t1_end, t1_miles, route2, t2_end, t2_miles
+
+
+def main(
+    parallel: bool = False,
+    auto_partition: bool = False,
+    improve: bool = False,
+    neighbor_k: int = None,
+    reroute: bool = False,
+    simulate: bool = False,
+    export: str = None,
+    cache: bool = True,
+):
+    """Main function O(n) Constant: time = 0.0029 (sec)
+
+    Plans the day with run_day, then answers questions about it at a prompt. The arguments are
+    the same as run_day's.
+
+    """
+    route1, t1_end, t1_miles, route2, t2_end, t2_miles = run_day(
+        parallel, auto_partition, improve, neighbor_k, reroute, simulate, export, cache
+    )
 
     running = True
     while running:
@@ -308,7 +919,7 @@ def main():
         if user_input.lower() == "x":
             running = False
         elif user_input.lower() == "t":
-            print_package_table()
+            print_event_log(packages, locations, scenario.events)
         elif user_input.lower() == "s":
             print_route_distances_and_times(t1_end, t1_miles, t2_end, t2_miles)
         else:
@@ -322,4 +933,5 @@ def main():
                 break
             print_packages_at_time(input_time, packages, locations)
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@ from dataclasses import dataclass
 import enum
 import time
 from typing import TypeVar, Generic, List, TypeVarTuple
-from datetime import datetime
+from datetime import datetime, timedelta
+from globals import START_OF_DAY_CLOCK_SECONDS, start_of_day
 
 
 def strfdatetime(value: datetime):
@@ -20,6 +21,49 @@ def strfdatetime(value: datetime):
     return value.strftime("%H:%M:%S")
 
 
+
+def to_seconds(value: datetime):
+    '''Converts a datetime to the simulation's whole seconds since START_OF_DAY. O(1)
+
+    Args:
+        value (datetime): The datetime to convert.
+    Returns:
+        int: Seconds since START_OF_DAY, negative before it.
+
+    '''
+    return int((value - start_of_day()).total_seconds())
+
+
+
+def to_datetime(seconds: int):
+    '''Converts simulation seconds back to a datetime for display. O(1)
+
+    Args:
+        seconds (int): Seconds since START_OF_DAY.
+    Returns:
+        datetime: The matching datetime today.
+
+    '''
+    return start_of_day() + timedelta(seconds=seconds)
+
+
+
+def strfseconds(seconds: int):
+    '''Formats simulation seconds like strfdatetime without building a datetime. O(1)
+
+    Args:
+        seconds (int): Seconds since START_OF_DAY.
+    Returns:
+        str: The time of day formatted like hh:mm:ss
+
+    '''
+    if seconds is None:
+        return None
+    minutes, second = divmod((seconds + START_OF_DAY_CLOCK_SECONDS) % 86400, 60)
+    hour, minute = divmod(minutes, 60)
+    return f"{hour:02}:{minute:02}:{second:02}"
+
+
 KT = TypeVar("KT")
 VT = TypeVar("VT")
 
@@ -46,14 +90,15 @@ class DeliveryStatus(enum.Enum):
 
 
 
-@dataclass
+# All times on the models below are whole seconds since START_OF_DAY, see to_seconds and to_datetime.
+@dataclass(slots=True)
 class Package:
     package_id: int
     location_id: int
     weight: str
     notes: str
-    earliest: datetime
-    latest: datetime
+    earliest: int
+    latest: int
     status: DeliveryStatus
 
     def copy(self):
@@ -69,10 +114,23 @@ class Package:
 
 
 
-@dataclass
+@dataclass(slots=True)
+class PackageRecord:
+    """A package read from the packages file with the address it should be delivered to."""
+
+    package: Package
+    address: str
+    city: str
+    state: str
+    postal_code: str
+
+
+
+@dataclass(slots=True)
 class PackageUpdate:
-    timestamp: datetime
+    timestamp: int
     package: Package
+    truck_id: int = None
 
 
 
@@ -88,14 +146,76 @@ class Location:
     state: str
     postal_code: str
     package_ids: List[int]
-    earliest: datetime
-    latest: datetime
+    earliest: int
+    latest: int
     truck_id: int = None
 
 
 @dataclass
 class Stop:
-    stop_time: datetime
+    stop_time: int
     travel_distance: float
     location: Location
     reason: str
+
+
+
+@dataclass
+class AddressChange:
+    """Where an address change put a package and what it cost the truck."""
+
+    package_id: int
+    truck_id: int
+    location_id: int
+    delivery_time: int
+    added_miles: float
+    moved_stops: int
+    late_seconds: int
+
+
+
+@dataclass
+class TruckResult:
+    """Everything one truck's simulation changed, so it can be run in a worker process and merged back."""
+
+    truck_id: int
+    routes: List[List[Stop]]
+    end_time: int
+    miles: float
+    history_rows: List[tuple]
+    log_rows: List[tuple]
+    locations: List[Location]
+    applied_address_correction: bool
+
+
+
+@dataclass
+class ScenarioResult:
+    """Totals of one scenario's run, small enough to send back from a worker process."""
+
+    name: str
+    trucks: int
+    miles: float
+    end_time: int
+    packages: int
+    delivered: int
+    late: int
+    events: int
+    seconds: float
+
+
+
+@dataclass
+class BatchSummary:
+    """Aggregate stats over every scenario of a batch run."""
+
+    scenarios: int
+    miles: float
+    mean_miles: float
+    max_miles: float
+    latest_end_time: int
+    packages: int
+    delivered: int
+    late: int
+    seconds: float
+    scenarios_per_second: float
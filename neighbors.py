@@ -0,0 +1,77 @@
+import heapq
+from typing import Iterable, List
+from hash_table import Dictionary
+from optional import optional_import
+
+
+NEIGHBOR_COUNT = 10
+
+# Neighbor lists by k for the matrix they were built from.
+_lists = Dictionary[int, List[List[int]]]()
+_lists_matrix = None
+
+
+
+def nearest(matrix, l_id: int, candidates: Iterable[int], count: int):
+    '''Returns up to count candidates closest to a location, nearest first, lowest id on ties O(n*log(k))
+
+    Args:
+        matrix: distances between locations
+        l_id: the location to measure from
+        candidates: location ids to choose from, in id order
+        count: the most candidates to return
+    Returns:
+        nearest: location ids
+
+    '''
+    row = matrix[l_id]
+    return heapq.nsmallest(count, (c for c in candidates if c != l_id), key=lambda c: float(row[c]))
+
+
+
+def _build(matrix, k: int):
+    '''Builds every location's k nearest list O(n^2) with NumPy, O(n^2*log(k)) without'''
+    n = len(matrix)
+
+    # NumPy is only needed to build the lists faster.
+    np = optional_import("numpy")
+    if np is None:
+        return [nearest(matrix, l_id, range(n), k) for l_id in range(n)]
+
+    dense = np.array(matrix, dtype=np.float64)
+    # The diagonal is inf in the matrix already, set it anyway so a location is never its own neighbor.
+    np.fill_diagonal(dense, np.inf)
+
+    # Partition each row to find its k-th smallest distance in O(n), then only the k closest are sorted.
+    kth = np.partition(dense, k - 1, axis=1)[:, k - 1]
+
+    lists = []
+    for row, limit in zip(dense, kth):
+        # Everything closer than the k-th distance is in, ties with it are taken by lowest id like nearest.
+        closer = np.flatnonzero(row < limit)
+        closer = closer[np.lexsort((closer, row[closer]))]
+        tied = np.flatnonzero(row == limit)[:k - len(closer)]
+        lists.append(closer.tolist() + tied.tolist())
+    return lists
+
+
+
+def neighbor_lists(matrix, k: int = NEIGHBOR_COUNT):
+    '''Returns each location's k nearest locations, built once per matrix and k O(n^2) then O(1)
+
+    Args:
+        matrix: distances between locations, a list of lists or a NumPy array
+        k: how many neighbors each location keeps
+    Returns:
+        lists: location id -> up to k location ids, nearest first
+
+    '''
+    global _lists, _lists_matrix
+    if _lists_matrix is not matrix:
+        _lists = Dictionary[int, List[List[int]]]()
+        _lists_matrix = matrix
+
+    k = min(k, len(matrix) - 1)
+    if _lists[k] is None:
+        _lists[k] = _build(matrix, k) if k > 0 else [[] for _ in range(len(matrix))]
+    return _lists[k]
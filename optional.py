@@ -0,0 +1,26 @@
+import importlib
+
+
+# Module name -> the module, or None when it isn't installed.
+_modules: dict = {}
+
+
+
+def optional_import(name: str):
+    '''Imports an optional dependency the first time it's needed O(1)
+
+    NumPy and pyarrow take longer to import than the rest of the program, so modules that only use
+    them for some formats or options call this where they're used instead of importing at the top.
+
+    Args:
+        name: the module, like "numpy" or "pyarrow"
+    Returns:
+        module: The module, or None if it isn't installed
+
+    '''
+    if name not in _modules:
+        try:
+            _modules[name] = importlib.import_module(name)
+        except ImportError:
+            _modules[name] = None
+    return _modules[name]
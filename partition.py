@@ -0,0 +1,352 @@
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+from globals import START_OF_DAY_SECONDS, TRUCK_CAPACITY, travel_seconds
+from hash_table import Dictionary
+from history import PackageHistory
+from instrumentation import timed
+from local_search import greedy_sequence
+from models import Location
+from neighbors import NEIGHBOR_COUNT, neighbor_lists
+
+
+HUB_ID = 0
+
+# Special notes in the packages file that constrain where a package can go.
+TRUCK_NOTE = re.compile(r"truck (\d+)", re.IGNORECASE)
+DELIVERED_WITH_NOTE = re.compile(r"delivered with ([\d,\s]+)", re.IGNORECASE)
+
+
+
+@dataclass
+class Load:
+    """A group of locations delivered in one trip from the hub."""
+
+    location_ids: List[int]
+    package_count: int
+    truck_id: int
+    earliest: int
+    latest: int
+
+
+
+def _simulate(matrix, locations: Dictionary[int, Location], sequence: List[int], departure: int):
+    '''Drives a sequence of locations from the hub and returns when the truck is back O(n)
+
+    Args:
+        matrix: distances between locations
+        locations: locations by id
+        sequence: location ids in delivery order
+        departure: seconds since the start of the day the truck leaves the hub
+    Returns:
+        (int): The time the truck is back at the hub, or None if a stop would miss its deadline
+
+    '''
+    current_time = departure
+    previous = HUB_ID
+    for l_id in sequence:
+        location = locations[l_id]
+        current_time = max(current_time + travel_seconds(matrix, previous, l_id), location.earliest)
+        if current_time > location.latest:
+            return None
+        previous = l_id
+    return current_time + travel_seconds(matrix, previous, HUB_ID)
+
+
+
+def _drive(matrix, locations: Dictionary[int, Location], location_ids: List[int], departure: int):
+    '''Drives a load the way route_load will and returns when the truck is back O(n^2)
+
+    The savings merge only decides which locations share a load. route_load picks each stop by earliest
+    arrival when the load is driven, so deadlines are checked on that order instead of the merge order.
+
+    Args:
+        matrix: distances between locations
+        locations: locations by id
+        location_ids: the load, in the order it's handed to route_load
+        departure: seconds since the start of the day the truck leaves the hub
+    Returns:
+        (int): The time the truck is back at the hub, or None if a stop would miss its deadline
+
+    '''
+    sequence = greedy_sequence(matrix, locations, HUB_ID, departure, location_ids)
+    return _simulate(matrix, locations, sequence, departure)
+
+
+
+def _slack(matrix, locations: Dictionary[int, Location], load: Load):
+    '''Returns how long a load's departure could slip before a stop misses its deadline O(n^2)
+
+    The load is driven the way route_load will, leaving as soon as its packages are at the hub.
+    Negative slack means a stop is already late.
+
+    '''
+    departure = max(load.earliest, START_OF_DAY_SECONDS)
+    slack = None
+    current_time = departure
+    previous = HUB_ID
+    for l_id in greedy_sequence(matrix, locations, HUB_ID, departure, load.location_ids):
+        location = locations[l_id]
+        current_time = max(current_time + travel_seconds(matrix, previous, l_id), location.earliest)
+        if slack is None or slack > location.latest - current_time:
+            slack = location.latest - current_time
+        previous = l_id
+    return slack
+
+
+
+def _find(parents: Dictionary[int, int], l_id: int):
+    '''Returns the representative of a location's group, compressing the path O(log(n))'''
+    root = l_id
+    while parents[root] != root:
+        root = parents[root]
+    while parents[l_id] != root:
+        parents[l_id], l_id = root, parents[l_id]
+    return root
+
+
+
+def _package_constraints(locations: Dictionary[int, Location], packages: PackageHistory):
+    '''Reads the truck restrictions and delivered-together groups from the package notes O(n)
+
+    Args:
+        locations: locations by id
+        packages: package history
+    Returns:
+        truck_ids: location id -> the only truck allowed to carry its packages
+        parents: location id -> union find parent, locations in one group must share a load
+
+    '''
+    truck_ids = Dictionary[int, int]()
+    parents = Dictionary[int, int]()
+    package_locations = Dictionary[int, int]()
+
+    for location in locations.iter_values():
+        if location.location_id == HUB_ID or not location.package_ids:
+            continue
+        parents[location.location_id] = location.location_id
+        for p_id in location.package_ids:
+            package_locations[p_id] = location.location_id
+
+    for location in locations.iter_values():
+        if parents[location.location_id] is None:
+            continue
+        for p_id in location.package_ids:
+            notes = packages.latest(p_id).package.notes
+
+            # "Can only be on truck 2"
+            match = TRUCK_NOTE.search(notes)
+            if match:
+                truck_id = int(match.group(1))
+                if truck_ids[location.location_id] not in (None, truck_id):
+                    raise ValueError(f"Location {location.location_id} has packages restricted to different trucks")
+                truck_ids[location.location_id] = truck_id
+
+            # "Must be delivered with 13, 15"
+            match = DELIVERED_WITH_NOTE.search(notes)
+            if match:
+                for other_id in match.group(1).replace(",", " ").split():
+                    other_location = package_locations[int(other_id)]
+                    if other_location is not None:
+                        parents[_find(parents, other_location)] = _find(parents, location.location_id)
+
+    return truck_ids, parents
+
+
+
+def build_loads(
+    locations: Dictionary[int, Location],
+    matrix,
+    packages: PackageHistory,
+    capacity: int = TRUCK_CAPACITY,
+    neighbor_count: int = NEIGHBOR_COUNT,
+):
+    '''Groups the locations with packages into truck loads with the Clarke-Wright savings heuristic O(n*k*log(n*k))
+
+    Every location starts as its own trip from the hub. Trips are joined end to end in order of
+    the distance saved by not returning to the hub in between, as long as the joined trip fits in
+    the truck, every stop still meets its deadline in the order route_load will drive it, and both
+    trips have the same truck restriction. Savings are
+    only computed between each location and its neighbor_count nearest locations, so the pair list
+    grows with n*k instead of n^2. A group of locations that must be delivered together and doesn't
+    fit in the truck raises a ValueError, there's no load it could go out in.
+
+    Args:
+        locations: locations by id
+        matrix: distances between locations
+        packages: package history, used for the special notes
+        capacity: the most packages per load
+        neighbor_count: how many nearest locations to consider joining each location with
+    Returns:
+        loads: the loads, each with its delivery sequence and constraints
+
+    '''
+    truck_ids, parents = _package_constraints(locations, packages)
+    stops = [l_id for l_id in parents.iter_keys()]
+
+    # Start with one trip per group of locations that must be delivered together.
+    groups = Dictionary[int, List[int]]()
+    for l_id in stops:
+        root = _find(parents, l_id)
+        if groups[root] is None:
+            groups[root] = []
+        groups[root].append(l_id)
+
+    routes = Dictionary[int, Load]()
+    route_of = Dictionary[int, int]()
+    for root, members in groups.iter_items():
+        location_group = [locations[l_id] for l_id in members]
+        restricted = {truck_ids[l_id] for l_id in members} - {None}
+        if len(restricted) > 1:
+            raise ValueError(f"Locations {members} must share a load but are restricted to different trucks")
+        package_count = sum(len(l.package_ids) for l in location_group)
+        if package_count > capacity:
+            raise ValueError(f"Locations {members} must share a load but have {package_count} packages, more than a truck's {capacity}")
+
+        # Order the group's stops by distance from the hub.
+        members.sort(key=lambda l_id: float(matrix[HUB_ID][l_id]))
+        routes[root] = Load(
+            location_ids=members,
+            package_count=package_count,
+            truck_id=restricted.pop() if restricted else None,
+            earliest=max(l.earliest for l in location_group),
+            latest=min(l.latest for l in location_group),
+        )
+        for l_id in members:
+            route_of[l_id] = root
+
+    # Savings of joining i and j instead of visiting each from the hub, only between near neighbors.
+    hub_row = matrix[HUB_ID]
+    savings = []
+    for i in stops: # O(n*k)
+        for j in neighbor_lists(matrix, neighbor_count)[i]:
+            if i < j and parents[j] is not None:
+                savings.append((float(hub_row[i]) + float(hub_row[j]) - float(matrix[i][j]), i, j))
+    savings.sort(reverse=True)
+
+    for saving, i, j in savings: # O(n*k)
+        ri, rj = route_of[i], route_of[j]
+        if ri == rj or saving <= 0:
+            continue
+
+        a, b = routes[ri], routes[rj]
+        if a.package_count + b.package_count > capacity:
+            continue
+        # Keep restricted locations to themselves so the restriction doesn't spread to every load.
+        if a.truck_id != b.truck_id:
+            continue
+
+        # i and j have to be at the ends of their trips so they can be joined next to each other.
+        if a.location_ids[-1] == i:
+            first = a.location_ids
+        elif a.location_ids[0] == i:
+            first = a.location_ids[::-1]
+        else:
+            continue
+        if b.location_ids[0] == j:
+            second = b.location_ids
+        elif b.location_ids[-1] == j:
+            second = b.location_ids[::-1]
+        else:
+            continue
+
+        sequence = first + second
+        earliest = max(a.earliest, b.earliest)
+        if _drive(matrix, locations, sequence, max(earliest, START_OF_DAY_SECONDS)) is None:
+            continue
+
+        # Join b into a.
+        a.location_ids = sequence
+        a.package_count += b.package_count
+        a.earliest = earliest
+        a.latest = min(a.latest, b.latest)
+        for l_id in b.location_ids:
+            route_of[l_id] = ri
+        del routes[rj]
+
+    return list(routes.iter_values())
+
+
+
+@timed
+def partition_loads(
+    locations: Dictionary[int, Location],
+    matrix,
+    packages: PackageHistory,
+    truck_ids: List[int] = (1, 2),
+    capacity: int = TRUCK_CAPACITY,
+    neighbor_count: int = NEIGHBOR_COUNT,
+) -> List[Tuple[int, List[List[int]], int]]:
+    '''Builds loads and assigns them to trucks, replacing hand written truck schedules O(n*k*log(n*k))
+
+    Loads are handed out in order of their earliest deadline. Each goes to the truck that can leave
+    the hub with it first and still make its deadlines, out of the trucks it is allowed on. A load
+    with delayed packages can't leave before they arrive at the hub. Every load is checked against
+    the capacity before it's handed out, a ValueError says which one doesn't fit.
+
+    Args:
+        locations: locations by id
+        matrix: distances between locations
+        packages: package history, used for the special notes
+        truck_ids: the trucks with drivers
+        capacity: the most packages per load
+        neighbor_count: how many nearest locations to consider joining each location with
+    Returns:
+        plans: (truck_id, schedule, start_time) for every truck, schedules in the format plan_truck_schedule pops from
+
+    '''
+    loads = build_loads(locations, matrix, packages, capacity, neighbor_count)
+    loads.sort(key=lambda load: (load.latest, load.earliest, _slack(matrix, locations, load)))
+
+    available = Dictionary[int, int]()
+    start_times = Dictionary[int, int]()
+    assigned = Dictionary[int, List[List[int]]]()
+    for truck_id in truck_ids:
+        available[truck_id] = START_OF_DAY_SECONDS
+        assigned[truck_id] = []
+
+    for load in loads:
+        candidates = [load.truck_id] if load.truck_id is not None else truck_ids
+        if load.truck_id is not None and load.truck_id not in truck_ids:
+            raise ValueError(f"Packages at {load.location_ids} need truck {load.truck_id}, which isn't available")
+        if load.package_count > capacity:
+            raise ValueError(f"The load {load.location_ids} has {load.package_count} packages, more than a truck's {capacity}")
+
+        # Pick the truck that can leave with this load first and still make every deadline, lowest id on ties.
+        # If none can, the first to leave takes it.
+        back = None
+        for truck_id in sorted(candidates, key=lambda t: (max(available[t], load.earliest), t)):
+            departure = max(available[truck_id], load.earliest)
+            back = _drive(matrix, locations, load.location_ids, departure)
+            if back is not None:
+                break
+        if back is None:
+            truck_id = min(candidates, key=lambda t: (max(available[t], load.earliest), t))
+            departure = max(available[truck_id], load.earliest)
+
+        if not assigned[truck_id]:
+            start_times[truck_id] = departure
+
+        if back is None:
+            # The deadline can't be met any more, deliver it as soon as possible anyway.
+            back = departure
+            previous = HUB_ID
+            for l_id in greedy_sequence(matrix, locations, HUB_ID, departure, load.location_ids) + [HUB_ID]:
+                back = max(back + travel_seconds(matrix, previous, l_id), locations[l_id].earliest)
+                previous = l_id
+        available[truck_id] = back
+        assigned[truck_id].append(load.location_ids)
+
+    # Schedules are popped from the end and separated by trips back to the hub.
+    plans = []
+    for truck_id in truck_ids:
+        schedule = []
+        for location_ids in assigned[truck_id]:
+            if schedule:
+                schedule.append([HUB_ID])
+            schedule.append(list(location_ids))
+        schedule.reverse()
+        # A truck without loads gets an empty schedule and stays at the hub.
+        start_time = start_times[truck_id] if schedule else START_OF_DAY_SECONDS
+        plans.append((truck_id, schedule, start_time))
+    return plans
@@ -0,0 +1,524 @@
+import argparse
+import json
+import sys
+from typing import Iterable, Iterator, List, TextIO, Tuple
+import main as planner
+from globals import START_OF_DAY_CLOCK_SECONDS
+from hash_table import Dictionary
+from history import PackageHistory
+from models import DeliveryStatus, Location, PackageUpdate, Stop, strfseconds
+
+
+# Query kinds, a query line starts with one of these or is a bare time.
+QUERY_KINDS = ["package", "truck", "time", "find"]
+
+# Fields a find query can match, see parse_filters.
+FILTERS = ["status", "truck", "location", "zip", "due"]
+
+# Snapshots kept for repeated times. Past this many they're dropped and rebuilt as needed.
+SNAPSHOT_CACHE_SIZE = 64
+
+
+
+def parse_time(text: str):
+    '''Parses a time of day like the prompt's hhmm, or hh:mm and hh:mm:ss, into simulation seconds O(1)
+
+    Args:
+        text: the time
+    Returns:
+        seconds: Seconds since the start of the day
+
+    '''
+    text = str(text).strip()
+    parts = text.split(":") if ":" in text else [text[:-2], text[-2:]]
+    if not 2 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        raise ValueError(f"{text!r} is not a time, expected hhmm, hh:mm, or hh:mm:ss")
+
+    hour, minute, second = (int(part) for part in parts + ["0"] * (3 - len(parts)))
+    if hour > 23 or minute > 59 or second > 59:
+        raise ValueError(f"{text!r} is not a time of day")
+    return hour * 3600 + minute * 60 + second - START_OF_DAY_CLOCK_SECONDS
+
+
+
+def parse_filters(filters: dict):
+    '''Turns a find query's fields into PackageHistory.find arguments O(1)
+
+    status takes status names separated by commas, or one name after a ! for every other status.
+    due takes a time like parse_time and matches deadlines before it.
+
+    Args:
+        filters: field name -> value, the names are FILTERS
+    Returns:
+        arguments: keyword arguments for PackageHistory.find
+
+    '''
+    unknown = [name for name in filters if name not in FILTERS]
+    if unknown:
+        raise ValueError(f"Unknown find field {unknown[0]!r}, expected one of {FILTERS}")
+
+    # JSON queries can hold any type, each field is a string or a number, status can also be a list of names.
+    for name, value in filters.items():
+        if value is None or isinstance(value, str) or (isinstance(value, int) and not isinstance(value, bool)):
+            continue
+        if name == "status" and isinstance(value, list) and value and all(isinstance(item, str) for item in value):
+            continue
+        raise ValueError(f"{name} has to be a string" + (" or a list of strings" if name == "status" else " or a number"))
+
+    arguments = {}
+    if filters.get("status") is not None:
+        names = filters["status"]
+        if isinstance(names, int):
+            raise ValueError("status has to be a string or a list of strings")
+        if isinstance(names, str):
+            names = names.split(",")
+        negate = len(names) == 1 and names[0].startswith("!")
+        names = [name.lstrip("!").lower() for name in names]
+
+        statuses = [status for status in DeliveryStatus if status.value.lower() in names]
+        if len(statuses) != len(names):
+            raise ValueError(f"Unknown status in {filters['status']!r}")
+        if negate:
+            statuses = [status for status in DeliveryStatus if status not in statuses]
+        arguments["statuses"] = statuses
+
+    for name, argument in (("truck", "truck_id"), ("location", "location_id")):
+        if filters.get(name) is not None:
+            if not str(filters[name]).isdigit():
+                raise ValueError(f"{name} has to be an id")
+            arguments[argument] = int(filters[name])
+    if filters.get("zip") is not None:
+        arguments["postal_code"] = str(filters["zip"])
+    if filters.get("due") is not None:
+        arguments["due_before"] = parse_time(filters["due"])
+    return arguments
+
+
+
+def parse_query(line: str):
+    '''Parses one query line O(1)
+
+    A line is either text or a JSON object:
+        package 9           package 9 at the end of the day
+        package 9 1030      package 9 at 10:30
+        truck 2 10:30       truck 2 at 10:30
+        time 1030, or 1030  every package at 10:30
+        find status=enroute truck=2
+                            the packages matching every field as of their latest update, see parse_filters
+        {"package": 9, "time": "1030", "id": "abc"}
+        {"find": {"status": "!delivered", "due": "1030"}}
+    An "id" in a JSON query is returned with its answer.
+
+    Args:
+        line: the query
+    Returns:
+        kind: one of QUERY_KINDS
+        key: the package or truck id, the PackageHistory.find arguments for a find query, None for a time query
+        timestamp: seconds since the start of the day, None for the end of the day
+        tag: the query's id, or None
+
+    '''
+    line = line.strip()
+    tag = None
+
+    if line.startswith("{"):
+        query = json.loads(line)
+        if not isinstance(query, dict):
+            raise ValueError("A JSON query is an object")
+        tag = query.get("id")
+        kinds = [kind for kind in QUERY_KINDS if kind in query and kind != "time"]
+        if len(kinds) > 1:
+            raise ValueError("A query asks about one package or one truck")
+        kind = kinds[0] if kinds else "time"
+        key = query.get(kind) if kind != "time" else None
+        time_text = query.get("time")
+        if kind == "find" and not isinstance(key, dict):
+            raise ValueError("A JSON find query's fields are an object")
+    else:
+        words = line.split()
+        if words and words[0].lower() in QUERY_KINDS:
+            kind = words.pop(0).lower()
+        else:
+            kind = "time"
+
+        # A find query is name=value words, the others an id and a time.
+        if kind == "find":
+            key = dict(word.partition("=")[::2] for word in words)
+            words = []
+        else:
+            key = words.pop(0) if kind != "time" and words else None
+        if len(words) > 1:
+            raise ValueError(f"Too many words in {line!r}")
+        time_text = words[0] if words else None
+
+    if kind == "find":
+        if time_text is not None:
+            raise ValueError("A find query matches each package's latest update, it doesn't take a time")
+        key = parse_filters(key)
+    elif kind != "time":
+        if key is None or not str(key).isdigit():
+            raise ValueError(f"A {kind} query needs a {kind} id")
+        key = int(key)
+    elif time_text is None:
+        raise ValueError("A time query needs a time")
+
+    timestamp = parse_time(time_text) if time_text is not None else None
+    return kind, key, timestamp, tag
+
+
+
+class PackageQueries:
+    '''Answers package, truck, time, and find queries, and truck routes, against one planned day.
+
+    Answers are dicts ready for json.dumps. Times in them are formatted like the tables, hh:mm:ss.
+    Snapshots of every package are only built for truck and time queries and reused for the same time.
+    '''
+
+    def __init__(
+        self,
+        packages: PackageHistory,
+        locations: Dictionary[int, Location],
+        trucks: Dictionary[int, Tuple[List[List[Stop]], int, float]],
+    ):
+        '''Creates the queries for a day that's already planned O(1)
+
+        Args:
+            packages: the day's package history
+            locations: locations by id
+            trucks: truck id -> (routes, end time, miles)
+
+        '''
+        self.packages = packages
+        self.locations = locations
+        self.trucks = trucks
+
+        # Time -> snapshot of every package at that time.
+        self._snapshots = Dictionary[int, List[PackageUpdate]]()
+
+
+
+    def answer(self, line: str):
+        '''Answers one query line, or returns the reason it can't be answered O(1) for packages, O(n) otherwise
+
+        Args:
+            line: the query, see parse_query
+        Returns:
+            answer: The answer, with the query's "id" if it had one, or {"query": line, "error": reason}
+
+        '''
+        try:
+            kind, key, timestamp, tag = parse_query(line)
+            if kind == "package":
+                answer = self.package(key, timestamp)
+            elif kind == "truck":
+                answer = self.truck(key, timestamp)
+            elif kind == "find":
+                answer = self.find(**key)
+            else:
+                answer = self.time(timestamp)
+        except (ValueError, KeyError) as error:
+            return {"query": line.strip(), "error": str(error.args[0]) if error.args else repr(error)}
+
+        if tag is not None:
+            answer["id"] = tag
+        return answer
+
+
+
+    def answer_all(self, lines: Iterable[str]) -> Iterator[dict]:
+        '''Lazily answers each query line, skipping blank lines and # comments O(q)
+
+        Args:
+            lines: query lines, like an open file
+        Returns:
+            (Iterator[dict]): One answer per query, in order
+
+        '''
+        for line in lines:
+            if line.strip() and not line.lstrip().startswith("#"):
+                yield self.answer(line)
+
+
+
+    def package(self, package_id: int, timestamp: int = None):
+        '''Answers where a package is at a time O(k)
+
+        Args:
+            package_id: the package
+            timestamp: seconds since the start of the day, the end of the day by default
+        Returns:
+            answer: The package's status, location, and truck at that time
+
+        '''
+        if package_id not in self.packages:
+            raise KeyError(f"No package {package_id}")
+
+        if timestamp is None:
+            update = self.packages.latest(package_id)
+        else:
+            update = self.packages.update_at(package_id, timestamp)
+
+        answer = {"package_id": package_id, "time": strfseconds(timestamp)}
+        answer.update(self._package_fields(update))
+        return answer
+
+
+
+    def truck(self, truck_id: int, timestamp: int = None):
+        '''Answers where a truck is at a time and which packages it has O(n + s)
+
+        Miles are counted up to the last stop the truck reached by then.
+
+        Args:
+            truck_id: the truck
+            timestamp: seconds since the start of the day, the end of the day by default
+        Returns:
+            answer: The truck's last and next stops, miles, and packages at that time
+
+        '''
+        if self.trucks[truck_id] is None:
+            raise KeyError(f"No truck {truck_id}")
+        routes, end_time, day_miles = self.trucks[truck_id]
+        if timestamp is None:
+            timestamp = end_time
+
+        # Walk the stops in order until the first one the truck hasn't reached yet.
+        miles = float(0)
+        last_stop = next_stop = None
+        for stop in (stop for route in routes for stop in route): # O(s)
+            if stop.stop_time > timestamp:
+                next_stop = stop
+                break
+            miles += stop.travel_distance
+            last_stop = stop
+
+        on_truck = []
+        delivered = 0
+        for update in self._snapshot(timestamp): # O(n)
+            if update is None or update.truck_id != truck_id:
+                continue
+            if update.package.status == DeliveryStatus.enroute:
+                on_truck.append(update.package.package_id)
+            elif update.package.status == DeliveryStatus.delivered:
+                delivered += 1
+
+        return {
+            "truck_id": truck_id,
+            "time": strfseconds(timestamp),
+            "miles": round(miles, 1),
+            "last_stop": self._stop_fields(last_stop),
+            "next_stop": self._stop_fields(next_stop),
+            "package_ids": on_truck,
+            "delivered": delivered,
+            "end_time": strfseconds(end_time),
+            "day_miles": round(day_miles, 1),
+        }
+
+
+
+    def time(self, timestamp: int):
+        '''Answers where every package is at a time, the table the prompt prints as data O(n)
+
+        Args:
+            timestamp: seconds since the start of the day
+        Returns:
+            answer: How many packages have each status, and each package's status
+
+        '''
+        counts = {status.value: 0 for status in DeliveryStatus}
+        packages = []
+        for update in self._snapshot(timestamp): # O(n)
+            if update is None:
+                continue
+            counts[update.package.status.value] += 1
+            fields = {"package_id": update.package.package_id}
+            fields.update(self._package_fields(update))
+            packages.append(fields)
+        return {"time": strfseconds(timestamp), "counts": counts, "packages": packages}
+
+
+
+    def find(self, **arguments):
+        '''Answers which packages match some fields as of their latest update O(r*log(r)) for r results
+
+        Args:
+            arguments: see PackageHistory.find
+        Returns:
+            answer: The matching package ids and how many there are
+
+        '''
+        if self.packages.index is None:
+            self.packages.build_index(self.locations)
+        package_ids = self.packages.find(**arguments)
+        return {"count": len(package_ids), "package_ids": package_ids}
+
+
+
+    def route(self, truck_id: int):
+        '''Answers which stops a truck makes over the day, trip by trip O(s)
+
+        Args:
+            truck_id: the truck
+        Returns:
+            answer: Each trip's stops with the miles driven by each one, the end time, and the day's miles
+
+        '''
+        if self.trucks[truck_id] is None:
+            raise KeyError(f"No truck {truck_id}")
+        routes, end_time, day_miles = self.trucks[truck_id]
+
+        # Miles add up across trips, like the truck's odometer.
+        miles = float(0)
+        trips = []
+        for route in routes:
+            stops = []
+            for stop in route: # O(s)
+                miles += stop.travel_distance
+                fields = self._stop_fields(stop)
+                fields["miles"] = round(miles, 1)
+                stops.append(fields)
+            trips.append(stops)
+
+        return {
+            "truck_id": truck_id,
+            "trips": trips,
+            "end_time": strfseconds(end_time),
+            "day_miles": round(day_miles, 1),
+        }
+
+
+
+    def _snapshot(self, timestamp: int):
+        '''Returns every package's update at a time, reusing the last few snapshots O(n)'''
+        snapshot = self._snapshots[timestamp]
+        if snapshot is None:
+            if len(self._snapshots) >= SNAPSHOT_CACHE_SIZE:
+                self._snapshots = Dictionary[int, List[PackageUpdate]]()
+            snapshot = self._snapshots[timestamp] = self.packages.snapshot(timestamp)
+        return snapshot
+
+
+
+    def _package_fields(self, update: PackageUpdate):
+        '''Returns a package update's status, location, and truck as answer fields O(1)'''
+        if update is None:
+            return {"status": None}
+        package = update.package
+        location = self.locations[package.location_id]
+        return {
+            "status": package.status.value,
+            "since": strfseconds(update.timestamp),
+            "truck_id": update.truck_id,
+            "address": location.address,
+            "city": location.city,
+            "postal_code": location.postal_code,
+            "deadline": strfseconds(package.latest),
+            "weight": package.weight,
+        }
+
+
+
+    def _stop_fields(self, stop: Stop):
+        '''Returns a route stop as answer fields O(1)'''
+        if stop is None:
+            return None
+        return {
+            "time": strfseconds(stop.stop_time),
+            "location_id": stop.location.location_id,
+            "address": stop.location.address,
+            "reason": stop.reason,
+        }
+
+
+
+def plan_queries(**options):
+    '''Plans the day once, or takes it from the cache, and returns the queries for it O(n^2)
+
+    Args:
+        options: passed to main.run_day
+    Returns:
+        (PackageQueries): Queries against the planned day
+
+    '''
+    route1, t1_end, t1_miles, route2, t2_end, t2_miles = planner.run_day(**options)
+    trucks = Dictionary[int, Tuple[List[List[Stop]], int, float]]()
+    trucks[1] = (route1, t1_end, t1_miles)
+    trucks[2] = (route2, t2_end, t2_miles)
+    return PackageQueries(planner.packages, planner.locations, trucks)
+
+
+
+def add_plan_arguments(parser: argparse.ArgumentParser):
+    '''Adds the planning options plan_queries takes to a command line parser O(1)'''
+    parser.add_argument("--parallel", action="store_true")
+    parser.add_argument("--auto-partition", action="store_true")
+    parser.add_argument("--improve", action="store_true")
+    parser.add_argument("--neighbor-k", type=int)
+    parser.add_argument("--reroute", action="store_true")
+    parser.add_argument("--simulate", action="store_true")
+    parser.add_argument("--no-cache", action="store_true")
+
+
+
+def plan_options(args: argparse.Namespace):
+    '''Returns the plan_queries options from arguments parsed with add_plan_arguments O(1)'''
+    return dict(
+        parallel=args.parallel,
+        auto_partition=args.auto_partition,
+        improve=args.improve,
+        neighbor_k=args.neighbor_k,
+        reroute=args.reroute,
+        simulate=args.simulate,
+        cache=not args.no_cache,
+    )
+
+
+
+def write_answers(queries: PackageQueries, lines: Iterable[str], output: TextIO, flush: bool = False):
+    '''Streams one JSON line per answer O(q)
+
+    Args:
+        queries: the planned day
+        lines: query lines
+        output: where the answers go
+        flush: flush after every answer, for a caller waiting on each one through a pipe
+    Returns:
+        count: The number of answers written
+
+    '''
+    count = 0
+    for answer in queries.answer_all(lines):
+        output.write(json.dumps(answer, separators=(",", ":")))
+        output.write("\n")
+        if flush:
+            output.flush()
+        count += 1
+    return count
+
+
+
+def main(argv: List[str] = None):
+    '''Answers the queries in files, or stdin, as JSON lines on stdout
+
+    Run from the repository root:
+        python -m query [queries.txt ...] [--simulate] [--auto-partition] ...
+        echo "package 9 1030" | python -m query
+
+    '''
+    parser = argparse.ArgumentParser(description="Answer package, truck, and time queries as JSON lines.")
+    parser.add_argument("files", nargs="*", help="query files, stdin when there are none or for -")
+    add_plan_arguments(parser)
+    args = parser.parse_args(argv)
+
+    queries = plan_queries(**plan_options(args))
+
+    for path in args.files or ["-"]:
+        if path == "-":
+            write_answers(queries, sys.stdin, sys.stdout, flush=True)
+            continue
+        with open(path) as file:
+            write_answers(queries, file, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+from typing import List
+from datalayer import find_location
+from globals import START_OF_DAY_SECONDS, travel_seconds
+from hash_table import Dictionary
+from history import STATUS_CODES, PackageHistory
+from instrumentation import timed
+from logger import event_log, log, log_event
+from models import AddressChange, DeliveryStatus, Location, Stop, StopReason, strfseconds
+
+
+HUB_ID = 0
+
+# Rows store statuses as codes, deliveries are compared against this one.
+DELIVERED = STATUS_CODES[DeliveryStatus.delivered]
+
+
+
+def _distance(matrix, from_id: int, to_id: int):
+    '''Returns the distance between two locations, zero for staying put O(1)'''
+    if from_id == to_id:
+        return float(0)
+    return float(matrix[from_id][to_id])
+
+
+
+def _departures(matrix, trips: List[List[Stop]]):
+    '''Returns when each trip leaves, the same way plan_truck_schedule decides it O(n)
+
+    A trip leaves when the previous one ends, or later if it waits at the hub for delayed packages.
+    The first trip's start isn't kept in the route, so it's worked out from its first stop.
+
+    '''
+    departures = []
+    for j, trip in enumerate(trips):
+        if j == 0:
+            first = trip[0]
+            departures.append(first.stop_time - travel_seconds(matrix, HUB_ID, first.location.location_id))
+        else:
+            earliest = max(stop.location.earliest or START_OF_DAY_SECONDS for stop in trip)
+            departures.append(max(trips[j - 1][-1].stop_time, earliest))
+    return departures
+
+
+
+def _deadlines(packages: PackageHistory, truck_id: int):
+    '''Returns the earliest deadline delivered at each of a truck's stop times O(r) where r is the truck's row count'''
+    deadlines = Dictionary[int, int]()
+    for row in packages.truck_rows(truck_id): # O(r)
+        if packages.statuses[row] != DELIVERED:
+            continue
+        update = packages.row_update(row)
+        current = deadlines[update.timestamp]
+        if current is None or update.package.latest < current:
+            deadlines[update.timestamp] = update.package.latest
+    return deadlines
+
+
+
+def _rows_by_time(timestamps, rows):
+    '''Groups a truck's history or log rows by their time O(r) where r is the truck's row count'''
+    by_time = Dictionary[int, List[int]]()
+    for row in rows: # O(r)
+        same_time = by_time[timestamps[row]]
+        if same_time is None:
+            same_time = []
+            by_time[timestamps[row]] = same_time
+        same_time.append(row)
+    return by_time
+
+
+
+def _stop_rows(columns, by_time: Dictionary[int, List[int]], stop_time: int, location_id: int):
+    '''Returns the history or log rows a stop or departure recorded O(k)
+
+    A stop recorded the deliveries to its location at its time. A departure recorded the packages
+    loaded at its time and the truck's messages about the load.
+
+    Args:
+        columns: the PackageHistory or EventLog the rows are in
+        by_time: the truck's rows by time, see _rows_by_time
+        stop_time: seconds since the start of the day of the stop or departure
+        location_id: the stop's location, None for a departure
+    Returns:
+        rows: The row indexes
+
+    '''
+    rows = by_time[stop_time]
+    if rows is None:
+        return []
+    if location_id is None:
+        return [row for row in rows if columns.statuses[row] != DELIVERED]
+    return [row for row in rows if columns.statuses[row] == DELIVERED and columns.location_ids[row] == location_id]
+
+
+
+def _shift(
+    matrix,
+    trips: List[List[Stop]],
+    departures: List[int],
+    deadlines: Dictionary[int, int],
+    j: int,
+    p: int,
+    location_id: int,
+    arrival: int,
+):
+    '''Works out how the stops after a new stop move, stopping once the delay is absorbed O(n)
+
+    Args:
+        matrix: distances between locations
+        trips: the truck's trips
+        departures: when each trip leaves
+        deadlines: the earliest deadline delivered at each stop time
+        j: the trip the new stop is in
+        p: the new stop's index in the trip
+        location_id: the new stop's location
+        arrival: when the truck gets to the new stop
+    Returns:
+        moves: (trip index, stop index or -1 for the trip's departure, old seconds, new seconds) per move
+        lateness: total seconds the moved stops are past their deadlines
+
+    '''
+    moves = []
+    lateness = 0
+    previous, cur_time = location_id, arrival
+
+    for k in range(j, len(trips)): # O(n)
+        start = p if k == j else 0
+        if k > j:
+            # Leave when the truck is back, unless the trip was already waiting for delayed packages.
+            departure = max(cur_time, departures[k])
+            if departure == departures[k]:
+                return moves, lateness
+            moves.append((k, -1, departures[k], departure))
+            cur_time = departure
+
+        for i in range(start, len(trips[k])):
+            stop = trips[k][i]
+            new_time = max(
+                cur_time + travel_seconds(matrix, previous, stop.location.location_id),
+                stop.location.earliest or START_OF_DAY_SECONDS,
+            )
+            if new_time == stop.stop_time:
+                return moves, lateness
+            moves.append((k, i, stop.stop_time, new_time))
+
+            deadline = deadlines[stop.stop_time]
+            if deadline is not None and new_time > deadline:
+                lateness += new_time - max(stop.stop_time, deadline)
+            previous, cur_time = stop.location.location_id, new_time
+    return moves, lateness
+
+
+
+def _insertions(
+    matrix,
+    trips: List[List[Stop]],
+    departures: List[int],
+    deadlines: Dictionary[int, int],
+    trip_ids: List[int],
+    effective_time: int,
+    location: Location,
+    deadline: int,
+):
+    '''Yields every place the new stop could go in the given trips, with its cost O(m*n)
+
+    Yields:
+        (lateness, added_miles, j, p, arrival, moves): one candidate per position, moves as _shift returns them
+
+    '''
+    location_id = location.location_id
+    for j in trip_ids:
+        trip = trips[j]
+
+        # A truck on the road can't turn around before its next stop.
+        first = 0
+        if departures[j] < effective_time:
+            first = len(trip)
+            for i, stop in enumerate(trip):
+                if stop.stop_time >= effective_time:
+                    first = i + 1
+                    break
+
+        for p in range(first, len(trip) + 1):
+            previous_stop = trip[p - 1] if p > 0 else None
+            previous_id = previous_stop.location.location_id if previous_stop else (trips[j - 1][-1].location.location_id if j > 0 else HUB_ID)
+            previous_time = previous_stop.stop_time if previous_stop else departures[j]
+
+            # Already stopping there, the package just gets delivered at that stop.
+            if previous_stop is not None and previous_id == location_id:
+                late = max(0, previous_time - deadline)
+                yield late, float(0), j, p - 1, previous_time, []
+                continue
+
+            arrival = max(
+                previous_time + travel_seconds(matrix, previous_id, location_id),
+                location.earliest or START_OF_DAY_SECONDS,
+            )
+            added = _distance(matrix, previous_id, location_id)
+            if p < len(trip):
+                next_id = trip[p].location.location_id
+                added += _distance(matrix, location_id, next_id) - _distance(matrix, previous_id, next_id)
+
+            moves, lateness = _shift(matrix, trips, departures, deadlines, j, p, location_id, arrival)
+            yield lateness + max(0, arrival - deadline), added, j, p, arrival, moves
+
+
+
+@timed
+def change_address(
+    package_id: int,
+    new_address: str,
+    effective_time: int,
+    routes: Dictionary[int, List[List[Stop]]],
+    packages: PackageHistory,
+    locations: Dictionary[int, Location],
+    matrix,
+    city: str = None,
+    postal_code: str = None,
+):
+    '''Moves a package to a new address and puts the new stop into an already planned route O(r + m*n)
+
+    Only the truck's later stops are touched, nothing is planned again. If the package is on a truck
+    or planned into one of its trips, the new stop goes somewhere in that trip the truck hasn't passed
+    yet. If it's waiting at the hub without a trip, it can go into any trip that leaves after the change
+    or onto a new trip at the end of a truck's day. The cheapest position in added miles that keeps every
+    deadline wins, or the least late one if none can. Every later stop, departure, history row, and log
+    row of the truck moves by the delay the new stop causes. The old stop stays in the route for any
+    other packages there.
+
+    Args:
+        package_id: the package with the new address
+        new_address: the street address the package goes to now
+        effective_time: seconds since the start of the day the change is known
+        routes: truck id -> the truck's trips as returned by plan_truck_schedule, changed in place
+        packages: package history
+        locations: locations by id
+        matrix: distances between locations
+        city: the city of the new address, if needed to tell addresses apart
+        postal_code: the zip code of the new address, if needed to tell addresses apart
+    Returns:
+        change: where the package goes now and what it cost
+
+    '''
+    location = find_location(new_address, city, postal_code)
+    if location is None:
+        raise ValueError(f"Unknown address {new_address}")
+    location = locations[location.location_id]
+
+    current = packages.update_at(package_id, effective_time)
+    if current is None or current.package.status == DeliveryStatus.delivered:
+        raise ValueError(f"Package {package_id} is already delivered at {strfseconds(effective_time)}")
+    deadline = current.package.latest
+    old_location_id = current.package.location_id
+
+    # The planned delivery, if the package is on a truck's schedule.
+    planned_row = None
+    for row in packages.rows(package_id):
+        if packages.timestamps[row] > effective_time and packages.row_update(row).package.status == DeliveryStatus.delivered:
+            planned_row = row
+
+    best = None
+    for truck_id, trips in routes.iter_items():
+        if planned_row is not None and packages.truck_ids[planned_row] != truck_id:
+            continue
+        departures = _departures(matrix, trips)
+        deadlines = _deadlines(packages, truck_id)
+
+        # Trips the package can be on.
+        if planned_row is not None:
+            planned_time = packages.timestamps[planned_row]
+            trip_ids = [j for j, trip in enumerate(trips) if departures[j] < planned_time <= trip[-1].stop_time][:1]
+        else:
+            trip_ids = [j for j in range(len(trips)) if departures[j] >= effective_time and trips[j][0].location.location_id != HUB_ID]
+
+        for late, added, j, p, arrival, moves in _insertions(
+            matrix, trips, departures, deadlines, trip_ids, effective_time, location, deadline
+        ):
+            if best is None or (late, added) < best[:2]:
+                best = (late, added, truck_id, j, p, arrival, moves, departures[j], None)
+
+        # A waiting package can also go out on a new trip once the truck is done.
+        if planned_row is None and trips:
+            last = trips[-1][-1]
+            last_id = last.location.location_id
+            back = last.stop_time + travel_seconds(matrix, last_id, HUB_ID)
+            departure = max(back, effective_time)
+            arrival = max(
+                departure + travel_seconds(matrix, HUB_ID, location.location_id),
+                location.earliest or START_OF_DAY_SECONDS,
+            )
+            added = _distance(matrix, last_id, HUB_ID) + _distance(matrix, HUB_ID, location.location_id)
+            late = max(0, arrival - deadline)
+            if best is None or (late, added) < best[:2]:
+                best = (late, added, truck_id, len(trips), 0, arrival, [], departure, back)
+
+    if best is None:
+        raise ValueError(f"No truck can take package {package_id} after {strfseconds(effective_time)}")
+    late, added, truck_id, j, p, arrival, moves, departure, back = best
+    trips = routes[truck_id]
+
+    # Move the truck's later stops, and the history and log rows each of them recorded.
+    stop_count = 0
+    history_rows = _rows_by_time(packages.timestamps, packages.truck_rows(truck_id))
+    log_rows = _rows_by_time(event_log.timestamps, event_log.truck_rows(truck_id))
+    history_moves, log_moves = [], []
+    for k, i, old_time, new_time in moves:
+        location_id = None
+        if i >= 0:
+            stop = trips[k][i]
+            location_id = stop.location.location_id
+            stop.stop_time = new_time
+            stop_count += 1
+        history_moves += [(row, new_time) for row in _stop_rows(packages, history_rows, old_time, location_id)]
+        log_moves += [(row, new_time) for row in _stop_rows(event_log, log_rows, old_time, location_id)]
+    packages.retime(history_moves)
+    event_log.retime(log_moves)
+
+    # Put the new stop into the route.
+    if j == len(trips):
+        last_id = trips[-1][-1].location.location_id
+        if last_id != HUB_ID:
+            trips.append([Stop(back, _distance(matrix, last_id, HUB_ID), locations[HUB_ID], StopReason.loading)])
+        trips.append([Stop(arrival, _distance(matrix, HUB_ID, location.location_id), location, StopReason.delivery)])
+    else:
+        trip = trips[j]
+        if not (p < len(trip) and trip[p].location.location_id == location.location_id and trip[p].stop_time == arrival):
+            previous_id = trip[p - 1].location.location_id if p > 0 else (trips[j - 1][-1].location.location_id if j > 0 else HUB_ID)
+            trip.insert(p, Stop(arrival, _distance(matrix, previous_id, location.location_id), location, StopReason.delivery))
+            if p + 1 < len(trip):
+                trip[p + 1].travel_distance = _distance(matrix, location.location_id, trip[p + 1].location.location_id)
+
+    # The package is delivered at the new location now.
+    if old_location_id is not None and package_id in locations[old_location_id].package_ids:
+        locations[old_location_id].package_ids.remove(package_id)
+    if package_id not in location.package_ids:
+        location.package_ids.append(package_id)
+
+    # Record the change, then fix up or add the rows after it.
+    event_log.discard(package_id, effective_time)
+    packages.insert(package_id, effective_time, location_id=location.location_id)
+    if planned_row is not None:
+        for row in packages.rows(package_id):
+            if packages.timestamps[row] > effective_time:
+                packages.amend(row, location_id=location.location_id)
+        packages.amend(planned_row, timestamp=arrival)
+    else:
+        packages.insert(package_id, departure, DeliveryStatus.enroute, location.location_id, truck_id)
+        packages.insert(package_id, arrival, DeliveryStatus.delivered, location.location_id, truck_id)
+    for row in packages.rows(package_id):
+        update = packages.row_update(row)
+        if update.timestamp >= effective_time:
+            log(location, update.package, update.timestamp, update.truck_id)
+
+    log_event(
+        effective_time,
+        f"Package {package_id} now goes to {location.address}, truck {truck_id} delivers it at {strfseconds(arrival)}, {added:.1f} more miles.",
+    )
+
+    return AddressChange(
+        package_id=package_id,
+        truck_id=truck_id,
+        location_id=location.location_id,
+        delivery_time=arrival,
+        added_miles=added,
+        moved_stops=stop_count,
+        late_seconds=late,
+    )
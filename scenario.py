@@ -0,0 +1,196 @@
+import time
+from typing import List, Tuple
+from cache import cache_key, load_cache, save_cache
+from datalayer import (
+    DISTANCES_FILE,
+    PACKAGES_FILE,
+    copy_locations,
+    hash_file,
+    index_locations,
+    load_locations,
+    load_packages,
+)
+from export import ResultExporter
+from globals import TRUCK_CAPACITY
+from hash_table import Dictionary
+from history import PackageHistory
+from logger import EventLog
+from models import DeliveryStatus, Location, ScenarioResult
+from partition import partition_loads
+from simulation import simulate_day
+
+
+
+class Scenario:
+    '''One day of packages against a distance matrix, with its own history and event log.
+
+    The matrix, and the address index and neighbor lists built from it, can be shared by any number
+    of scenarios. Everything a day changes belongs to its scenario: the locations' packages, the
+    package history, the event log, and which address changes have been applied.
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        locations: Dictionary[int, Location],
+        matrix,
+        packages: PackageHistory,
+        events: EventLog = None,
+        address_changes: List[Tuple[int, str, int]] = (),
+    ):
+        '''Creates a scenario from data that's already loaded O(1)
+
+        Args:
+            name: label for the scenario, usually the packages file or day
+            locations: locations by id, with this scenario's packages added
+            matrix: distances between locations, may be shared with other scenarios
+            packages: package history
+            events: the log events are added to, a new one by default
+            address_changes: (package_id, new_address, effective_time) per correction
+
+        '''
+        self.name = name
+        self.locations = locations
+        self.matrix = matrix
+        self.packages = packages
+        self.events = EventLog() if events is None else events
+        self.address_changes = list(address_changes)
+
+        # Package id -> True once its address change has been applied.
+        self.applied_changes = Dictionary[int, bool]()
+
+        # Key of the input files when they were loaded through the cache, see load.
+        self.data_key: bytes = None
+
+
+
+    @classmethod
+    def load(
+        cls,
+        packages_path: str = PACKAGES_FILE,
+        distances_path: str = DISTANCES_FILE,
+        matrix_format: str = "list",
+        events: EventLog = None,
+        address_changes: List[Tuple[int, str, int]] = (),
+        cache: bool = False,
+    ):
+        '''Reads the distances and packages files into a new scenario O(n^2)
+
+        Args:
+            packages_path: the packages csv file
+            distances_path: the distances csv file
+            matrix_format: see load_locations
+            events: the log events are added to, a new one by default
+            address_changes: (package_id, new_address, effective_time) per correction
+            cache: reuse the parsed locations, matrix, and packages from the last run on the same
+                files, see cache.py. Only the "list" format is cached, the others cache their matrix.
+        Returns:
+            (Scenario): The loaded scenario
+
+        '''
+        # The files are hashed rather than trusted by name or modification time.
+        key = None
+        if cache and matrix_format == "list":
+            key = cache_key("data", hash_file(packages_path), hash_file(distances_path), matrix_format)
+            data = load_cache("data", key)
+            if data is not None:
+                locations, matrix, packages = data
+                index_locations(locations)
+                scenario = cls(packages_path, locations, matrix, packages, events, address_changes)
+                scenario.data_key = key
+                return scenario
+
+        locations, matrix = load_locations(matrix_format, distances_path)
+        packages = load_packages(locations, packages_path)
+        scenario = cls(packages_path, locations, matrix, packages, events, address_changes)
+        if key is not None:
+            save_cache("data", key, (locations, matrix, packages))
+            scenario.data_key = key
+        return scenario
+
+
+
+    @classmethod
+    def from_shared(
+        cls,
+        locations: Dictionary[int, Location],
+        matrix,
+        packages_path: str,
+        name: str = None,
+        address_changes: List[Tuple[int, str, int]] = (),
+    ):
+        '''Builds a scenario for a packages file against locations and a matrix loaded once O(n)
+
+        Args:
+            locations: locations from load_locations without packages, they're copied and not changed
+            matrix: distances between locations, shared as is
+            packages_path: the packages csv file
+            name: label for the scenario, the packages file by default
+            address_changes: (package_id, new_address, effective_time) per correction
+        Returns:
+            (Scenario): The new scenario
+
+        '''
+        locations = copy_locations(locations)
+        packages = load_packages(locations, packages_path)
+        return cls(name or packages_path, locations, matrix, packages, address_changes=address_changes)
+
+
+
+    def run(
+        self,
+        truck_ids: List[int] = (1, 2),
+        capacity: int = TRUCK_CAPACITY,
+        exporter: ResultExporter = None,
+    ):
+        '''Partitions the packages into loads and simulates the day O(e*log(n))
+
+        Args:
+            truck_ids: the trucks with drivers
+            capacity: the most packages per truck
+            exporter: streams the results out while the day runs, the caller closes it
+        Returns:
+            (ScenarioResult): The day's totals
+
+        '''
+        start = time.perf_counter()
+        plans = partition_loads(self.locations, self.matrix, self.packages, truck_ids, capacity)
+        results = simulate_day(
+            plans,
+            self.locations,
+            self.matrix,
+            self.packages,
+            self.address_changes,
+            capacity,
+            exporter,
+            self.events,
+        )
+        for package_id, _, _ in self.address_changes:
+            self.applied_changes[package_id] = True
+
+        miles = float(0)
+        end_time = 0
+        for _, truck_end_time, truck_miles in results.iter_values():
+            miles += truck_miles
+            end_time = max(end_time, truck_end_time)
+
+        # Count delivered and late packages from each one's latest update.
+        delivered = late = 0
+        for package_id in self.packages.iter_package_ids(): # O(n)
+            update = self.packages.latest(package_id)
+            if update.package.status == DeliveryStatus.delivered:
+                delivered += 1
+                if update.timestamp > update.package.latest:
+                    late += 1
+
+        return ScenarioResult(
+            name=self.name,
+            trucks=len(truck_ids),
+            miles=miles,
+            end_time=end_time,
+            packages=len(self.packages),
+            delivered=delivered,
+            late=late,
+            events=len(self.events),
+            seconds=time.perf_counter() - start,
+        )
@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import json
+import sys
+from http import HTTPStatus
+from typing import List, Tuple
+from urllib.parse import parse_qsl, urlsplit
+from query import PackageQueries, add_plan_arguments, parse_filters, parse_time, plan_options, plan_queries
+
+
+HOST = "127.0.0.1"
+PORT = 8080
+
+# A keep-alive connection that sends nothing for this long is closed.
+IDLE_TIMEOUT_SECONDS = 30
+
+# Requests with more header lines than this, or a longer body, are refused.
+MAX_HEADERS = 100
+MAX_BODY_BYTES = 64 * 1024
+
+
+
+class RequestError(Exception):
+    '''A request that can't be read, answered with its status before the connection is closed.'''
+
+    def __init__(self, status: HTTPStatus, reason: str):
+        '''Creates the error O(1)'''
+        super().__init__(reason)
+        self.status = status
+
+
+
+class StatusService:
+    '''Serves a planned day's package and truck status as JSON over HTTP.
+
+    The day is planned once before the service starts, so every request is answered from the
+    history and its indexes in memory and never waits on planning or simulating. The handlers
+    only read, so requests on any number of connections are answered in turn on the event loop.
+
+        GET /packages/{id}?at=hh:mm     where a package is, at the end of the day without at
+        GET /packages?status=...&truck=2
+                                        the packages matching every field, see query.parse_filters
+        GET /trucks/{id}?at=hh:mm       where a truck is and which packages it has
+        GET /trucks/{id}/route          the truck's stops, trip by trip
+        GET /snapshot?at=hh:mm          every package at a time
+    '''
+
+    def __init__(self, queries: PackageQueries):
+        '''Creates the service for a day that's already planned O(1)
+
+        Args:
+            queries: queries against the planned day, see query.plan_queries
+
+        '''
+        self.queries = queries
+
+
+
+    def respond(self, method: str, target: str) -> Tuple[HTTPStatus, dict]:
+        '''Answers one request O(1) for packages, O(n) for snapshots
+
+        Args:
+            method: the request's method
+            target: the request's path and query string
+        Returns:
+            status: The response status
+            answer: The response body, {"error": reason} when it isn't OK
+
+        '''
+        if method != "GET":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"{method} isn't supported, only GET"}
+
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        arguments = dict(parse_qsl(url.query))
+        try:
+            timestamp = parse_time(arguments["at"]) if "at" in arguments else None
+
+            # Route on the path's words, the queries check that the ids exist.
+            if parts == ["packages"]:
+                answer = self.queries.find(**parse_filters(arguments))
+            elif len(parts) == 2 and parts[0] == "packages":
+                answer = self.queries.package(self._id(parts[1]), timestamp)
+            elif len(parts) == 2 and parts[0] == "trucks":
+                answer = self.queries.truck(self._id(parts[1]), timestamp)
+            elif len(parts) == 3 and parts[0] == "trucks" and parts[2] == "route":
+                answer = self.queries.route(self._id(parts[1]))
+            elif parts == ["snapshot"]:
+                if timestamp is None:
+                    raise ValueError("A snapshot needs a time, like ?at=10:30")
+                answer = self.queries.time(timestamp)
+            else:
+                return HTTPStatus.NOT_FOUND, {"error": f"No resource at {url.path}"}
+        except KeyError as error:
+            return HTTPStatus.NOT_FOUND, {"error": str(error.args[0]) if error.args else repr(error)}
+        except ValueError as error:
+            return HTTPStatus.BAD_REQUEST, {"error": str(error.args[0]) if error.args else repr(error)}
+        return HTTPStatus.OK, answer
+
+
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        '''Answers the requests on one connection until the client closes it or asks to O(r)
+
+        Args:
+            reader: the connection's incoming side
+            writer: the connection's outgoing side
+
+        '''
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except RequestError as error:
+                    # Answer why, the rest of the connection can't be read any more.
+                    self._write(writer, error.status, {"error": str(error)}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, keep_alive = request
+
+                status, answer = self.respond(method, target)
+                self._write(writer, status, answer, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+
+
+    async def serve(self, host: str = HOST, port: int = PORT):
+        '''Serves requests until cancelled
+
+        Args:
+            host: the address to listen on, only this machine by default
+            port: the port to listen on, 0 for any free port
+
+        '''
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            host, port = server.sockets[0].getsockname()[:2]
+            print(f"Serving on http://{host}:{port}", file=sys.stderr, flush=True)
+            await server.serve_forever()
+
+
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        '''Reads one request's line and headers, skipping any body O(h)
+
+        Waiting on the client times out after IDLE_TIMEOUT_SECONDS, before the request line and again
+        for the rest of the request.
+
+        Returns:
+            method: The request's method, or None when the client closed the connection
+            target: The request's path and query string
+            keep_alive: Whether the client wants the connection kept open
+
+        '''
+        line = await asyncio.wait_for(self._readline(reader), IDLE_TIMEOUT_SECONDS)
+        if not line:
+            return None
+        words = line.decode("latin-1").split()
+        if len(words) != 3:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Bad request line {line[:100]!r}")
+        method, target, version = words
+        connection = await asyncio.wait_for(self._read_headers(reader), IDLE_TIMEOUT_SECONDS)
+
+        # HTTP/1.1 keeps the connection open unless told not to, HTTP/1.0 only when asked.
+        keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+        return method, target, keep_alive
+
+
+
+    async def _read_headers(self, reader: asyncio.StreamReader):
+        '''Reads a request's headers and skips its body O(h)
+
+        Returns:
+            connection: The Connection header, lower case, empty when there's none
+
+        '''
+        # Headers end at a blank line. Only the ones that decide the connection and body are kept.
+        headers: List[Tuple[str, str]] = []
+        while True:
+            line = await self._readline(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise RequestError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, f"More than {MAX_HEADERS} headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers.append((name.strip().lower(), value.strip().lower()))
+
+        connection = next((value for name, value in headers if name == "connection"), "")
+        length = next((value for name, value in headers if name == "content-length"), "0")
+        if not length.isdecimal():
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Bad Content-Length {length[:20]!r}")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Bodies over {MAX_BODY_BYTES} bytes aren't accepted")
+        if length > 0:
+            await reader.readexactly(length)
+        return connection
+
+
+
+    async def _readline(self, reader: asyncio.StreamReader):
+        '''Reads one line, refusing one longer than the reader's limit O(l)'''
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise RequestError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "A request line or header is too long")
+
+
+
+    def _head(self, status: HTTPStatus, length: int, keep_alive: bool):
+        '''Returns a response's status line and headers O(1)'''
+        return (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {length}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n"
+        ).encode()
+
+
+
+    def _write(self, writer: asyncio.StreamWriter, status: HTTPStatus, answer: dict, keep_alive: bool):
+        '''Writes one response O(b) where b is the body's length'''
+        body = json.dumps(answer, separators=(",", ":")).encode()
+        writer.write(self._head(status, len(body), keep_alive) + body)
+
+
+
+    def _id(self, text: str):
+        '''Parses a package or truck id from a path O(1)'''
+        # isdigit is true for characters like "²" that int can't parse.
+        if not text.isascii() or not text.isdecimal():
+            raise ValueError(f"{text!r} is not an id")
+        return int(text)
+
+
+
+def main(argv: List[str] = None):
+    '''Plans the day once and serves its status over HTTP until interrupted
+
+    Run from the repository root:
+        python -m service [--port 8080] [--simulate] [--auto-partition] ...
+        curl "http://127.0.0.1:8080/packages/9?at=10:30"
+
+    '''
+    parser = argparse.ArgumentParser(description="Serve package and truck status as JSON over HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT, help="0 for any free port")
+    add_plan_arguments(parser)
+    args = parser.parse_args(argv)
+
+    service = StatusService(plan_queries(**plan_options(args)))
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
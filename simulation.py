@@ -0,0 +1,544 @@
+import heapq
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Tuple
+from datalayer import find_location
+from export import ResultExporter
+from globals import START_OF_DAY_SECONDS, TRUCK_CAPACITY, drive_seconds
+from hash_table import Dictionary
+from history import PackageHistory
+from instrumentation import timed
+from logger import EventLog, event_log, log, log_event, log_line
+from models import DeliveryStatus, Location, Stop, StopReason
+
+
+HUB_ID = 0
+
+
+
+class Simulator:
+    '''Discrete-event engine that runs events in global time order.
+
+    Events are (time, sequence, kind, arg) tuples in a binary heap. The sequence number breaks ties,
+    so events at the same time run in the order they were scheduled. Handlers are looked up by kind
+    in a list, so dispatch is O(1) and each event costs O(log(n)) for the heap.
+    '''
+
+    def __init__(self, start_time: int = START_OF_DAY_SECONDS):
+        '''Creates an engine with no events O(1)'''
+        self.now = start_time
+        self.processed = 0
+        self._heap: List[tuple] = []
+        self._sequence = 0
+        self._handlers: List[Callable[[int, Any], None]] = []
+
+
+
+    def __len__(self):
+        '''Returns the number of events waiting to run O(1)'''
+        return len(self._heap)
+
+
+
+    def register(self, handler: Callable[[int, Any], None]):
+        '''Adds a handler and returns the event kind that runs it O(1)
+
+        Args:
+            handler: called with (time, arg) for each event of the kind
+        Returns:
+            (int): The event kind
+
+        '''
+        self._handlers.append(handler)
+        return len(self._handlers) - 1
+
+
+
+    def schedule(self, time: int, kind: int, arg: Any = None):
+        '''Adds an event O(log(n))
+
+        Args:
+            time: seconds since the start of the day the event happens, not before now
+            kind: the event kind from register
+            arg: passed to the handler
+
+        '''
+        if time < self.now:
+            raise ValueError(f"Can't schedule an event at {time} before the current time {self.now}")
+        heapq.heappush(self._heap, (time, self._sequence, kind, arg))
+        self._sequence += 1
+
+
+
+    def run(self, until: int = None):
+        '''Runs events in time order until none are left or the next one is after until O(e*log(n))
+
+        Args:
+            until: seconds since the start of the day to stop at, None to run every event
+        Returns:
+            (int): The number of events run
+
+        '''
+        heap = self._heap
+        handlers = self._handlers
+        processed = 0
+        while heap:
+            if until is not None and heap[0][0] > until:
+                break
+            time, _, kind, arg = heapq.heappop(heap)
+            self.now = time
+            handlers[kind](time, arg)
+            processed += 1
+        self.processed += processed
+        return processed
+
+
+
+
+@dataclass
+class TruckState:
+    """Where a truck is in its schedule during a simulation.
+
+    load holds the current load's stops in the order they were loaded, with None where a stop was
+    already made, so a delivery takes its stop off in O(1) without reordering the rest.
+    """
+
+    truck_id: int
+    schedule: List[List[int]]
+    load: List[int] = field(default_factory=list)
+    location_id: int = HUB_ID
+    next_time: int = None
+    miles: float = 0.0
+    end_time: int = START_OF_DAY_SECONDS
+    routes: List[List[Stop]] = field(default_factory=list)
+    done: bool = False
+
+    # Stops left in the load, packages on the truck, and whether the load is only the trip back to the hub.
+    stops_left: int = 0
+    package_count: int = 0
+    returning: bool = False
+
+    # Location id -> its index in load.
+    positions: Dictionary[int, int] = field(default_factory=Dictionary)
+
+
+
+    def start_load(self, load: List[int], package_count: int):
+        '''Puts a new load on the truck O(k)'''
+        self.load = []
+        self.positions = Dictionary[int, int](open_addressing=True)
+        self.stops_left = 0
+        self.package_count = package_count
+        self.returning = load == [HUB_ID]
+        for l_id in load:
+            self.add_stop(l_id)
+
+
+
+    def add_stop(self, location_id: int):
+        '''Adds a stop to the end of the load O(1)'''
+        self.positions[location_id] = len(self.load)
+        self.load.append(location_id)
+        self.stops_left += 1
+
+
+
+    def remove_stop(self, location_id: int):
+        '''Takes a made stop off the load, O(1) amortized over the load'''
+        self.load[self.positions[location_id]] = None
+        del self.positions[location_id]
+        self.stops_left -= 1
+
+        # Drop the gaps once they're most of the list, so walking the load stays O(k).
+        if self.stops_left * 2 < len(self.load):
+            stops = [l_id for l_id in self.load if l_id is not None]
+            self.load = []
+            self.stops_left = 0
+            for l_id in stops:
+                self.add_stop(l_id)
+
+
+
+
+class TruckQueue:
+    '''Trucks ordered by a key that changes as they drive, in a binary heap with lazy deletion.
+
+    A truck is pushed again whenever its key changes, and entries whose key is out of date are dropped
+    when they reach the top. A key of None leaves the truck out. Once stale entries outnumber the
+    trucks the heap is rebuilt from them, so it stays O(t) and each push stays O(log(t)) amortized.
+    '''
+
+    def __init__(self, trucks: Dictionary[int, TruckState], key: Callable[[TruckState], tuple]):
+        '''Creates an empty queue O(1)
+
+        Args:
+            trucks: truck id -> truck, every truck that can be pushed
+            key: the truck's place in the queue, None to leave it out
+
+        '''
+        self._trucks = trucks
+        self._key = key
+        self._heap: List[tuple] = []
+
+
+
+    def push(self, truck: TruckState):
+        '''Puts a truck in the queue by its current key O(log(t)) amortized'''
+        key = self._key(truck)
+        if key is not None:
+            heapq.heappush(self._heap, (key, truck.truck_id))
+        if len(self._heap) > 2 * len(self._trucks) + 16:
+            self._heap = [
+                (key, truck_id) for truck_id, key in
+                ((truck_id, self._key(truck)) for truck_id, truck in self._trucks.iter_items())
+                if key is not None
+            ]
+            heapq.heapify(self._heap)
+
+
+
+    def first(self, accept: Callable[[TruckState], bool] = None):
+        '''Returns the truck with the smallest key that accept takes, None if there's none O((s+1)*log(t))
+
+        s is the number of trucks accept turns down, they stay in the queue.
+
+        '''
+        heap = self._heap
+        skipped = []
+        found = None
+        while heap:
+            key, truck_id = heap[0]
+            truck = self._trucks[truck_id]
+            if self._key(truck) != key:
+                heapq.heappop(heap)
+            elif accept is None or accept(truck):
+                found = truck
+                break
+            else:
+                skipped.append(heapq.heappop(heap))
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return found
+
+
+
+
+class DeliverySimulation:
+    '''Runs every truck's schedule, the package arrivals, and the address changes as events in one timeline.
+
+    Trucks interleave instead of being planned one after another, so an event like an address change
+    sees every truck where it really is at that time. Each truck follows its loads in order and picks
+    its next stop the same way route_load does, by earliest arrival. Picking a stop scans the truck's
+    load, which holds at most capacity locations. Address changes find a truck through two TruckQueues
+    instead of scanning the trucks.
+    '''
+
+    def __init__(
+        self,
+        locations: Dictionary[int, Location],
+        matrix,
+        packages: PackageHistory,
+        capacity: int = TRUCK_CAPACITY,
+        exporter: ResultExporter = None,
+        events: EventLog = event_log,
+    ):
+        '''Creates a simulation over the day's data O(1)
+
+        Args:
+            locations: locations by id
+            matrix: distances between locations
+            packages: package history, every event is recorded in it
+            capacity: the most packages per truck
+            exporter: streams the history rows and stops out as they happen, the caller closes it
+            events: the log every event is added to
+
+        '''
+        self.locations = locations
+        self.matrix = matrix
+        self.packages = packages
+        self.capacity = capacity
+        self.exporter = exporter
+        self.events = events
+        self.trucks = Dictionary[int, TruckState]()
+
+        # Location id -> visits to it still in a truck's load or schedule, so an address change can
+        # tell whether a truck is going there without walking every truck's schedule.
+        self._pending = Dictionary[int, int](open_addressing=True)
+
+        # Location id -> the truck whose current load has it.
+        self._carriers = Dictionary[int, TruckState](open_addressing=True)
+
+        # Trucks out delivering by when they reach their next stop, and every truck by how soon it's free.
+        self._on_road = TruckQueue(
+            self.trucks,
+            lambda t: (t.next_time, t.truck_id) if t.stops_left and not t.returning and t.next_time is not None else None,
+        )
+        self._free = TruckQueue(self.trucks, lambda t: (len(t.schedule), t.end_time, t.truck_id))
+
+        self.simulator = Simulator()
+        self.TRUCK_DEPARTURE = self.simulator.register(self._truck_departure)
+        self.TRUCK_ARRIVAL = self.simulator.register(self._truck_arrival)
+        self.PACKAGE_ARRIVAL = self.simulator.register(self._package_arrival)
+        self.ADDRESS_CHANGE = self.simulator.register(self._address_change)
+
+
+
+    def add_truck(self, truck_id: int, schedule: List[List[int]], start_time: int):
+        '''Adds a truck that leaves the hub with its first load at start_time O(s + log(n))
+
+        Args:
+            truck_id: id of the truck
+            schedule: loads of location ids, popped from the end like plan_truck_schedule
+            start_time: seconds since the start of the day the truck starts
+
+        '''
+        truck = TruckState(truck_id, [list(load) for load in schedule], end_time=start_time)
+        self.trucks[truck_id] = truck
+        for load in truck.schedule:
+            for l_id in load:
+                self._add_pending(l_id)
+        self._free.push(truck)
+        self.simulator.schedule(start_time, self.TRUCK_DEPARTURE, truck)
+
+
+
+    def add_package_arrivals(self):
+        '''Schedules the delayed packages reaching the hub, one event per location O(n*log(n))'''
+        for location in self.locations.iter_values():
+            if location.earliest > START_OF_DAY_SECONDS and location.package_ids:
+                self.simulator.schedule(location.earliest, self.PACKAGE_ARRIVAL, location)
+
+
+
+    def add_address_change(self, package_id: int, new_address: str, effective_time: int):
+        '''Schedules a package's address changing O(log(n))
+
+        Args:
+            package_id: the package with the new address
+            new_address: the street address the package goes to now
+            effective_time: seconds since the start of the day the change is known
+
+        '''
+        self.simulator.schedule(effective_time, self.ADDRESS_CHANGE, (package_id, new_address))
+
+
+
+    def run(self, until: int = None):
+        '''Runs the day and returns each truck's routes and totals O(e*log(n))
+
+        Args:
+            until: seconds since the start of the day to stop at, None to run the whole day
+        Returns:
+            results: truck id -> (routes, end_time, miles), like plan_truck_schedule
+
+        '''
+        self.simulator.run(until)
+        results = Dictionary[int, Tuple[List[List[Stop]], int, float]]()
+        for truck_id, truck in self.trucks.iter_items():
+            results[truck_id] = (truck.routes, truck.end_time, truck.miles)
+
+        # Each truck's totals are only known once the run stops.
+        if self.exporter is not None:
+            self.exporter.add_history(self.packages)
+            for truck_id in sorted(self.trucks.iter_keys()):
+                truck = self.trucks[truck_id]
+                self.exporter.add_route(truck_id, truck.routes, truck.end_time, truck.miles)
+        return results
+
+
+
+    def _record(self, status: DeliveryStatus, location: Location, time: int, truck_id: int):
+        '''Records and logs a status change for every package at a location O(k)'''
+        for p_id in location.package_ids:
+            package = self.packages.record(p_id, time, status=status, truck_id=truck_id)
+            log(location, package, time, truck_id, self.events)
+        if self.exporter is not None:
+            self.exporter.add_history(self.packages)
+
+
+
+    def _truck_departure(self, time: int, truck: TruckState):
+        '''Loads the truck's next load at the hub and sends it to its first stop O(k + log(n))'''
+        if not truck.schedule:
+            truck.done = True
+            return
+
+        # Wait at the hub until every package in the load has arrived.
+        ready = max(self.locations[l_id].earliest for l_id in truck.schedule[-1])
+        if ready > time:
+            self.simulator.schedule(ready, self.TRUCK_DEPARTURE, truck)
+            return
+
+        load = truck.schedule.pop()
+        truck.routes.append([])
+
+        if load == [HUB_ID]:
+            truck.start_load(load, 0)
+            log_line(time + 1, "", truck.truck_id, self.events)
+            log_event(time + 1, f"Truck {truck.truck_id} is heading back to the hub to reload.", truck.truck_id, self.events)
+            log_line(time + 1, "", truck.truck_id, self.events)
+        else:
+            package_count = sum(len(self.locations[l_id].package_ids) for l_id in load)
+            truck.start_load(load, package_count)
+            log_line(time, truck_id=truck.truck_id, events=self.events)
+            log_event(time, f"Truck {truck.truck_id} is loaded with these {package_count} packages.", truck.truck_id, self.events)
+            log_line(time, "", truck.truck_id, self.events)
+            for l_id in sorted(load):
+                location = self.locations[l_id]
+                location.truck_id = truck.truck_id
+                self._carriers[l_id] = truck
+                self._record(DeliveryStatus.enroute, location, time, truck.truck_id)
+            log_line(time + 1, truck_id=truck.truck_id, events=self.events)
+            log_line(time + 1, "", truck.truck_id, self.events)
+
+        self._free.push(truck)
+        self._drive(time, truck)
+
+
+
+    def _drive(self, time: int, truck: TruckState):
+        '''Picks the truck's next stop by earliest arrival and schedules getting there O(k + log(n))'''
+        distances = self.matrix[truck.location_id]
+        best: Tuple[int, float, Location] = None
+        for l_id in truck.load: # O(k)
+            if l_id is None or l_id == truck.location_id:
+                continue
+            location = self.locations[l_id]
+            distance = float(distances[l_id])
+            arrival = max(
+                time + drive_seconds(distance),
+                location.earliest or START_OF_DAY_SECONDS,
+            )
+            if best is None or best[0] > arrival:
+                best = (arrival, distance, location)
+
+        # Only the truck's own location is left, it's already there.
+        if best is None:
+            best = (time, float(0), self.locations[truck.location_id])
+
+        truck.next_time = best[0]
+        self._on_road.push(truck)
+        self.simulator.schedule(best[0], self.TRUCK_ARRIVAL, (truck, best[2], best[1]))
+
+
+
+    def _truck_arrival(self, time: int, arg: Tuple[TruckState, Location, float]):
+        '''Delivers at the stop, then drives on or heads to the hub for the next load O(k + log(n) + log(t))'''
+        truck, location, distance = arg
+        truck.miles += distance
+        truck.location_id = location.location_id
+        truck.end_time = time
+
+        reason = StopReason.loading if location.location_id == HUB_ID else StopReason.delivery
+        truck.routes[-1].append(Stop(time, distance, location, reason))
+        if self.exporter is not None:
+            self.exporter.add_stop(truck.truck_id, len(truck.routes) - 1, truck.routes[-1][-1])
+        self._record(DeliveryStatus.delivered, location, time, truck.truck_id)
+        truck.remove_stop(location.location_id)
+        self._add_pending(location.location_id, -1)
+        if location.location_id != HUB_ID:
+            truck.package_count -= len(location.package_ids)
+            del self._carriers[location.location_id]
+        self._free.push(truck)
+
+        if truck.stops_left:
+            self._drive(time, truck)
+        else:
+            truck.next_time = None
+            self.simulator.schedule(time, self.TRUCK_DEPARTURE, truck)
+
+
+
+    def _package_arrival(self, time: int, location: Location):
+        '''Marks a location's delayed packages as at the hub O(k)'''
+        self._record(DeliveryStatus.hub, location, time, None)
+
+
+
+    def _address_change(self, time: int, arg: Tuple[int, str]):
+        '''Moves a package to its new address and puts it on a truck O(log(n) + log(t)), plus O(log(t)) per full truck skipped
+
+        If a truck still has to visit the new location, the package goes along with that visit. Otherwise
+        it joins the load of the truck on the road with room that reaches its next stop first, or a new
+        trip of the truck that's free first.
+
+        '''
+        package_id, new_address = arg
+        location = find_location(new_address)
+        if location is None:
+            raise ValueError(f"Unknown address {new_address}")
+        location = self.locations[location.location_id]
+        self.packages.record(package_id, time, location_id=location.location_id)
+
+        if self._pending[location.location_id]:
+            location.package_ids.append(package_id)
+            carrier = self._carriers[location.location_id]
+            if carrier is not None:
+                carrier.package_count += 1
+            log_event(time, f"Package {package_id} now goes to {location.address} with the packages already there.", events=self.events)
+            return
+
+        # The location's other packages are delivered, this visit is only for this package.
+        location.package_ids = [package_id]
+
+        truck = self._on_road.first(lambda t: t.package_count < self.capacity)
+        if truck is not None:
+            truck.add_stop(location.location_id)
+            truck.package_count += 1
+            self._carriers[location.location_id] = truck
+            self._add_pending(location.location_id)
+        else:
+            # Go back for it after the current load, then deliver it.
+            truck = self._free.first()
+            truck.schedule.append([location.location_id])
+            self._add_pending(location.location_id)
+            if truck.location_id != HUB_ID or truck.stops_left:
+                truck.schedule.append([HUB_ID])
+                self._add_pending(HUB_ID)
+            self._free.push(truck)
+            if truck.done:
+                truck.done = False
+                self.simulator.schedule(max(time, truck.end_time), self.TRUCK_DEPARTURE, truck)
+        log_event(time, f"Package {package_id} now goes to {location.address} on truck {truck.truck_id}.", events=self.events)
+
+
+
+    def _add_pending(self, location_id: int, amount: int = 1):
+        '''Counts visits to a location added to a truck's loads, or made from them with a negative amount O(1)'''
+        self._pending[location_id] = (self._pending[location_id] or 0) + amount
+
+
+
+
+@timed
+def simulate_day(
+    plans: List[Tuple[int, List[List[int]], int]],
+    locations: Dictionary[int, Location],
+    matrix,
+    packages: PackageHistory,
+    address_changes: List[Tuple[int, str, int]] = (),
+    capacity: int = TRUCK_CAPACITY,
+    exporter: ResultExporter = None,
+    events: EventLog = event_log,
+):
+    '''Runs every truck's schedule as one discrete-event simulation O(e*log(n))
+
+    Args:
+        plans: (truck_id, schedule, start_time) per truck
+        locations: locations by id
+        matrix: distances between locations
+        packages: package history
+        address_changes: (package_id, new_address, effective_time) per correction
+        capacity: the most packages per truck
+        exporter: streams the results out while the day runs, see DeliverySimulation
+        events: the log every event is added to
+    Returns:
+        results: truck id -> (routes, end_time, miles)
+
+    '''
+    simulation = DeliverySimulation(locations, matrix, packages, capacity, exporter, events)
+    for truck_id, schedule, start_time in plans:
+        simulation.add_truck(truck_id, schedule, start_time)
+    simulation.add_package_arrivals()
+    for package_id, new_address, effective_time in address_changes:
+        simulation.add_address_change(package_id, new_address, effective_time)
+    return simulation.run()